@@ -2,11 +2,13 @@ import csv
 import os
 import pathlib
 import traceback
+from contextlib import ExitStack
 from dataclasses import dataclass
 from datetime import date, datetime
-from typing import Dict, List, Set
+from typing import Dict, Iterable, List, Set
 
 from fsklib import model, output
+from fsklib.deuxlsxforms import ConvertedOutputType, DEUMeldeformularXLSX
 from fsklib.utils.logging_helper import get_logger
 
 logger = get_logger(__name__, __file__)
@@ -56,16 +58,16 @@ class DeuMeldeformularCsv:
                     logger.error(f"Unable to parse participant birthday '{d}'")
                     return date.today()
 
-    def _convert_categories(self, input_categories: str) -> Dict[str, model.Category]:
+    def _convert_category_rows(
+        self, category_rows: Iterable[Dict[str, str]]
+    ) -> Dict[str, model.Category]:
         # read categories
+        categories_dict: Dict[str, model.Category] = {}  # cat_name -> category
         try:
-            categories_dict: Dict[str, model.Category] = {}  # cat_name -> category
             category_numbers: Dict[str, int] = (
                 {}
             )  # str(cat_type + cat_level + cat_gender) -> number
-            cats_file = open(input_categories, "r")
-            cat_reader = csv.DictReader(cats_file)
-            for cat_dict in cat_reader:
+            for cat_dict in category_rows:
                 cat_name = cat_dict["Wettbewerb/Prüfung"].strip()
                 cat_deu_type = cat_dict["Disziplin"].strip()
                 cat_deu_level = cat_dict["Kategorie"].strip()
@@ -152,11 +154,9 @@ class DeuMeldeformularCsv:
                     cat_level,
                     cat_gender,
                     number=category_numbers[cat_id],
-                )
+                ).validate()  # categories are shared by all participants, validate once
         except Exception as e:
             logger.exception("Error while converting categories.")
-        finally:
-            cats_file.close()
 
         return categories_dict
 
@@ -178,6 +178,75 @@ class DeuMeldeformularCsv:
             logger.critical("Categories file not found.")
             return 3
 
+        with ExitStack() as files:
+            event_info_rows = []
+            if input_event_info:
+                event_info_file = files.enter_context(open(input_event_info, "r"))
+                event_info_rows = csv.DictReader(event_info_file, delimiter=",")
+            clubs_file = files.enter_context(open(input_clubs, "r", encoding="utf-8"))
+            cats_file = files.enter_context(open(input_categories, "r"))
+            pars_file = files.enter_context(open(input_participants, "r"))
+            self.convert_rows(
+                csv.DictReader(pars_file),
+                csv.DictReader(clubs_file, delimiter=";"),
+                csv.DictReader(cats_file),
+                event_info_rows,
+                outputs,
+            )
+
+    def convert_xlsx(
+        self,
+        input_xlsx: str,
+        club_rows: Iterable[Dict[str, str]],
+        outputs: List[output.OutputBase],
+        write_intermediate_csv=False,
+    ):
+        """Convert a DEU registration form (xlsx) directly, the intermediate csv files are optional."""
+        with DEUMeldeformularXLSX(input_xlsx) as deu_xlsx:
+            if write_intermediate_csv:
+                deu_xlsx.convert()
+                files = [
+                    deu_xlsx.get_output_files(file_type)
+                    for file_type in [
+                        ConvertedOutputType.EVENT_PERSONS,
+                        ConvertedOutputType.EVENT_CATERGORIES,
+                        ConvertedOutputType.EVENT_INFO,
+                    ]
+                ]
+                if not all(files):
+                    logger.critical("Registration form is incomplete.")
+                    return 4
+                persons, categories, event_info = [f[0] for f in files]
+                with open(persons, "r") as pars_file, open(
+                    categories, "r"
+                ) as cats_file, open(event_info, "r") as event_info_file:
+                    self.convert_rows(
+                        csv.DictReader(pars_file),
+                        club_rows,
+                        csv.DictReader(cats_file),
+                        csv.DictReader(event_info_file),
+                        outputs,
+                    )
+                return
+
+            event_info, categories, persons = deu_xlsx.csv_rows()
+            if persons is None:
+                logger.critical("Participants not found in registration form.")
+                return 1
+            if categories is None:
+                logger.critical("Categories not found in registration form.")
+                return 3
+            self.convert_rows(persons, club_rows, categories, event_info, outputs)
+
+    def convert_rows(
+        self,
+        participant_rows: Iterable[Dict[str, str]],
+        club_rows: Iterable[Dict[str, str]],
+        category_rows: Iterable[Dict[str, str]],
+        event_info_rows: Iterable[Dict[str, str]],
+        outputs: List[output.OutputBase],
+    ):
+        """Convert rows as read from the DEU csv files (e.g. directly from DEUMeldeformularXLSX.csv_rows)."""
         competition = model.Competition(
             name="Test",
             organizer="LV",
@@ -185,43 +254,32 @@ class DeuMeldeformularCsv:
             start=date.today(),
             end=date.today(),
         )
-        if input_event_info:
-            event_info_file = open(input_event_info, "r")
-            info_reader = csv.DictReader(event_info_file, delimiter=",")
-            for comp_dict in info_reader:
-                competition.name = comp_dict["Name"]
-                competition.organizer = comp_dict["Veranstalter"]
-                competition.place = comp_dict["Ort"]
-                competition.start = date.fromisoformat(comp_dict["Start Datum"])
-                end = comp_dict["End Datum"]
-                competition.end = date.fromisoformat(end) if end else competition.start
+        for comp_dict in event_info_rows:
+            competition.name = comp_dict["Name"]
+            competition.organizer = comp_dict["Veranstalter"]
+            competition.place = comp_dict["Ort"]
+            competition.start = date.fromisoformat(comp_dict["Start Datum"])
+            end = comp_dict["End Datum"]
+            competition.end = date.fromisoformat(end) if end else competition.start
 
         for output in outputs:
             output.add_event_info(competition)
 
         # read clubs
+        club_dict = {}
+        regions = set()
         try:
-            clubs_file = open(input_clubs, "r", encoding="utf-8")
-            club_reader = csv.DictReader(clubs_file, delimiter=";")
-
-            club_dict = {}
-            regions = set()
-
-            for club in club_reader:
+            for club in club_rows:
                 abbr = club["Abk."]
                 region = club["Region"]
-                club_dict[abbr] = model.Club(club["Name"], abbr, region)
+                club_dict[abbr] = model.Club(club["Name"], abbr, region).validate()
                 regions.add(region)
         except:
             logger.exception("Exception while parsing clubs.")
-        finally:
-            clubs_file.close()
 
-        categories_dict = self._convert_categories(input_categories)
+        categories_dict = self._convert_category_rows(category_rows)
 
         try:
-            pars_file = open(input_participants, "r")
-            deu_athlete_reader = csv.DictReader(pars_file)
             check_field_names = True
 
             next_is_male_partner = False
@@ -240,7 +298,7 @@ class DeuMeldeformularCsv:
             )  # a map storing (team_id -> team participant), will be added at the end
             person_last = None
 
-            for athlete in deu_athlete_reader:
+            for athlete in participant_rows:
                 logger.debug(athlete)
 
                 field_names = [
@@ -373,15 +431,22 @@ class DeuMeldeformularCsv:
                     logger.error("Skipping athlete.")
                     continue
 
+                if par_role is None:  # participants are not validated, only their parts
+                    logger.error(
+                        'Invalid role "%s" for athlete "%s %s". Skipping athlete.'
+                        % (athlete["Rolle"], par_first_name, par_family_name)
+                    )
+                    continue
+
                 # avoide duplicate persons
-                person = model.Person(
+                person = model.Person.validated(
                     par_id,
                     par_first_name,
                     par_family_name,
                     par_gender,
                     par_bday,
-                    par_club,
                 )
+                person.club = par_club  # clubs are validated once and shared
                 if par_id not in par_ids:
                     # add athletes data
                     for output in outputs:
@@ -494,8 +559,6 @@ class DeuMeldeformularCsv:
 
         except:
             logger.exception("Error while parsing participants")
-        finally:
-            pars_file.close()
 
 
 if __name__ == "__main__":
@@ -508,7 +571,7 @@ if __name__ == "__main__":
             [
                 # output.PersonCsvOutput(output_athletes_file_path),
                 output.ParticipantCsvOutput(output_participant_file_path),
-                output.OdfParticOutput(output_odf_participant_dir),
+                output.OdfParticOutput(output_odf_participant_dir, indent=False),  # compact xml for the FSM import
             ],
         )
     )
@@ -1,14 +1,17 @@
 import csv
 import logging
 import os
+from concurrent.futures import ProcessPoolExecutor
 from datetime import date, datetime
 from enum import Enum
 from pathlib import Path
-from typing import List
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
 
 import openpyxl
+from openpyxl.utils.cell import coordinate_to_tuple
 
 from fsklib.utils.logging_helper import get_logger
+from fsklib.utils.merge_csv import merge_csv
 
 # settings
 input_path = 'BJM22Test/Meldungen/'  # file -> convert file only; folder -> convert all in folder
@@ -39,15 +42,20 @@ class ConvertedOutputType(Enum):
 
 
 class DEUMeldeformularXLSX:
-    def __init__(self, xlsx_path, create_categories=True, create_persons=True, overwrite_output_files=True) -> None:
+    # cells of the event information at the top of the form
+    info_cells = ('B1', 'F2', 'F4', 'F9', 'C9', 'C14', 'F14')
+
+    def __init__(self, xlsx_path, create_categories=True, create_persons=True, overwrite_output_files=True,
+                 read_only=True) -> None:
 
         self.xlsx_path = Path(xlsx_path)
         self.create_categories = create_categories
         self.create_persons = create_persons
         self.overwrite = overwrite_output_files
+        self.read_only = read_only  # stream the worksheet instead of loading all cells
         wb = None
         try:
-            wb = openpyxl.load_workbook(xlsx_path, data_only=True)
+            wb = openpyxl.load_workbook(xlsx_path, read_only=read_only, data_only=True)
         except Exception as e:
             logger.error('Unable to parse xlsx file.')
             raise e
@@ -55,49 +63,81 @@ class DEUMeldeformularXLSX:
         if not wb:
             raise Exception('Unable to load workbook from "%s".' % xlsx_path)
 
-        if len(wb.worksheets) < 1:
-            raise Exception('There is no worksheet within the xlsx file "%s"' % xlsx_path)
-
-        self.worksheet = wb.worksheets[0]
+        self.workbook = wb
+        try:
+            if len(wb.worksheets) < 1:
+                raise Exception('There is no worksheet within the xlsx file "%s"' % xlsx_path)
+
+            self.worksheet = wb.worksheets[0]
+            if read_only:
+                # the stored dimensions are not reliable, read rows as they are
+                self.worksheet.reset_dimensions()
+            self.info = self.read_cells(self.info_cells)
+        except BaseException:
+            self.close()
+            raise
         self.output_files = {}  # dict of ConvertedOutputType -> list of file names (list(Path))
 
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def close(self) -> None:
+        # closes the file of a read only workbook (locked on Windows), the event information stays available
+        self.workbook.close()
+
+    def read_cells(self, coordinates) -> Dict[str, Any]:
+        # read rows from the top instead of accessing single cells (slow for read only worksheets)
+        positions = {coordinate: coordinate_to_tuple(coordinate) for coordinate in coordinates}
+        max_row = max(row for (row, _) in positions.values())
+        rows = list(self.worksheet.iter_rows(min_row=1, max_row=max_row, values_only=True))
+        return {coordinate: self.row_value(rows[row - 1], col - 1) if row <= len(rows) else None
+                for coordinate, (row, col) in positions.items()}
+
+    @staticmethod
+    def row_value(row: tuple, index: int) -> Any:
+        return row[index] if index < len(row) else None
+
     @property
     def form_type(self):
         try:
-            return DEUFormType(self.worksheet['B1'].value)
+            return DEUFormType(self.info['B1'])
         except:
             return None
 
     @property
     def event_name(self) -> str:
-        return str(self.worksheet['F2'].value)
+        return str(self.info['F2'])
 
     @property
     def event_organizer(self) -> str:
-        return str(self.worksheet['F4'].value)
+        return str(self.info['F4'])
 
     @property
     def event_place(self) -> str:
-        return str(self.worksheet['F9'].value)
+        return str(self.info['F9'])
 
     @property
     def event_type(self) -> DEUEventType:
         try:
-            return DEUEventType(self.worksheet['C9'].value)
+            return DEUEventType(self.info['C9'])
         except:
             return None
 
     @staticmethod
-    def cell_to_date(cell) -> date:
-        if isinstance(cell.value, datetime):
-            return cell.value.date()
-        elif isinstance(cell.value, str):
-            return datetime.fromisoformat(cell.value).date()
+    def value_to_date(value) -> date:
+        if isinstance(value, datetime):
+            return value.date()
+        elif isinstance(value, str):
+            return datetime.fromisoformat(value).date()
+        raise ValueError(f'No date: {value}')
 
     @property
     def event_start_date(self) -> date:
         try:
-            return self.cell_to_date(self.worksheet['C14'])
+            return self.value_to_date(self.info['C14'])
         except:
             # default to 1. January of current year
             d = date.today()
@@ -106,31 +146,88 @@ class DEUMeldeformularXLSX:
     @property
     def event_end_date(self) -> date:
         try:
-            return self.cell_to_date(self.worksheet['F14'])
+            return self.value_to_date(self.info['F14'])
         except:
-            return self.event_start_date()
+            return self.event_start_date
 
-    def create_csv_from_table_range(self, min_row, max_row, output_csv_file_path):
-        header = []
-        csv_content_list = []
-        for row in self.worksheet.iter_rows(min_row=min_row, max_row=max_row):
-            if not header:
-                for cell in row:
-                    if cell.value:
-                        header.append(cell.value)
-                continue
-            else:
-                if not row[0].value:
-                    continue
-                csv_dict = {}
-                for header_name, cell in zip(header, row):
-                    csv_dict[header_name] = cell.value if cell.value else ''
-                csv_content_list.append(csv_dict)
+    @property
+    def event_info(self) -> Dict[str, Any]:
+        return {
+            'Name': self.event_name,
+            'Veranstalter': self.event_organizer,
+            'Ort': self.event_place,
+            'Start Datum': self.event_start_date,
+            'End Datum': self.event_end_date
+        }
+
+    def read_tables(self) -> Tuple[Optional[List[Dict[str, Any]]], Optional[Iterator[Dict[str, Any]]]]:
+        """Return the categories table and an iterator over the persons table (None if not found).
+
+        The worksheet is read in a single pass, the persons are read while iterating.
+        """
+        # the categories table ('Disziplin' ... 'Hinweise:') is followed by the persons table ('Team ID')
+        categories_header = None
+        categories_rows = []
+        categories_complete = False
+        rows = self.worksheet.iter_rows(min_row=1, values_only=True)
+        for row in rows:
+            if self.row_value(row, 1) == 'Team ID':
+                persons = self.table_to_dicts(row, rows)
+                break
+            if self.row_value(row, 1) == 'Disziplin':
+                categories_header = row
+                categories_rows = []
+                categories_complete = False
+            elif self.row_value(row, 0) == 'Hinweise:':
+                categories_complete = True
+            elif categories_header is not None and not categories_complete:
+                categories_rows.append(row)
+        else:
+            persons = None
+
+        categories = None
+        if categories_header is not None and categories_complete:
+            categories = list(self.table_to_dicts(categories_header, categories_rows))
+        return categories, persons
 
-        self.write_csv(csv_content_list, output_csv_file_path)
+    @staticmethod
+    def csv_value(value: Any) -> str:
+        # value as written to and read back from the csv files
+        return '' if value is None else str(value)
+
+    def csv_rows(self) -> Tuple[List[Dict[str, str]], Optional[List[Dict[str, str]]],
+                                Optional[Iterator[Dict[str, str]]]]:
+        """Event info, categories and persons as rows of the converted csv files, without writing them.
+
+        Tables which are not found are None. Can be passed to DeuMeldeformularCsv.convert_rows.
+        """
+        categories, persons = self.read_tables()
+
+        def to_csv(rows):
+            for row in rows:
+                yield {key: self.csv_value(value) for key, value in row.items()}
+
+        return (list(to_csv([self.event_info])),
+                list(to_csv(categories)) if categories else None,
+                to_csv(persons) if persons is not None else None)
+
+    def table_to_dicts(self, header_row: tuple, rows: Iterable[tuple]) -> Iterator[Dict[str, Any]]:
+        header = [value for value in header_row if value]
+        for row in rows:
+            if not self.row_value(row, 0):
+                continue
+            yield {header_name: self.row_value(row, i) or '' for i, header_name in enumerate(header)}
 
-    def write_csv(self, csv_data: dict, path: str) -> None:
-        if len(csv_data) == 0:
+    def create_csv_from_table_range(self, min_row, max_row, output_csv_file_path):
+        rows = self.worksheet.iter_rows(min_row=min_row, max_row=max_row, values_only=True)
+        header_row = next(rows, ())
+        self.write_csv(self.table_to_dicts(header_row, rows), output_csv_file_path)
+
+    def write_csv(self, csv_data: Iterable[dict], path: str) -> None:
+        # csv_data may be a generator, the rows are written while they are produced
+        csv_data = iter(csv_data)
+        first_row = next(csv_data, None)
+        if first_row is None:
             logger.warning('CSV data is empty for "%s"' % path)
             return
 
@@ -139,8 +236,9 @@ class DEUMeldeformularXLSX:
             return
 
         with open(path, 'w', newline='') as f:
-            writer = csv.DictWriter(f, fieldnames=csv_data[0].keys())
+            writer = csv.DictWriter(f, fieldnames=first_row.keys())
             writer.writeheader()
+            writer.writerow(first_row)
             writer.writerows(csv_data)
 
     def get_output_files(self, file_type: ConvertedOutputType) -> List[Path]:
@@ -154,14 +252,18 @@ class DEUMeldeformularXLSX:
         self.output_files[file_type].append(path)
 
     def convert(self):
-        if self.form_type is None:
-            logger.warning('Unable to verify document type and version.')
-            logger.warning('Still trying by assuming an event registration form...')
-
-        if self.form_type is DEUFormType.EVENT or self.form_type is None:
-            self.convert_to_csv()
-            # TODO: generate Klassenlaufen scripts
-        # TODO: support more types (e.g. sys team registration)
+        try:
+            if self.form_type is None:
+                logger.warning('Unable to verify document type and version.')
+                logger.warning('Still trying by assuming an event registration form...')
+
+            if self.form_type is DEUFormType.EVENT or self.form_type is None:
+                self.convert_to_csv()
+                # TODO: generate Klassenlaufen scripts
+            # TODO: support more types (e.g. sys team registration)
+        finally:
+            # the worksheet is read only once
+            self.close()
 
     def convert_to_csv(self):
         base_path = self.xlsx_path.parent / 'csv'
@@ -170,37 +272,20 @@ class DEUMeldeformularXLSX:
         output_categories_csv_file_path = base_path / (self.xlsx_path.stem + '_deu_categories.csv')
         output_persons_csv_file_path = base_path / (self.xlsx_path.stem + '_deu_athletes.csv')
 
-        competition_data = [{
-            'Name': self.event_name,
-            'Veranstalter': self.event_organizer,
-            'Ort': self.event_place,
-            'Start Datum': self.event_start_date,
-            'End Datum': self.event_end_date
-        }, ]
-        self.write_csv(competition_data, output_competition_csv_file_path)
+        self.write_csv([self.event_info], output_competition_csv_file_path)
         self.add_output_file(ConvertedOutputType.EVENT_INFO, output_competition_csv_file_path)
 
-        start_row_categories = 0
-        end_row_categories = 0
-        start_row_persons = 0
-        for row in self.worksheet.iter_rows(min_row=1, max_col=2, max_row=2000):
-            if row[1].value == 'Team ID':
-                start_row_persons = row[1].row
-                break
-            if row[1].value == 'Disziplin':
-                start_row_categories = row[0].row
-            elif row[0].value == 'Hinweise:':
-                end_row_categories = row[1].row - 1
-
+        categories, persons = self.read_tables()
         if self.create_categories:
-            if start_row_categories and end_row_categories and start_row_categories != end_row_categories:
-                self.create_csv_from_table_range(start_row_categories, end_row_categories, output_categories_csv_file_path)
+            if categories:
+                self.write_csv(categories, output_categories_csv_file_path)
                 self.add_output_file(ConvertedOutputType.EVENT_CATERGORIES, output_categories_csv_file_path)
             else:
                 logger.error('Categories not found in "%s"' % self.xlsx_path)
         if self.create_persons:
-            if start_row_persons:
-                self.create_csv_from_table_range(start_row_persons, None, output_persons_csv_file_path)
+            if persons is not None:
+                # remaining rows of the worksheet are streamed to the csv file
+                self.write_csv(persons, output_persons_csv_file_path)
                 self.add_output_file(ConvertedOutputType.EVENT_PERSONS, output_persons_csv_file_path)
             else:
                 logger.error('Persons not found in "%s"' % self.xlsx_path)
@@ -220,8 +305,8 @@ def convert_meldeformular_in_directory(input_directory, create_categories=True):
             continue  # not a xlsx extension
 
         try:
-            deu_xlsx = DEUMeldeformularXLSX(input_file_path, create_categories)
-            deu_xlsx.convert()
+            with DEUMeldeformularXLSX(input_file_path, create_categories) as deu_xlsx:
+                deu_xlsx.convert()
             logger.info(f"Done for {dir_elem}!")
             # create_categories = False # uncomment this, if only the categories of the first file should be used
         except Exception as e:
@@ -229,6 +314,62 @@ def convert_meldeformular_in_directory(input_directory, create_categories=True):
             logger.error(e)
 
 
+def _convert_form(input_file_path: Path, create_categories: bool
+                  ) -> Tuple[Dict[ConvertedOutputType, List[Path]], Optional[str]]:
+    # runs in a worker process, errors are returned for the report instead of being raised
+    try:
+        with DEUMeldeformularXLSX(input_file_path, create_categories) as deu_xlsx:
+            deu_xlsx.convert()
+        return deu_xlsx.output_files, None
+    except Exception as e:
+        return {}, f'{type(e).__name__}: {e}'
+
+
+def convert_meldeformular_batch(input_directory, create_categories=True, max_workers: Optional[int] = None
+                                ) -> Dict[Path, Optional[str]]:
+    """Convert all forms of a directory in parallel and merge their csv files.
+
+    Besides the csv files of each form, the csv directory gets deu_athletes.csv and deu_categories.csv (rows of all
+    forms) and conversion_report.txt. Returns the error of each form (None if converted).
+    """
+    input_directory = Path(input_directory)
+    # skip lock files of opened workbooks
+    file_paths = sorted(path for path in input_directory.iterdir()
+                        if path.is_file() and path.suffix.lower() == '.xlsx' and not path.name.startswith('~$'))
+    output_directory = input_directory / 'csv'
+    output_directory.mkdir(exist_ok=True)
+
+    if max_workers == 1 or len(file_paths) < 2:
+        results = [_convert_form(file_path, create_categories) for file_path in file_paths]
+    else:
+        with ProcessPoolExecutor(max_workers) as executor:
+            results = list(executor.map(_convert_form, file_paths, [create_categories] * len(file_paths)))
+
+    report: Dict[Path, Optional[str]] = {}
+    output_files: Dict[ConvertedOutputType, List[Path]] = {}
+    for file_path, (form_output_files, error) in zip(file_paths, results):
+        report[file_path] = error
+        for file_type, paths in form_output_files.items():
+            output_files.setdefault(file_type, []).extend(path for path in paths if path.exists())
+
+    merge_csv(output_files.get(ConvertedOutputType.EVENT_PERSONS, []), output_directory / 'deu_athletes.csv',
+              log_file_path=output_directory / 'log_merge_athletes.txt')
+    if create_categories:
+        # every form contains the categories of the event
+        merge_csv(output_files.get(ConvertedOutputType.EVENT_CATERGORIES, []), output_directory / 'deu_categories.csv',
+                  log_file_path=output_directory / 'log_merge_categories.txt', make_unique=True)
+
+    with open(output_directory / 'conversion_report.txt', 'w', encoding='utf-8') as f:
+        for file_path, error in report.items():
+            f.write(f'{file_path.name}: {error if error else "OK"}\n')
+
+    failed = [file_path for file_path, error in report.items() if error]
+    logger.info(f'{len(file_paths) - len(failed)} of {len(file_paths)} forms converted')
+    for file_path in failed:
+        logger.error(f'Failed to convert {file_path.name}: {report[file_path]}')
+    return report
+
+
 # main script code
 if __name__ == '__main__':
     logger.setLevel(logging.INFO)
@@ -241,8 +382,7 @@ if __name__ == '__main__':
             logger.error('Failed')
             logger.error(e)
     elif input_path.is_dir():
-        create_categories = True  # only for first xlsx
-        convert_meldeformular_in_directory(input_path, create_categories)
+        convert_meldeformular_batch(input_path)
 
     # deu_xlsx = DEUMeldeformularXLSX(input_path)
     # logger.info(deu_xlsx.event_name)
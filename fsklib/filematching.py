@@ -0,0 +1,396 @@
+import hashlib
+import json
+import logging
+import os
+from concurrent.futures import Future
+from pathlib import Path
+from typing import Dict, FrozenSet, Iterable, List, Mapping, Optional, Sequence, Set, Tuple, Union
+
+from fsklib.utils.common import normalize_many, normalize_string
+from fsklib.utils.logging_helper import get_logger
+from fsklib.utils.staging import FileStager, PathLike
+
+logger = get_logger(__name__, __file__)
+logger.setLevel(logging.INFO)
+
+
+class FileNameIndex:
+    """Trigram index of normalized file names (without extension) for substring searches.
+
+    Normalized names contain no separators, so names of persons are searched as substrings. Candidates are the files
+    containing all trigrams of the search string, these are verified with a substring test.
+    """
+
+    def __init__(self, file_names: Iterable[str]):
+        self.file_names = list(file_names)
+        self.normalized_names = normalize_many(os.path.splitext(s)[0] for s in self.file_names)
+        self._trigrams: Dict[str, Set[int]] = {}
+        for i, name in enumerate(self.normalized_names):
+            for j in range(len(name) - 2):
+                self._trigrams.setdefault(name[j:j + 3], set()).add(i)
+        self._found: Dict[str, FrozenSet[int]] = {}
+        self.searches: Optional[Set[str]] = None  # set to collect the normalized search strings
+
+    def __len__(self) -> int:
+        return len(self.file_names)
+
+    def find(self, search_string: str) -> Set[int]:
+        """Return the indices of the file names containing the normalized search string."""
+        if not search_string:
+            return set()
+        search_string = normalize_string(search_string)
+        if self.searches is not None:
+            self.searches.add(search_string)
+        found = self._found.get(search_string)
+        if found is None:
+            found = self._found[search_string] = frozenset(self._find(search_string))
+        return set(found)
+
+    def _find(self, search_string: str) -> Iterable[int]:
+        if len(search_string) < 3:  # no trigram -> check all files
+            candidates = range(len(self.normalized_names))
+        else:
+            postings = sorted((self._trigrams.get(search_string[j:j + 3], set())
+                               for j in range(len(search_string) - 2)), key=len)
+            candidates = set(postings[0])
+            for posting in postings[1:]:
+                if not candidates:
+                    break
+                candidates &= posting
+        return [i for i in candidates if search_string in self.normalized_names[i]]
+
+
+def find_indices_for_full_name(index: FileNameIndex, given_name: str, family_name: str,
+                               check_family_name_only=False) -> set:
+    valid_idx_set = index.find(given_name + family_name)
+    valid_idx_set |= index.find(family_name + given_name)
+
+    if check_family_name_only:
+        valid_idx_set |= index.find(family_name)
+
+    return valid_idx_set
+
+
+def find_file_name_for_participant(participant: Mapping[str, str], file_names: Union[FileNameIndex, Sequence[str]],
+                                   find_segment_type: bool, force_segment_type: str) -> list:
+    """Return the file names matching the participant (row of a starting order csv file).
+
+    Pass a FileNameIndex when matching several participants against the same files.
+    """
+    index = file_names if isinstance(file_names, FileNameIndex) else FileNameIndex(file_names)
+    file_name_list = index.file_names
+    truncated_file_names = index.normalized_names
+
+    cat_type = participant['Kategorie-Typ']
+    segment_type = participant['Segment-Typ']
+
+    if force_segment_type:
+        if not segment_type:
+            segment_type = force_segment_type
+        elif segment_type != force_segment_type:
+            return []
+
+    find_name = False
+    find_name_partner = False
+    find_team_name = False
+    find_birthday = False
+
+    if cat_type == 'S':
+        find_name = True
+        find_birthday = True
+    elif cat_type == 'P' or cat_type == 'D':
+        find_name = True
+        find_name_partner = True
+    elif cat_type == 'T':
+        find_team_name = True
+
+    valid_file_idxs_name = set()
+    valid_file_idxs_family_name = set()
+    if find_name:
+        family_name = participant['Name']
+        given_name = participant['Vorname']
+        valid_file_idxs_name = find_indices_for_full_name(index, given_name, family_name)
+
+        # if name is ambiguous -> check, if b-day exists and instersect
+        valid_file_idxs_bday = set()
+        if len(valid_file_idxs_name) > 1 and find_birthday:
+            bday = participant['Geburtstag']
+            valid_file_idxs_bday = index.find(bday)
+            if valid_file_idxs_bday:
+                valid_file_idxs_name_temp = valid_file_idxs_name.intersection(valid_file_idxs_bday)
+                if valid_file_idxs_name_temp:
+                    valid_file_idxs_name = valid_file_idxs_name_temp
+
+        if not valid_file_idxs_name or cat_type == 'P' or cat_type == 'D':
+            valid_file_idxs_family_name = find_indices_for_full_name(index, given_name, family_name, True)
+
+    valid_file_idxs_family_name_partner = set()
+    if find_name_partner:
+        family_name = participant['Name-Partner']
+        given_name = participant['Vorname-Partner']
+        valid_file_idxs_family_name_partner = find_indices_for_full_name(index, given_name, family_name, True)
+
+    valid_file_idxs_name_team = set()
+    if find_team_name:
+        team_name = participant['Team-Name']
+        valid_file_idxs_name_team = index.find(team_name)
+
+    valid_file_idxs_all_names = valid_file_idxs_name.union(valid_file_idxs_family_name,
+                                                           valid_file_idxs_family_name_partner,
+                                                           valid_file_idxs_name_team)
+    # find segment
+    if find_segment_type:
+        valid_file_idxs_segment = set()
+        for valid_file_idx in valid_file_idxs_all_names:
+            file_name = truncated_file_names[valid_file_idx].upper()
+
+            seg = str(participant['Segment-Abk.']).upper()
+            segs = []
+
+            if seg:
+                segs.append(seg)
+
+            if cat_type == 'D':             # dance
+                if segment_type == 'S':         # short
+                    segs.extend(['RD', 'RT', 'OD'])
+                elif segment_type == 'F':       # free
+                    segs.extend(['FD', 'KT'])
+            else:                           # single, pairs and synchron
+                if segment_type == 'S':         # short
+                    segs.extend(['SP', 'KP'])
+                elif segment_type == 'F':       # free
+                    segs.extend(['FS', 'KR', 'KUER', 'FP'])
+
+            for seg in segs:
+                if file_name.endswith(seg):
+                    valid_file_idxs_segment.add(valid_file_idx)
+                    break
+    else:  # find segment type
+        valid_file_idxs_segment = valid_file_idxs_all_names
+
+    # still ambiguous -> try to solve with intersections
+    valid_file_idxs = set()
+    if len(valid_file_idxs_segment) > 0:
+        if find_name and valid_file_idxs_name and not find_name_partner:
+            valid_file_idxs = valid_file_idxs_name
+        if find_name and valid_file_idxs_family_name and find_name_partner and valid_file_idxs_family_name_partner:
+            # for pairs, only family name should be sufficient
+            valid_file_idxs = valid_file_idxs_family_name.intersection(valid_file_idxs_family_name_partner)
+        if find_birthday and valid_file_idxs_bday:
+            if valid_file_idxs:
+                valid_file_idxs = valid_file_idxs.intersection(valid_file_idxs_bday)
+            else:
+                valid_file_idxs = valid_file_idxs_bday
+        if find_team_name:
+            if valid_file_idxs:
+                valid_file_idxs = valid_file_idxs.intersection(valid_file_idxs_name_team)
+            else:
+                valid_file_idxs = valid_file_idxs_name_team
+        valid_file_idxs = valid_file_idxs.intersection(valid_file_idxs_segment)
+    else:
+        valid_file_idxs = valid_file_idxs_segment
+
+    valid_file_count = len(valid_file_idxs)
+
+    files_found = set()
+    if valid_file_count < 1:
+        log_string = '\033[31m## missing ##\033[0m'
+    elif valid_file_count > 1:
+        log_string = '\033[35m## ambiguous ##\033[0m ('
+        for valid_file_idx in valid_file_idxs:
+            log_string += file_name_list[valid_file_idx] + ','
+            files_found.add(file_name_list[valid_file_idx])
+        log_string += ')'
+    else:
+        # file found
+        valid_index = valid_file_idxs.pop()  # there is only one element
+        log_string = '(\033[32m## found ##\033[0m ' + file_name_list[valid_index] + ')'
+        files_found.add(file_name_list[valid_index])
+
+    name = participant['Name'] + ', ' + participant['Vorname']
+    # use team name for couples or teams
+    if cat_type != 'S':
+        name = participant['Team-Name']
+    logger.info('  ' + name + ' (' + participant['Nation'] + '/' + participant['Club-Abk.'] + ') ' + log_string)
+
+    # convert set to list
+    files_found = [f for f in files_found]
+    return files_found
+
+
+def _row_hash(participant: Mapping[str, str]) -> str:
+    return hashlib.sha1(json.dumps(participant, sort_keys=True, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+
+def _file_hash(path: PathLike) -> str:
+    sha256 = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            sha256.update(chunk)
+    return sha256.hexdigest()
+
+
+class ParticipantFileManifest:
+    """Manifest of a sorted output directory for incremental runs, stored as json file in the output directory.
+
+    It holds the matched files of every participant (row of the starting order), the content hashes of the input files
+    and the staged destination files. A participant is only matched again if its row changed or if an added or removed
+    file contains one of its search strings. A file is only staged if its destination or the content of its source
+    changed. Outdated destinations of the last run are kept, unless apply() is asked to remove them (then renamed
+    destinations, e.g. by new starting numbers, are moved).
+
+    Changed files are handed to the stager by stage() right away. Only files, which might be moved from an outdated
+    destination, wait for apply(), because the outdated destinations are known after all files are added.
+    """
+    FILE_NAME = "participant_files.json"
+    VERSION = 1
+
+    def __init__(self, output_root: PathLike, file_names: Iterable[str], match_settings: Optional[dict] = None):
+        self.path = Path(output_root) / self.FILE_NAME
+        self.file_names = list(file_names)
+        self.match_settings = match_settings or {}
+
+        data = {}
+        if self.path.exists():
+            try:
+                data = json.loads(self.path.read_text(encoding="utf-8"))
+            except (OSError, ValueError) as e:
+                logger.warning(f"Unable to read manifest '{self.path}' ({e}), matching all participants again.")
+        if data.get("version") != self.VERSION:
+            data = {}
+
+        # participant row hash -> {"files": matched files, "searches": normalized search strings}
+        self._old_participants: Dict[str, dict] = \
+            data.get("participants", {}) if data.get("match_settings") == self.match_settings else {}
+        # source path -> [size, mtime_ns, sha256]
+        self._old_hashes: Dict[str, list] = data.get("hashes", {})
+        # destination path relative to the output root -> sha256 of the content
+        self._old_destinations: Dict[str, str] = data.get("destinations", {})
+        changed_file_names = set(data.get("file_names", [])).symmetric_difference(self.file_names)
+        self._changed_names = normalize_many(os.path.splitext(s)[0] for s in changed_file_names)
+
+        self.participants: Dict[str, dict] = {}
+        self.hashes: Dict[str, list] = {}
+        self.destinations: Optional[Dict[str, str]] = None  # set by apply()
+        # destination path relative to the output root -> (source, sha256) of all added files
+        self._wanted: Dict[str, Tuple[Path, str]] = {}
+        self._unchanged: Dict[str, str] = {}
+        self._pending: List[str] = []  # destinations staged by apply()
+        self._old_destination_hashes = set(self._old_destinations.values())
+        self._futures: Dict[str, Tuple[Future, str]] = {}
+        self.counts = dict.fromkeys(["matched", "cached", "unchanged", "moved", "staged", "removed"], 0)
+
+    def match(self, participant: Mapping[str, str], index: FileNameIndex,
+              find_segment_type: bool, force_segment_type: str) -> list:
+        """Like find_file_name_for_participant, but the files of unchanged participants are taken from the manifest."""
+        key = _row_hash(participant)
+        entry = self._old_participants.get(key)
+        if entry is not None and \
+                not any(search in name for search in entry["searches"] for name in self._changed_names):
+            self.participants[key] = entry
+            self.counts["cached"] += 1
+            return list(entry["files"])
+
+        index.searches = set()
+        try:
+            files = find_file_name_for_participant(participant, index, find_segment_type, force_segment_type)
+        finally:
+            searches, index.searches = index.searches, None
+        self.participants[key] = {"files": files, "searches": sorted(searches)}
+        self.counts["matched"] += 1
+        return files
+
+    def file_hash(self, source: PathLike) -> str:
+        """Content hash of the source file, only calculated if its size or modification time changed."""
+        key = os.path.abspath(source)
+        stat = os.stat(source)
+        entry = self.hashes.get(key) or self._old_hashes.get(key)
+        if not entry or entry[0] != stat.st_size or entry[1] != stat.st_mtime_ns:
+            entry = [stat.st_size, stat.st_mtime_ns, _file_hash(source)]
+        self.hashes[key] = entry
+        return entry[2]
+
+    def stage(self, source: PathLike, destination: PathLike,
+              stager: Optional[FileStager] = None, remove_outdated=False):
+        """Add a file, changed files are staged right away if a stager is given, otherwise by apply()."""
+        source, destination = Path(source), Path(destination)
+        rel_path = os.path.relpath(destination, self.path.parent)
+        if rel_path in self._wanted:
+            if self._wanted[rel_path][0] != source:
+                logger.warning(f"Destination '{rel_path}' is used for several files, keeping the first one.")
+            return
+        try:
+            file_hash = self.file_hash(source)
+        except OSError as e:
+            logger.error(f"Unable to read '{source}' ({e}).")
+            return
+        self._wanted[rel_path] = (source, file_hash)
+
+        if self._old_destinations.get(rel_path) == file_hash and destination.exists() and \
+                destination.stat().st_size == os.stat(source).st_size:
+            self._unchanged[rel_path] = file_hash
+            self.counts["unchanged"] += 1
+        elif stager is None or \
+                (remove_outdated and file_hash in self._old_destination_hashes and not destination.exists()):
+            self._pending.append(rel_path)  # maybe moved from an outdated destination
+        else:
+            self._futures[rel_path] = (stager.stage(source, destination), file_hash)
+            self.counts["staged"] += 1
+
+    def apply(self, stager: FileStager, remove_outdated=False):
+        """Stage the pending files, move or remove outdated destinations if requested. Close the stager, then save()."""
+        output_root = self.path.parent
+
+        # destinations of the last run, which are not wanted anymore -> move to a new destination or remove
+        outdated: Dict[str, List[str]] = {}
+        for rel_path, file_hash in self._old_destinations.items():
+            if rel_path not in self._wanted:
+                outdated.setdefault(file_hash, []).append(rel_path)
+
+        self.destinations = dict(self._unchanged)
+        for rel_path in self._pending:
+            source, file_hash = self._wanted[rel_path]
+            destination = output_root / rel_path
+            if remove_outdated and not destination.exists() and outdated.get(file_hash):
+                old_rel_path = outdated[file_hash].pop()
+                try:
+                    os.replace(output_root / old_rel_path, destination)
+                    logger.info(f"Moved outdated file '{old_rel_path}' to '{rel_path}'.")
+                    self.destinations[rel_path] = file_hash
+                    self.counts["moved"] += 1
+                    continue
+                except OSError:
+                    pass
+            self._futures[rel_path] = (stager.stage(source, destination), file_hash)
+            self.counts["staged"] += 1
+
+        for file_hash, rel_paths in outdated.items():
+            for rel_path in rel_paths:
+                if not remove_outdated:
+                    # still tracked, e.g. to remove it later
+                    if (output_root / rel_path).exists():
+                        self.destinations[rel_path] = file_hash
+                    continue
+                (output_root / rel_path).unlink(missing_ok=True)
+                logger.info(f"Removed outdated file '{rel_path}'.")
+                self.counts["removed"] += 1
+        kept = sum(map(len, outdated.values())) if not remove_outdated else 0
+        if kept:
+            logger.info(f"Kept {kept} outdated files of the last run in '{output_root}'.")
+
+    def save(self):
+        destinations = self._old_destinations if self.destinations is None else dict(self.destinations)
+        for rel_path, (future, file_hash) in self._futures.items():
+            if future.done() and not future.exception():
+                destinations[rel_path] = file_hash
+        data = {
+            "version": self.VERSION,
+            "match_settings": self.match_settings,
+            "file_names": self.file_names,
+            "participants": self.participants,
+            "hashes": self.hashes if self.destinations is not None else {**self._old_hashes, **self.hashes},
+            "destinations": destinations,
+        }
+        temp_path = self.path.with_name("." + self.path.name)
+        temp_path.write_text(json.dumps(data, ensure_ascii=False, indent=1), encoding="utf-8")
+        os.replace(temp_path, self.path)
@@ -1,7 +1,20 @@
-from http.server import BaseHTTPRequestHandler, HTTPServer
+import io
+import logging
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Optional
+
+from fsklib.fsm.odfresult import LiveResults, write_result_csv, write_result_xlsx
+from fsklib.fsm.odfstore import OdfMessageStore
+from fsklib.utils.logging_helper import get_logger
+
+logger = get_logger(__name__, __file__)
+logger.setLevel(logging.INFO)
 
 
 class OdfRequestHandler(BaseHTTPRequestHandler):
+    server: "HOVTPServer"
+
     def set_header(self):
         self.send_response(200)
         self.send_header("Cache-Control", "no-cache")
@@ -13,28 +26,74 @@ class OdfRequestHandler(BaseHTTPRequestHandler):
         self.set_header()
 
     def do_POST(self):
-        self.set_header()
-        print(self.headers)
-        content_length = int(self.headers["Content-Length"])
+        content_length = int(self.headers.get("Content-Length", 0))
         post_data = self.rfile.read(content_length)
+        # queue before acknowledging to keep the order of the messages, storing is done by the writer thread
         if content_length > 0:
-            print(post_data)
+            self.server.store.put(post_data, self.serial_number())
+        self.set_header()
+
+    def do_GET(self):
+        # current results of all events, e.g. /result.xlsx or /result.csv
+        rows = self.server.results.rows()
+        if self.path.endswith(".csv"):
+            text = io.StringIO()
+            write_result_csv(rows, text)
+            body = text.getvalue().encode("utf-8")
+            content_type = "text/csv; charset=utf-8"
+        elif self.path.endswith(".xlsx"):
+            stream = io.BytesIO()
+            write_result_xlsx(rows, stream)
+            body = stream.getvalue()
+            content_type = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+        else:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def serial_number(self) -> Optional[int]:
+        for header in ["X-HOVTP-Serial-Number", "X-HOVTP-Last-Serial-Number"]:
+            try:
+                return int(self.headers[header])
+            except (TypeError, ValueError):
+                continue
+        return None
+
+    def log_message(self, format, *args):
+        logger.debug(format % args)
+
+
+class HOVTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, server_address, store: OdfMessageStore, results: Optional[LiveResults] = None):
+        super().__init__(server_address, OdfRequestHandler)
+        self.store = store
+        if results is None:
+            # latest results of the stored messages, updated with every received message
+            results = LiveResults()
+            results.load(store)
+        self.results = results
+        store.add_listener(results.update)
 
 
-def main():
-    host_name = "localhost"
-    server_port = 11111
-    web_server = HTTPServer((host_name, server_port), OdfRequestHandler)
-    print("Server started http://%s:%s" % (host_name, server_port))
+def main(host_name="localhost", server_port=11111, store_path=Path("odf_messages.sqlite")):
+    with OdfMessageStore(store_path) as store:
+        web_server = HOVTPServer((host_name, server_port), store)
+        print("Server started http://%s:%s" % (host_name, server_port))
 
-    try:
-        web_server.serve_forever()
-    except KeyboardInterrupt:
-        pass
+        try:
+            web_server.serve_forever()
+        except KeyboardInterrupt:
+            pass
 
-    web_server.server_close()
+        web_server.server_close()
     print("Server stopped.")
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,91 @@
+import logging
+from contextlib import contextmanager
+from typing import Dict, Iterator, Optional, Sequence, Tuple
+
+from mysql.connector import errors, pooling
+
+from fsklib.utils.logging_helper import get_logger
+
+logger = get_logger(__name__, __file__)
+logger.setLevel(logging.INFO)
+
+# default credentials of a FS Manager installation
+DEFAULT_USER = "sa"
+DEFAULT_PASSWORD = "fsmanager"
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 3306
+
+_pools: Dict[Tuple, pooling.MySQLConnectionPool] = {}
+
+
+def get_pool(user=DEFAULT_USER, password=DEFAULT_PASSWORD, host=DEFAULT_HOST, port=DEFAULT_PORT,
+             pool_size=2) -> pooling.MySQLConnectionPool:
+    # one small pool per server, the pool opens all of its connections at once
+    key = (user, password, host, int(port))
+    if key not in _pools:
+        logger.debug(f"Create connection pool for {user}@{host}:{port}")
+        _pools[key] = pooling.MySQLConnectionPool(pool_name=f"fsm{len(_pools)}", pool_size=pool_size,
+                                                  pool_reset_session=True,
+                                                  user=user, password=password, host=host, port=int(port))
+    return _pools[key]
+
+
+def close_pools():
+    """Close the connections of all pools, e.g. on shutdown after all connections were returned."""
+    while _pools:
+        _, pool = _pools.popitem()
+        while True:
+            try:
+                con = pool.get_connection()
+            except errors.Error:
+                break  # pool exhausted
+            con.disconnect()  # closes the server connection, `close()` would return it to the pool
+
+
+def connect(user=DEFAULT_USER, password=DEFAULT_PASSWORD, host=DEFAULT_HOST, port=DEFAULT_PORT,
+            database: Optional[str] = None) -> pooling.PooledMySQLConnection:
+    """Get a connection from the pool and select the database. `close()` returns it to the pool."""
+    con = get_pool(user, password, host, port).get_connection()
+    if database:
+        try:
+            con.cmd_init_db(database)  # like USE, but without building a statement
+        except BaseException:
+            con.close()
+            raise
+    return con
+
+
+@contextmanager
+def connection(**kwargs) -> Iterator[pooling.PooledMySQLConnection]:
+    con = connect(**kwargs)
+    try:
+        yield con
+    finally:
+        con.close()
+
+
+def query(con, statement: str, params: Sequence = (), prepared=True) -> Iterator[tuple]:
+    """Execute a parameterized statement (placeholder `%s`) and stream the resulting rows.
+
+    The rows are fetched one by one from the server. Consume all rows before running the next query
+    on the same connection. If the generator is closed early, the remaining rows are read and discarded.
+    """
+    cursor = con.cursor(prepared=prepared)
+    try:
+        cursor.execute(statement, tuple(params))
+        row = cursor.fetchone()
+        while row is not None:
+            try:
+                yield row
+            except GeneratorExit:
+                # unread rows would block the next query on the connection
+                cursor.fetchall()
+                raise
+            row = cursor.fetchone()
+    finally:
+        cursor.close()
+
+
+def query_one(con, statement: str, params: Sequence = (), prepared=True) -> Optional[tuple]:
+    rows = list(query(con, statement, params, prepared))
+    return rows[0] if rows else None
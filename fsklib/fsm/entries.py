@@ -0,0 +1,171 @@
+import logging
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from fsklib import model
+from fsklib.fsm import db
+from fsklib.utils.logging_helper import get_logger
+
+logger = get_logger(__name__, __file__)
+logger.setLevel(logging.INFO)
+
+
+def _person_columns(table: str) -> str:
+    return ", ".join(f"{table}.{column}" for column in
+                     ["FederationId", "FirstName", "LastName", "BirthDate", "Gender", "Nation_Id", "Club"])
+
+
+def read_clubs(con) -> Dict[str, str]:
+    # club abbreviation -> club name
+    clubs: Dict[str, str] = {}
+    for (short_name, name) in db.query(con, "SELECT ShortName, Name FROM club"):
+        clubs.setdefault(short_name, name)
+    return clubs
+
+
+def _where_competition(competition_id: Optional[int]) -> Tuple[str, tuple]:
+    if competition_id is None:
+        return "", ()
+    return "WHERE category.Competition_Id = %s ", (competition_id,)
+
+
+def _group_by_first_column(rows) -> Dict[int, List[tuple]]:
+    groups: Dict[int, List[tuple]] = {}
+    for (key, *values) in rows:
+        groups.setdefault(key, []).append(tuple(values))
+    return groups
+
+
+def _club(clubs: Dict[str, str], club_abbr: Optional[str], nation: str) -> model.Club:
+    if club_abbr is None:
+        club_abbr = ""
+    return model.Club(clubs.get(club_abbr, ""), club_abbr, nation)
+
+
+def _person(clubs: Dict[str, str], id, first_name, last_name, bday, gender, nation, club_abbr) -> model.Person:
+    return model.Person(id, first_name, last_name, model.Gender.from_value(gender, model.DataSource.FSM), bday,
+                        _club(clubs, club_abbr, nation))
+
+
+def _participant(cat: model.Category, row: tuple, clubs: Dict[str, str]) -> model.ParticipantBase:
+    if cat.type in [model.CategoryType.MEN, model.CategoryType.WOMEN]:
+        return model.ParticipantSingle(cat, _person(clubs, *row[:7]), model.Role.ATHLETE)
+    elif cat.type in [model.CategoryType.PAIRS, model.CategoryType.ICEDANCE]:
+        couple = model.Couple(_person(clubs, *row[:7]), _person(clubs, *row[7:14]))
+        return model.ParticipantCouple(cat, couple, model.Role.ATHLETE)
+    elif cat.type == model.CategoryType.SYNCHRON:
+        (id, name, nation, club_abbr) = row[:4]
+        sys_team = model.Team(id, name, _club(clubs, club_abbr, nation), [])
+        return model.ParticipantTeam(cat, sys_team, model.Role.ATHLETE)
+    raise Exception(f"Unsupported category type '{cat.type}'.")
+
+
+def _competitors_of_category_type(cat_type: model.CategoryType, competitors: Tuple[Dict[int, List[tuple]], ...]
+                                  ) -> Dict[int, List[tuple]]:
+    singles, couples, teams = competitors
+    if cat_type in [model.CategoryType.MEN, model.CategoryType.WOMEN]:
+        return singles
+    elif cat_type in [model.CategoryType.PAIRS, model.CategoryType.ICEDANCE]:
+        return couples
+    elif cat_type == model.CategoryType.SYNCHRON:
+        return teams
+    return {}
+
+
+def _read_competitors(con, select_key: str, from_tables: str, where: str, params: tuple, order_by: str,
+                      extra_columns="") -> Tuple[Dict[int, List[tuple]], ...]:
+    # one query per competitor type (singles, couples, sys teams) for all categories / segments
+    singles_query = (f"SELECT {select_key}, {_person_columns('person')}{extra_columns} "
+                     f"FROM {from_tables} "
+                     "    JOIN single ON entry.Competitor_Id = single.Competitor_Id_Pk "
+                     "    JOIN person ON person.Id = single.Person_Id ")
+    couples_query = (f"SELECT {select_key}, {_person_columns('partner1')}, "
+                     f"    {_person_columns('partner2')}{extra_columns} "
+                     f"FROM {from_tables} "
+                     "    JOIN couple ON entry.Competitor_Id = couple.Competitor_Id_Pk "
+                     "    JOIN person AS partner1 ON partner1.Id = couple.PersonLady_Id "
+                     "    JOIN person AS partner2 ON partner2.Id = couple.PersonMale_Id ")
+    teams_query = (f"SELECT {select_key}, synchronizedteam.FederationId, synchronizedteam.Name, "
+                   f"synchronizedteam.Nation_Id, synchronizedteam.Club{extra_columns} "
+                   f"FROM {from_tables} "
+                   "    JOIN synchronizedteam ON entry.Competitor_Id = synchronizedteam.Competitor_Id_Pk ")
+    result = []
+    for query in [singles_query, couples_query, teams_query]:
+        result.append(_group_by_first_column(db.query(con, query + where + order_by, params)))
+    return tuple(result)
+
+
+def read_entries(con, competition_id: Optional[int] = None
+                 ) -> Iterator[Tuple[model.ParticipantBase, List[model.Segment], int]]:
+    """Yield all entries as (participant, segments of category, number of entry within category)."""
+    clubs = read_clubs(con)
+    where, params = _where_competition(competition_id)
+
+    categories = list(db.query(con, "SELECT category.Id, category.Name, category.Level, category.Type, "
+                                    "category.SortOrder "
+                                    "FROM category " + where, params))
+
+    segments_by_category = _group_by_first_column(db.query(
+        con, "SELECT segment.Category_Id, segment.Name, segment.ShortName, segment.SegmentType "
+             "FROM segment "
+             "    JOIN category ON category.Id = segment.Category_Id "
+             + where + "ORDER BY segment.SegmentType ASC", params))
+
+    competitors = _read_competitors(con, "entry.Category_Id",
+                                    "entry JOIN category ON category.Id = entry.Category_Id",
+                                    where, params, "ORDER BY entry.Id ASC")
+
+    for (cat_id, cat_name, cat_level, cat_type, cat_order) in categories:
+        logger.debug(cat_name)
+        cat_type = model.CategoryType.from_value(cat_type, model.DataSource.FSM)
+        if cat_type is None:
+            cat_type = model.CategoryType.SINGLES
+        cat_level = model.CategoryLevel.from_value(cat_level, model.DataSource.FSM)
+        if cat_level is None:
+            cat_level = model.CategoryLevel.SENIOR
+        cat = model.Category(cat_name, cat_type, cat_level, cat_type.to_gender(), number=cat_order).validate()
+
+        segments = [model.Segment(name, short_name, model.SegmentType.from_value(segment_type, model.DataSource.FSM))
+                    for (name, short_name, segment_type) in segments_by_category.get(cat_id, [])]
+
+        rows = _competitors_of_category_type(cat_type, competitors).get(cat_id, [])
+        for number, row in enumerate(rows, 1):
+            yield _participant(cat, row, clubs), segments, number
+
+
+def read_starting_order(con, competition_id: Optional[int] = None
+                        ) -> Iterator[Tuple[model.ParticipantBase, model.Segment, int]]:
+    """Yield the starting order of all segments (sorted by start time) as (participant, segment, start number)."""
+    clubs = read_clubs(con)
+    where, params = _where_competition(competition_id)
+
+    # segments (including category info) sorted by start date
+    segments = list(db.query(con, "SELECT segment.Id, segment.Name, segment.ShortName, segment.SegmentType, "
+                                  "category.Name, category.Level, category.Type, category.SortOrder "
+                                  "FROM segment "
+                                  "    JOIN category ON segment.Category_Id = category.Id "
+                                  + where + "ORDER BY segment.StartTime ASC", params))
+
+    competitors = _read_competitors(con, "competitorresult.Segment_Id",
+                                    "competitorresult "
+                                    "    JOIN segment ON segment.Id = competitorresult.Segment_Id "
+                                    "    JOIN category ON category.Id = segment.Category_Id "
+                                    "    JOIN entry ON competitorresult.Entry_Id = entry.Id",
+                                    where, params, "ORDER BY competitorresult.StartNumber ASC",
+                                    extra_columns=", competitorresult.StartNumber")
+
+    for (seg_id, seg_name, seg_short_name, seg_type, cat_name, cat_level, cat_type, cat_order) in segments:
+        logger.debug(f"{cat_name} - {seg_name}")
+        cat_type = model.CategoryType.from_value(cat_type, model.DataSource.FSM)
+        if cat_type is None:
+            cat_type = model.CategoryType.WOMEN
+        cat_level = model.CategoryLevel.from_value(cat_level, model.DataSource.FSM)
+        if cat_level is None:
+            cat_level = model.CategoryLevel.SENIOR
+        seg_type = model.SegmentType.from_value(seg_type, model.DataSource.FSM)
+        if seg_type is None:
+            seg_type = model.SegmentType.FP
+        seg = model.Segment(seg_name, seg_short_name, seg_type)
+        cat = model.Category(cat_name, cat_type, cat_level, cat_type.to_gender(), (seg, ), cat_order).validate()
+
+        for row in _competitors_of_category_type(cat_type, competitors).get(seg_id, []):
+            yield _participant(cat, row[:-1], clubs), seg, row[-1]
@@ -0,0 +1,205 @@
+import csv
+import logging
+import threading
+from datetime import date
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+from xml.etree import ElementTree as ET
+
+from openpyxl import Workbook
+
+from fsklib.fsm.odfstore import OdfMessage, OdfMessageStore
+from fsklib.utils.logging_helper import get_logger
+
+logger = get_logger(__name__, __file__)
+logger.setLevel(logging.INFO)
+
+# columns of the DEU result file
+RESULT_HEADER = ["Wettbewerb/Prüfung",
+                 "Team ID",
+                 "Team Name",
+                 "ID ( ehm. Sportpassnr.)",
+                 "Name",
+                 "Vorname",
+                 "Geb. Datum",
+                 "Vereinskürzel",
+                 "Rolle",
+                 "Platz/Status",
+                 "Punkte"]
+
+RESULT_DOCUMENT_TYPES = ("DT_CUMULATIVE_RESULT", "DT_RESULT")
+
+
+def _check_attribute(attributes: dict, key):
+    if key not in attributes:
+        return ""
+    return attributes[key]
+
+
+def _check_id(attributes: dict) -> str:
+    if "IFId" not in attributes:
+        return ""
+
+    fid = attributes["IFId"]
+    try:
+        id_int = int(fid)
+        if id_int >= 999999:
+            return "999999"
+        elif id_int >= 888888:
+            return "888888"
+        else:
+            return fid
+    except:
+        return fid
+
+
+def _check_birthday(attributes: dict):
+    if not "BirthDate" in attributes:
+        return ""
+
+    try:
+        return date.fromisoformat(attributes["BirthDate"])
+    except:
+        return ""
+
+
+def read_result_rows(root: ET.Element, cat_name: str) -> List[list]:
+    """Rows of the DEU result file for all results of an ODF result message."""
+    data = []
+    for result in root.findall("Competition/Result"):
+        rank = ""
+        points = ""
+        if "Rank" not in result.attrib:
+            rank = "zurückgezogen"
+        elif "Result" in result.attrib:
+            rank = result.attrib["Rank"]
+            points = result.attrib["Result"]
+        else:
+            logger.warning(f"No points detected in {result}")
+            continue
+
+        athletes = list(result.findall("Competitor/Composition/Athlete/Description"))
+        team_id = ""
+        if not athletes:
+            # sys team
+            res_desc = result.find("Competitor/Description")
+            if res_desc is not None:
+                a = res_desc.attrib
+                d = [cat_name, _check_id(a), _check_attribute(a, "TeamName"), "", "", "", "", "", "TN", rank, points]
+                logger.debug(d)
+                data.append(d)
+        elif len(athletes) == 2:
+            # team id for pairs / dance
+            team_id = "-".join([_check_id(athlete.attrib) for athlete in athletes])
+            if len(team_id) < 11:
+                team_id = ""
+
+        for athlete in athletes:
+            a = athlete.attrib
+            family_name = _check_attribute(a, "FamilyName")
+            given_name = _check_attribute(a, "GivenName")
+            d = [cat_name, team_id, "", _check_id(a), family_name, given_name, _check_birthday(a), "", "TN",
+                 rank, points]
+            logger.debug(d)
+            error = False
+            if not rank and not points:
+                logger.warning("No result for:")
+                error = True
+            if not family_name or not given_name:
+                logger.warning("Family name or given name is missing for:")
+                error = True
+
+            if error:
+                logger.warning(d)
+                logger.warning("Skipping athlete!")
+            else:
+                data.append(d)
+    return data
+
+
+def write_result_xlsx(rows: Iterable[list], output_file_path) -> None:
+    # write-only workbook: rows are streamed to the file, output_file_path may also be a binary stream
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet()
+    ws.append(RESULT_HEADER)
+    for row in rows:
+        ws.append(row)
+    wb.save(output_file_path)
+
+
+def write_result_csv(rows: Iterable[list], output_file) -> None:
+    """Write the rows to a csv file (path or text stream)."""
+    if isinstance(output_file, (str, Path)):
+        with open(output_file, "w", newline="", encoding="utf-8") as f:
+            write_result_csv(rows, f)
+        return
+    csv_writer = csv.writer(output_file)
+    csv_writer.writerow(RESULT_HEADER)
+    csv_writer.writerows(rows)
+
+
+class LiveResults:
+    """Latest state of each event from ODF result messages (e.g. received via HOVTP).
+
+    Every message replaces only the state of its document (DocumentType, DocumentCode) if its version is not
+    older than the current one. The result rows are computed on update, reading them is cheap.
+    """
+
+    def __init__(self, document_types: Tuple[str, ...] = RESULT_DOCUMENT_TYPES) -> None:
+        self.document_types = document_types
+        # (document type, document code) -> (version, event name, result rows)
+        self.events: Dict[Tuple[str, str], Tuple[int, str, List[list]]] = {}
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def _version(version: str) -> int:
+        try:
+            return int(version)
+        except ValueError:
+            return 0
+
+    def update(self, message: OdfMessage) -> bool:
+        """Update the state of the event of the message. Returns `True` if the state has changed."""
+        if message.document_type not in self.document_types:
+            return False
+
+        key = (message.document_type, message.document_code or message.event_name or "")
+        version = self._version(message.version)
+        current = self.events.get(key)
+        if current is not None and current[0] > version:
+            logger.debug(f"Skip outdated message {key} version {version}")
+            return False
+
+        event_name = message.event_name or message.document_code
+        rows = read_result_rows(ET.fromstring(message.message), event_name)
+        with self.lock:
+            current = self.events.get(key)
+            if current is not None and current[0] > version:
+                return False
+            self.events[key] = (version, event_name, rows)
+        logger.debug(f"Updated {key} to version {version}")
+        return True
+
+    def load(self, store: OdfMessageStore) -> None:
+        """Replay all messages of a store."""
+        for document_type in self.document_types:
+            for message in store.messages(document_type):
+                self.update(message)
+
+    def rows(self, document_type="DT_CUMULATIVE_RESULT") -> List[list]:
+        with self.lock:
+            events = [state for (doc_type, _), state in self.events.items() if doc_type == document_type]
+        return [row for (_, _, rows) in events for row in rows]
+
+    def event_rows(self, event_name: str, document_type="DT_CUMULATIVE_RESULT") -> Optional[List[list]]:
+        with self.lock:
+            for (doc_type, _), (_, name, rows) in self.events.items():
+                if doc_type == document_type and name == event_name:
+                    return list(rows)
+        return None
+
+    def write_xlsx(self, output_file_path, document_type="DT_CUMULATIVE_RESULT") -> None:
+        write_result_xlsx(self.rows(document_type), output_file_path)
+
+    def write_csv(self, output_file_path, document_type="DT_CUMULATIVE_RESULT") -> None:
+        write_result_csv(self.rows(document_type), output_file_path)
@@ -0,0 +1,174 @@
+import logging
+import queue
+import sqlite3
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, NamedTuple, Optional, Tuple, Union
+from xml.etree import ElementTree as ET
+
+from fsklib.utils.logging_helper import get_logger
+
+logger = get_logger(__name__, __file__)
+logger.setLevel(logging.INFO)
+
+
+def read_odf_header(odf_message: Union[bytes, str], chunk_size=4096) -> Tuple[Dict[str, str], Optional[str]]:
+    """Return the attributes of the ODF root element and the event name of the sport description.
+
+    Only the beginning of the message is parsed.
+    """
+    parser = ET.XMLPullParser(events=("start", "end"))
+    path = []
+    root_attrib: Dict[str, str] = {}
+    for i in range(0, len(odf_message), chunk_size):
+        parser.feed(odf_message[i:i + chunk_size])
+        for event, elem in parser.read_events():
+            if event == "end":
+                path.pop()
+                if not path:
+                    # end of document without sport description
+                    return root_attrib, None
+                continue
+            path.append(elem.tag)
+            if len(path) == 1:
+                root_attrib = dict(elem.attrib)
+            elif path[1:] == ["Competition", "ExtendedInfos", "SportDescription"]:
+                return root_attrib, elem.attrib.get("EventName")
+            elif path[1:] == ["Competition", "Result"]:
+                # results follow the extended infos
+                return root_attrib, None
+    return root_attrib, None
+
+
+class OdfMessage(NamedTuple):
+    id: int
+    received: str
+    serial_number: Optional[int]
+    document_type: str
+    document_code: str
+    event_name: Optional[str]
+    version: str
+    message: bytes
+
+
+class OdfMessageStore:
+    """Persistent store of received ODF messages (SQLite).
+
+    Messages are added from any thread with `put()` and written by a single background thread.
+    Listeners are called by the writer thread for every stored message.
+    """
+    columns = "id, received, serial_number, document_type, document_code, event_name, version, message"
+
+    def __init__(self, path: Path) -> None:
+        self.path = Path(path)
+        self.queue: "queue.Queue[Optional[Tuple[bytes, Optional[int], str]]]" = queue.Queue()
+        self.thread: Optional[threading.Thread] = None
+        self.listeners: List[Callable[[OdfMessage], None]] = []
+        with self._connect() as con:
+            con.execute("CREATE TABLE IF NOT EXISTS message ("
+                        "    id INTEGER PRIMARY KEY AUTOINCREMENT,"
+                        "    received TEXT NOT NULL,"
+                        "    serial_number INTEGER,"
+                        "    document_type TEXT NOT NULL,"
+                        "    document_code TEXT NOT NULL,"
+                        "    event_name TEXT,"
+                        "    version TEXT NOT NULL,"
+                        "    message BLOB NOT NULL)")
+            con.execute("CREATE INDEX IF NOT EXISTS message_document "
+                        "ON message (document_type, document_code, serial_number)")
+            con.execute("CREATE INDEX IF NOT EXISTS message_received ON message (received)")
+        con.close()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.path)
+
+    def start(self) -> None:
+        if self.thread is None:
+            self.thread = threading.Thread(target=self._write_loop, name="OdfMessageStore", daemon=True)
+            self.thread.start()
+
+    def close(self) -> None:
+        """Write all queued messages and stop the writer thread."""
+        if self.thread is not None:
+            self.queue.put(None)
+            self.thread.join()
+            self.thread = None
+
+    def add_listener(self, listener: Callable[[OdfMessage], None]) -> None:
+        self.listeners.append(listener)
+
+    def put(self, message: bytes, serial_number: Optional[int] = None) -> None:
+        """Queue a message for writing, returns immediately."""
+        self.queue.put((message, serial_number, datetime.now().isoformat()))
+
+    def _write_loop(self) -> None:
+        con = self._connect()
+        try:
+            while True:
+                item = self.queue.get()
+                if item is None:
+                    break
+                items = [item]
+                # write all messages of a burst in one transaction
+                while True:
+                    try:
+                        item = self.queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    if item is None:
+                        self.queue.put(None)
+                        break
+                    items.append(item)
+                with con:
+                    stored = [self._insert(con, message, serial_number, received)
+                              for (message, serial_number, received) in items]
+                for message in stored:
+                    for listener in self.listeners:
+                        try:
+                            listener(message)
+                        except Exception:
+                            logger.exception(f"Processing of message {message.id} failed")
+        finally:
+            con.close()
+
+    @staticmethod
+    def _insert(con: sqlite3.Connection, message: bytes, serial_number: Optional[int], received: str) -> OdfMessage:
+        try:
+            header, event_name = read_odf_header(message)
+        except ET.ParseError:
+            logger.warning(f"Received invalid ODF message (serial number {serial_number})")
+            header, event_name = {}, None
+        values = (received, serial_number, header.get("DocumentType", ""), header.get("DocumentCode", ""),
+                  event_name, header.get("Version", ""), message)
+        cursor = con.execute("INSERT INTO message "
+                             "(received, serial_number, document_type, document_code, event_name, version, message) "
+                             "VALUES (?, ?, ?, ?, ?, ?, ?)", values)
+        logger.debug(f"Stored {header.get('DocumentType')} {header.get('DocumentCode')} ({serial_number})")
+        return OdfMessage(cursor.lastrowid, *values)
+
+    def messages(self, document_type: Optional[str] = None, document_code: Optional[str] = None,
+                 since_id: int = 0) -> Iterator[OdfMessage]:
+        """Yield stored messages in order of reception, optionally filtered."""
+        where = ["id > ?"]
+        params: list = [since_id]
+        if document_type is not None:
+            where.append("document_type = ?")
+            params.append(document_type)
+        if document_code is not None:
+            where.append("document_code = ?")
+            params.append(document_code)
+        con = self._connect()
+        try:
+            for row in con.execute(f"SELECT {self.columns} FROM message WHERE {' AND '.join(where)} ORDER BY id",
+                                   params):
+                yield OdfMessage(*row)
+        finally:
+            con.close()
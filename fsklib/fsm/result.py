@@ -1,132 +1,81 @@
+import itertools
 import logging
-from datetime import date
+from typing import Dict, Iterator, List, Optional, Tuple
 from xml.etree import ElementTree as ET
 
 import mysql.connector.connection
-from openpyxl import Workbook
 
+from fsklib.fsm import db
+from fsklib.fsm.odfresult import read_result_rows, write_result_xlsx
+from fsklib.fsm.odfstore import read_odf_header
 from fsklib.utils.logging_helper import get_logger
 
 logger = get_logger(__name__, __file__)
 logger.setLevel(logging.INFO)
 
+# event name of a result message, a constant XPath is required by ExtractValue and inlined into the statements
+EVENT_NAME_XPATH = "/OdfBody/Competition/ExtendedInfos/SportDescription/@EventName"
 
-def extract(db_connection: mysql.connector.connection, output_file_path, competition_code=""):
 
-    cursor = db_connection.cursor()
-    processed_categories = []
-    data = list()
-    data.append(["Wettbewerb/Prüfung",
-                 "Team ID",
-                 "Team Name",
-                 "ID ( ehm. Sportpassnr.)",
-                 "Name",
-                 "Vorname",
-                 "Geb. Datum",
-                 "Vereinskürzel",
-                 "Rolle",
-                 "Platz/Status",
-                 "Punkte"
-    ])
-
-    def check_attribute(attributes: dict, key):
-        if key not in attributes:
-            return ""
-        return attributes[key]
-
-    def check_id(attributes: dict) -> str:
-        if "IFId" not in attributes:
-            return ""
-
-        fid = attributes["IFId"]
-        try:
-            id_int = int(fid)
-            if id_int >= 999999:
-                return "999999"
-            elif id_int >= 888888:
-                return "888888"
-            else:
-                return fid
-        except:
-            return fid
-
-    def check_birthday(attributes: dict):
-        if not "BirthDate" in attributes:
-            return ""
-
-        try:
-            return date.fromisoformat(attributes["BirthDate"])
-        except:
-            return ""
-
-    # participant result from ODF messages
-    cursor.execute("SELECT Id, Message, OdfMessageType, Version, CreationStamp "
-                   "FROM odfmessage "
-                   "WHERE OdfMessageType = \"DT_CUMULATIVE_RESULT\" "
-                   "ORDER BY CreationStamp DESC")
-    for (odf_id, odf_message, odf_type, odf_message_version, odf_stamp) in list(cursor):
-        root = ET.fromstring(odf_message)
-        desc = root.find("Competition/ExtendedInfos/SportDescription")
-
-        if desc is None:
-            continue
+def read_event_name(odf_message) -> Optional[str]:
+    # pull parser stops as soon as the sport description is found
+    return read_odf_header(odf_message)[1]
+
+
+def read_latest_message_ids(db_connection, odf_message_type="DT_CUMULATIVE_RESULT") -> List[Tuple[int, str]]:
+    """Id and event name of the latest message of each event, newest event first.
 
-        cat_name = desc.attrib["EventName"]
+    The message blobs are not selected here, every message is parsed once by the database.
+    """
+    rows = db.query(db_connection,
+                    f"SELECT Id, ExtractValue(Message, '{EVENT_NAME_XPATH}') AS EventName "
+                    "FROM odfmessage "
+                    "WHERE OdfMessageType = %s "
+                    "ORDER BY CreationStamp DESC",
+                    (odf_message_type,))
+    latest_ids: Dict[str, int] = {}
+    for (odf_id, event_name) in rows:
+        if event_name and event_name not in latest_ids:
+            latest_ids[event_name] = odf_id
+    return [(odf_id, event_name) for event_name, odf_id in latest_ids.items()]
+
+
+def read_results(db_connection) -> Iterator[list]:
+    """Result rows of the latest DT_CUMULATIVE_RESULT message of each event."""
+    event_names = dict(read_latest_message_ids(db_connection))  # id -> event name
+    if not event_names:
+        return
 
-        if cat_name in processed_categories:
+    # the message blobs of all events in a single query, after the id query is consumed
+    messages = db.query(db_connection,
+                        "SELECT Id, Message FROM odfmessage "
+                        f"WHERE Id IN ({', '.join(['%s'] * len(event_names))}) "
+                        "ORDER BY CreationStamp DESC",
+                        list(event_names))
+    processed_events = set()
+    for (odf_id, odf_message) in messages:
+        # read only the header of the message to skip events that are already processed before the full parse
+        event_name = read_event_name(odf_message)
+        if event_name is None or event_name in processed_events:
             continue
 
-        logger.debug(cat_name)
-        processed_categories.append(cat_name)
-
-        for result in root.findall("Competition/Result"):
-            rank = ""
-            points = ""
-            if "Rank" not in result.attrib:
-                rank = "zurückgezogen"
-            elif "Result" in result.attrib:
-                rank = result.attrib["Rank"]
-                points = result.attrib["Result"]
-            else:
-                logger.warning(f"No points detected in {result}")
-                continue
-
-            athletes = list(result.findall("Competitor/Composition/Athlete/Description"))
-            team_id = ""
-            if not athletes:
-                # sys team
-                res_desc = result.find("Competitor/Description")
-                if res_desc is not None:
-                    a = res_desc.attrib
-                    d = [cat_name, check_id(a), check_attribute(a, "TeamName"), "", "", "", "", "", "TN", rank, points]
-                    logger.debug(d)
-                    data.append(d)
-            elif len(athletes) == 2:
-                # team id for pairs / dance
-                team_id = "-".join([check_id(athlete.attrib) for athlete in athletes])
-                if len(team_id) < 11:
-                    team_id = ""
-
-            for athlete in athletes:
-                a = athlete.attrib
-                family_name = check_attribute(a, "FamilyName")
-                given_name = check_attribute(a, "GivenName")
-                d = [cat_name, team_id, "", check_id(a), family_name, given_name, check_birthday(a), "", "TN", rank, points]
-                logger.debug(d)
-                error = False
-                if not rank and not points:
-                    logger.warning("No result for:")
-                    error = True
-                if not family_name or not given_name:
-                    logger.warning("Family name or given name is missing for:")
-                    error = True
-
-                if error:
-                    logger.warning(d)
-                    logger.warning("Skipping athlete!")
-                else:
-                    data.append(d)
+        logger.debug(event_name)
+        processed_events.add(event_name)
+        yield from read_result_rows(ET.fromstring(odf_message), event_name)
 
+
+def read_competition_id(db_connection, competition_code="") -> Optional[int]:
+    # always use the first competition in the database if no code is given
+    if competition_code:
+        row = db.query_one(db_connection, "SELECT Id FROM competition WHERE ShortName = %s LIMIT 1",
+                           (competition_code,))
+    else:
+        row = db.query_one(db_connection, "SELECT Id FROM competition LIMIT 1")
+    return row[0] if row else None
+
+
+def read_officials(db_connection, competition_id: int) -> Iterator[list]:
+    """Rows of all officials of all categories and segments (each official once per category and function)."""
     map_officials_from_FSM_to_DEU = {0: "SR",
                                      1: "PR",
                                      2: "TC",
@@ -136,46 +85,31 @@ def extract(db_connection: mysql.connector.connection, output_file_path, competi
                                      6: "RO"}
 
     official_data = set()
-    # get competition id, always use the first competition in the database
-    where = f" WHERE ShortName = \"{competition_code}\"" if competition_code else ""
-    cursor.execute("SELECT Id FROM competition" + where + " LIMIT 1")
-    row = cursor.fetchone()
-    if row:
-        competition_id = row[0]
-    else:
-        logger.critical("No competition found in database")
-        return
-
-    # get officials from categories and segments
-    cursor.execute(f"SELECT Id, Name, Level, Type, SortOrder FROM category WHERE Competition_Id = {str(competition_id)}")
-    for (cat_id, cat_name, cat_level, cat_type, cat_order) in list(cursor):
-        cursor.execute("SELECT Id, Name, ShortName, SegmentType FROM segment WHERE Category_Id = " + str(cat_id))
-        logger.debug(cat_name)
-
-        for (seg_id, seg_name, seg_short_name, seg_type) in list(cursor):
-            cursor.execute("SELECT person.FederationId, person.FirstName, person.LastName, person.BirthDate, officialinsegment.OfficialFunction "
-                           "FROM officialinsegment "
-                           "    JOIN person ON person.id = officialinsegment.Person_Id "
-                          f"WHERE officialinsegment.Segment_Id = {str(seg_id)} ")
-            logger.debug(seg_name)
-
-            for (fed_id, first_name, last_name, birthday, function) in list(cursor):
-                d = (cat_name, "", "", fed_id, last_name, first_name, birthday, "", map_officials_from_FSM_to_DEU[function], "", "")
-                logger.debug(d)
-                official_data.add(d)
-
-    data.extend([list(d) for d in official_data])
-
-    # close database connection
-    db_connection.close()
-
-    # create excel file
-    wb = Workbook()
-    ws = wb.active
-    for row in data:
-        ws.append(row)
-    wb.save(output_file_path)
-
+    officials = db.query(db_connection,
+                         "SELECT category.Name, person.FederationId, person.FirstName, person.LastName, "
+                         "    person.BirthDate, officialinsegment.OfficialFunction "
+                         "FROM officialinsegment "
+                         "    JOIN segment ON segment.Id = officialinsegment.Segment_Id "
+                         "    JOIN category ON category.Id = segment.Category_Id "
+                         "    JOIN person ON person.id = officialinsegment.Person_Id "
+                         "WHERE category.Competition_Id = %s", (competition_id,))
+
+    for (cat_name, fed_id, first_name, last_name, birthday, function) in officials:
+        d = (cat_name, "", "", fed_id, last_name, first_name, birthday, "",
+             map_officials_from_FSM_to_DEU[function], "", "")
+        if d in official_data:
+            continue
+        logger.debug(d)
+        official_data.add(d)
+        yield list(d)
 
 
+def extract(db_connection: mysql.connector.connection, output_file_path, competition_code=""):
+    competition_id = read_competition_id(db_connection, competition_code)
+    if competition_id is None:
+        logger.critical("No competition found in database")
+        return
 
+    # rows are written to the excel file while they are read from the database, the caller closes the connection
+    write_result_xlsx(itertools.chain(read_results(db_connection), read_officials(db_connection, competition_id)),
+                      output_file_path)
@@ -22,7 +22,10 @@ for category in root.iter('Category'):
     category_type = str(category.get('CAT_TYPE'))
     category_gender = str(category.get('CAT_GENDER'))
     category_level = str(category.get('CAT_LEVEL'))
-    cat = model.Category(category_name, model.CategoryType.from_value(category_type, data_src), model.CategoryLevel.from_value(category_level, data_src), model.Gender.from_value(category_gender, data_src))
+    cat = model.Category.validated(category_name,
+                                   model.CategoryType.from_value(category_type, data_src),
+                                   model.CategoryLevel.from_value(category_level, data_src),
+                                   model.Gender.from_value(category_gender, data_src))
     print(category_name)
 
     # build a map: participant id -> participant
@@ -79,7 +82,7 @@ for category in root.iter('Category'):
 
         if pct_type == 'PER':
             person = get_person(pct, club)
-            participant = model.ParticipantSingle(person, cat)
+            participant = model.ParticipantSingle.validated(cat, person)
         elif pct_type == 'COU':
             partners = []
             for person_xml in pct.findall('Team_Members/Person'):
@@ -88,11 +91,11 @@ for category in root.iter('Category'):
             if len(partners) < 2:
                 continue
             couple = model.Couple(partners[0], partners[1])
-            participant = model.ParticipantCouple(couple, cat)
+            participant = model.ParticipantCouple.validated(cat, couple)
         elif pct_type == 'PTS':
             team_name = str(pct.get('PCT_CNAME'))
-            team = model.Team(participant_id, team_name, club, [])
-            participant = model.ParticipantTeam(team, cat)
+            team = model.Team(str(participant_id), team_name, club, [])
+            participant = model.ParticipantTeam.validated(cat, team)
 
         if participant:
             participant_id_to_participant_data_map[participant_id] = participant
@@ -103,7 +106,8 @@ for category in root.iter('Category'):
         segment_abbr = str(segment_xml.get('SCP_SNAM'))
         segment_type = str(segment_xml.get('SCP_TYPE'))
         print(segment_name)
-        segment = model.Segment(segment_name, segment_abbr, model.SegmentType.from_value(segment_type, model.DataSource.CALC))
+        segment = model.Segment.validated(segment_name, segment_abbr,
+                                          model.SegmentType.from_value(segment_type, model.DataSource.CALC))
 
         # build a map: skating number -> participant data
         skating_number_to_participant_map = {}
@@ -1,10 +1,11 @@
+import dataclasses
 import datetime
+from dataclasses import dataclass, field
 from enum import Enum, IntEnum
-from typing import List, Optional, Tuple, Union
+from typing import Dict, List, Optional, Tuple, Union
 from typing_extensions import Self
 
-from pydantic import Field, model_validator
-from pydantic.dataclasses import dataclass
+from pydantic import TypeAdapter
 
 from fsklib.utils.common import normalize_string
 
@@ -17,14 +18,29 @@ class DataSource(IntEnum):
     ISU = 4
 
 
+# (enum class, data source) -> value -> member, created on first use
+_from_value_lookup: Dict[Tuple[type, DataSource], Dict] = {}
+
+
 class DataEnum(Enum):
     @classmethod
     def from_value(cls, value, data_source: DataSource):
-        cls.check_data_source(data_source)
-        for member in cls.__members__.values():
-            if member.value[data_source] == value:
-                return member
-        return None
+        """Return the member with the given value of the data source or None.
+
+        Values may be ambiguous (e.g. 'O' for CALC levels or 'QUAL' for ODF segment types). Then the first member in
+        order of definition is returned.
+        """
+        lookup = _from_value_lookup.get((cls, data_source))
+        if lookup is None:
+            cls.check_data_source(data_source)
+            lookup = {}
+            for member in cls.__members__.values():
+                lookup.setdefault(member.value[data_source], member)  # first match wins
+            _from_value_lookup[(cls, data_source)] = lookup
+        try:
+            return lookup.get(value)
+        except TypeError:  # unhashable value
+            return None
 
     @staticmethod
     def check_data_source(data_source: DataSource):
@@ -53,6 +69,47 @@ class DataEnum(Enum):
         return self._get_value(DataSource.ISU)
 
 
+# model class -> pydantic type adapter, created on first validation
+_type_adapters: Dict[type, TypeAdapter] = {}
+# model class -> field names, dataclasses.fields() is slow compared to the validation itself
+_field_names: Dict[type, Tuple[str, ...]] = {}
+
+
+class ModelBase:
+    """Base of the model classes.
+
+    The models are plain slotted dataclasses, creating them does not validate the values (fast for bulk imports).
+    Use `validated(...)` or `validate()` for values from untrusted input (e.g. registration forms or PPC files).
+    Nested models are validated again and copied, so validate shared parts (e.g. categories or clubs) once and
+    combine the validated parts with the plain constructor.
+    """
+    __slots__ = ()
+
+    @classmethod
+    def validated(cls, *args, **kwargs) -> Self:
+        """Create a validated instance, like the constructor of a pydantic dataclass."""
+        return cls(*args, **kwargs).validate()
+
+    def validate(self) -> Self:
+        """Return a validated copy, values are converted like by pydantic. Raises pydantic.ValidationError."""
+        cls = type(self)
+        if cls not in _type_adapters:
+            _type_adapters[cls] = TypeAdapter(cls)
+        # nested models are passed as dicts, otherwise pydantic would accept them without validation
+        return _type_adapters[cls].validate_python(_validation_input(self))
+
+
+def _validation_input(value):
+    if isinstance(value, ModelBase):
+        cls = type(value)
+        if cls not in _field_names:
+            _field_names[cls] = tuple(f.name for f in dataclasses.fields(cls))
+        return {name: _validation_input(getattr(value, name)) for name in _field_names[cls]}
+    elif isinstance(value, (list, tuple)):
+        return type(value)(_validation_input(v) for v in value)
+    return value
+
+
 class Gender(DataEnum):
     MALE = (0, 'M', 'M')
     FEMALE = (1, 'F', 'W')
@@ -64,21 +121,21 @@ class Gender(DataEnum):
             raise Exception("Invalid input data source.")
 
 
-@dataclass
-class Club:
+@dataclass(slots=True)
+class Club(ModelBase):
     name: str = ''
     abbr: str = ''
     nation: str = ''
 
 
-@dataclass
-class Person:
+@dataclass(slots=True)
+class Person(ModelBase):
     id: str = ''
     first_name: str = ''
     family_name: str = ''
-    gender: Gender = Field(Gender.FEMALE)
-    bday: datetime.date = Field(datetime.date.today())
-    club: Club = Field(Club())
+    gender: Gender = Gender.FEMALE
+    bday: datetime.date = field(default_factory=datetime.date.today)
+    club: Club = field(default_factory=Club)
 
     @property
     def name(self) -> str:
@@ -101,8 +158,8 @@ class SegmentType(DataEnum):
             raise Exception("Invalid input data source.")
 
 
-@dataclass(frozen=True)
-class Segment:
+@dataclass(frozen=True, slots=True)
+class Segment(ModelBase):
     name: str
     abbr: str
     type: SegmentType
@@ -146,37 +203,37 @@ class CategoryLevel(DataEnum):
         return self.ISU() is not None
 
 
-@dataclass(frozen=True)
-class Category:
+@dataclass(frozen=True, slots=True)
+class Category(ModelBase):
     name: str
     type: CategoryType
     level: Union[CategoryLevel, str]
     gender: Optional[Gender]
-    segments: Tuple[Segment] = Field(default_factory=tuple)
+    segments: Tuple[Segment, ...] = field(default_factory=tuple)
     number: int = 0
 
-    @model_validator(mode='after')
-    def correct_gender(self) -> Self:
+    def __post_init__(self):
+        # correct gender
         if not self.gender:
-            self.gender = self.type.to_gender()
-        return self
+            object.__setattr__(self, "gender", self.type.to_gender())
 
-    def add_segment(self, segment: Segment):
-        self.segments = (*self.segments, segment)
+    def add_segment(self, segment: Segment) -> "Category":
+        """Return a copy with the segment appended, categories are frozen and hashed."""
+        return dataclasses.replace(self, segments=(*self.segments, segment))
 
 
-@dataclass
-class Couple:
+@dataclass(slots=True)
+class Couple(ModelBase):
     partner_1: Optional[Person]
     partner_2: Optional[Person]
 
 
-@dataclass
-class Team:
+@dataclass(slots=True)
+class Team(ModelBase):
     id: str
     name: str  # could be sys team name or couple name
     club: Club  # also holds the nation
-    persons: List[Person] = Field(default_factory=list)  # for couples or SYS
+    persons: List[Person] = field(default_factory=list)  # for couples or SYS
 
 
 class Role(DataEnum):
@@ -197,24 +254,21 @@ class Role(DataEnum):
             raise Exception("Invalid input data source.")
 
 
-@dataclass
-class ParticipantBase:
+@dataclass(slots=True)
+class ParticipantBase(ModelBase):
     category: Category
 
     def get_normalized_name(self) -> str:
         pass
 
 
-@dataclass
-class ParticipantBaseDefaults:
-    role: Role = Field(Role.ATHLETE)
-    status: Optional[str] = Field(None)
-    points: Optional[str] = Field(None)
-
-
-@dataclass
-class ParticipantSingleBase(ParticipantBase):
+# participant fields: category, person / couple / team, role, status, points
+@dataclass(slots=True)
+class ParticipantSingle(ParticipantBase):
     person: Person
+    role: Role = Role.ATHLETE
+    status: Optional[str] = None
+    points: Optional[str] = None
 
     def get_normalized_name(self, reverse=False) -> str:
         if reverse:
@@ -223,14 +277,12 @@ class ParticipantSingleBase(ParticipantBase):
             return normalize_string(self.person.first_name + self.person.family_name)
 
 
-@dataclass
-class ParticipantSingle(ParticipantBaseDefaults, ParticipantSingleBase):
-    pass
-
-
-@dataclass
-class ParticipantCoupleBase(ParticipantBase):
+@dataclass(slots=True)
+class ParticipantCouple(ParticipantBase):
     couple: Couple
+    role: Role = Role.ATHLETE
+    status: Optional[str] = None
+    points: Optional[str] = None
 
     def get_normalized_name(self) -> str:
         name = "".join([
@@ -240,26 +292,19 @@ class ParticipantCoupleBase(ParticipantBase):
         return normalize_string(name)
 
 
-@dataclass
-class ParticipantCouple(ParticipantBaseDefaults, ParticipantCoupleBase):
-    pass
-
-
-@dataclass
-class ParticipantTeamBase(ParticipantBase):
+@dataclass(slots=True)
+class ParticipantTeam(ParticipantBase):
     team: Team
+    role: Role = Role.ATHLETE
+    status: Optional[str] = None
+    points: Optional[str] = None
 
     def get_normalized_name(self) -> str:
         return normalize_string(self.team.name)
 
 
-@dataclass
-class ParticipantTeam(ParticipantBaseDefaults, ParticipantTeamBase):
-    pass
-
-
-@dataclass
-class Competition:
+@dataclass(slots=True)
+class Competition(ModelBase):
     name: str
     organizer: str
     place: str
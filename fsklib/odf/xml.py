@@ -1,13 +1,22 @@
+import os
 from pathlib import Path
-from typing import Optional
+from typing import Callable, Iterable, Iterator, List, Optional, TextIO, Union
+from xml.sax.saxutils import escape
 import xml.etree.ElementTree as ET
 
+ParticipantCallback = Optional[Callable[[ET.Element], None]]
+
+_ATTRIB_ENTITIES = {'"': "&quot;", "\n": "&#10;", "\r": "&#13;", "\t": "&#09;"}
+
 
 class OdfUpdater:
+    default_tags = ("Participant", "Team")
+
     def __init__(self, odf_xml_path: Path,
                  output_path: Optional[Path] = None,
                  suffix="_new",
-                 override=False) -> None:
+                 override=False,
+                 streaming=False) -> None:
         self.input_path = odf_xml_path
         if output_path:
             self.output_path = output_path
@@ -15,7 +24,10 @@ class OdfUpdater:
             self.output_path = self.input_path
         else:
             self.output_path = self.input_path.parent / (self.input_path.stem + suffix + self.input_path.suffix)
-        self.root: Optional[ET.ElementTree] = None
+        # streaming: participants are read, updated and written one by one -> constant memory for large files
+        self.streaming = streaming
+        self.root: Optional[ET.Element] = None
+        self._streamed = False
 
     def __enter__(self):
         self.read_xml()
@@ -26,12 +38,159 @@ class OdfUpdater:
         self.root = None
 
     def read_xml(self) -> None:
-        self.root = ET.parse(self.input_path).getroot()
+        if self.streaming:
+            # only keep the root element with its attributes, the children are read in `process()`
+            with open(self.input_path, "rb") as fp:
+                for _, elem in ET.iterparse(fp, events=("start",)):
+                    self.root = ET.Element(elem.tag, elem.attrib)
+                    break
+            self._streamed = False
+        else:
+            self.root = ET.parse(self.input_path).getroot()
+
+    def process(self, callback: ParticipantCallback, tags: Union[str, Iterable[str]] = default_tags) -> None:
+        """Call `callback` for every element with one of the given tags (e.g. every `Participant`).
+
+        In streaming mode the input file is read, updated and written in a single pass. Thus,
+        `process()` can only be called once per `read_xml()`.
+        """
+        tags = {tags} if isinstance(tags, str) else set(tags)
+        if self.root is None:
+            return
+
+        if not self.streaming:
+            for elem in [elem for elem in self.root.iter() if elem.tag in tags]:
+                callback(elem)
+            return
+
+        if self._streamed:
+            raise Exception("ODF file has already been processed. Streaming mode allows only a single pass.")
+
+        # write to a temporary file first, input and output might be the same file
+        tmp_path = self.output_path.with_name(self.output_path.name + ".tmp")
+        try:
+            with open(tmp_path, "w", encoding="utf-8", newline="") as fp:
+                _OdfStreamWriter(fp, callback, tags).run(self.input_path)
+            os.replace(tmp_path, self.output_path)
+        finally:
+            tmp_path.unlink(missing_ok=True)
+        self._streamed = True
+
+    def iterate(self, tags: Union[str, Iterable[str]] = default_tags) -> Iterator[ET.Element]:
+        """Iterate over all elements with one of the given tags without changing the output.
+
+        In streaming mode the input file is read in an additional pass and the elements are cleared afterwards.
+        """
+        tags = {tags} if isinstance(tags, str) else set(tags)
+        if self.root is None:
+            return
+
+        if not self.streaming:
+            yield from [elem for elem in self.root.iter() if elem.tag in tags]
+            return
+
+        stack: List[ET.Element] = []
+        depth = 0  # number of open elements with a matching tag
+        for event, elem in ET.iterparse(self.input_path, events=("start", "end")):
+            if event == "start":
+                stack.append(elem)
+                depth += elem.tag in tags
+                continue
+            stack.pop()
+            if elem.tag not in tags:
+                continue
+            depth -= 1
+            if depth == 0:
+                yield elem
+                elem.clear()
+                if stack:
+                    stack[-1].remove(elem)
 
     def write_xml(self):
         if self.root is None:
             return
 
+        if self.streaming:
+            if not self._streamed:
+                self.process(None)  # copy input without any changes
+            return
+
         xmlstr = ET.tostring(self.root, xml_declaration=True, encoding="utf-8")
         with open(self.output_path, "wb") as fp:
             fp.write(xmlstr)
+
+
+class _OdfStreamWriter:
+    # Writes the input xml incrementally while parsing it with iterparse. Subtrees with a matching tag are
+    # passed to the callback, written and removed from the tree afterwards. The output is identical to
+    # `ET.tostring(root, xml_declaration=True, encoding="utf-8")` of the (updated) tree.
+
+    def __init__(self, fp: TextIO, callback: ParticipantCallback, tags: Iterable[str]) -> None:
+        self.fp = fp
+        self.callback = callback
+        self.tags = set(tags)
+        self.stack: List[List] = []  # open elements: [element, is start tag written]
+        self.last: Optional[ET.Element] = None  # tail of the last written element is known only later
+        self.subtree_depth = 0
+
+    @staticmethod
+    def _start_tag(elem: ET.Element) -> str:
+        attrib = "".join(f' {key}="{escape(value, _ATTRIB_ENTITIES)}"' for key, value in elem.attrib.items())
+        return f"<{elem.tag}{attrib}>" + escape(elem.text or "")
+
+    @staticmethod
+    def _to_string(elem: ET.Element) -> str:
+        tail, elem.tail = elem.tail, None
+        xmlstr = ET.tostring(elem, encoding="unicode")
+        elem.tail = tail
+        return xmlstr
+
+    def _write(self, xmlstr: str, elem: Optional[ET.Element] = None) -> None:
+        if self.last is not None:
+            self.fp.write(escape(self.last.tail or ""))
+        self.fp.write(xmlstr)
+        self.last = elem
+
+    def _write_start_tags(self) -> None:
+        for entry in self.stack:
+            if not entry[1]:
+                self._write(self._start_tag(entry[0]))
+                entry[1] = True
+
+    def _remove_from_parent(self, elem: ET.Element) -> None:
+        if self.stack:
+            self.stack[-1][0].remove(elem)
+
+    def run(self, input_path: Path) -> None:
+        self.fp.write("<?xml version='1.0' encoding='utf-8'?>\n")
+        for event, elem in ET.iterparse(input_path, events=("start", "end")):
+            if event == "start":
+                if self.subtree_depth:
+                    self.subtree_depth += 1
+                elif elem.tag in self.tags:
+                    self.subtree_depth = 1
+                else:
+                    self.stack.append([elem, False])
+                continue
+
+            if self.subtree_depth:
+                self.subtree_depth -= 1
+                if self.subtree_depth:
+                    continue
+                if self.callback:
+                    self.callback(elem)
+                self._write_start_tags()
+                self._write(self._to_string(elem), elem)
+                tail = elem.tail
+                elem.clear()
+                elem.tail = tail
+                self._remove_from_parent(elem)
+                continue
+
+            elem, is_open = self.stack.pop()
+            if is_open:
+                self._write(f"</{elem.tag}>", elem)
+            else:
+                self._write_start_tags()
+                self._write(self._to_string(elem), elem)
+            self._remove_from_parent(elem)
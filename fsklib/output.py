@@ -5,7 +5,6 @@ import shutil
 import xml.etree.ElementTree as ET
 from datetime import datetime
 from typing import Dict, List, Set
-from xml.dom import minidom
 
 from fsklib import model
 from fsklib.odf.rsc import RSC
@@ -177,11 +176,25 @@ class ParticipantCsvOutput(OutputBase):
             csv_writer.writerows(self.participant_csv_data)
 
 
+class _ShortEmptyElementWriter:
+    """Write empty elements as <tag/> like minidom, ElementTree writes the end of empty elements as one ' />'."""
+
+    def __init__(self, stream):
+        self.stream = stream
+
+    def write(self, data: str) -> int:
+        return self.stream.write("/>" if data == " />" else data)
+
+
 class OdfParticOutput(OutputBase):
-    def __init__(self, dir_path: pathlib.Path) -> None:
+    def __init__(self, dir_path: pathlib.Path, indent=True) -> None:
         super().__init__(dir_path)
+        self.indent = indent  # False -> compact xml without whitespace (e.g. for FSM imports)
         self.competition_elem = ET.Element("Competition")
         self.competition_elem_couples = ET.Element("Competition")
+        # lookup tables to avoid searching the whole tree for every participant
+        self.participant_elems: Dict[str, ET.Element] = {}  # IFId -> Participant element
+        self.team_discipline_elems: Dict[str, ET.Element] = {}  # IFId -> Discipline element of Team
         self.disciplin = "FSK" + 31 * "-"
         self.accreditation_id = 1
         self.competition: model.Competition
@@ -203,7 +216,7 @@ class OdfParticOutput(OutputBase):
         #         persons.append(person)
         accreditation_ids = []
         for person in persons:
-            par_elem = self.competition_elem.find(f"./Participant/Discipline[@IFId='{person.id}']/..")
+            par_elem = self.participant_elems.get(person.id)
             if par_elem is None:
                 continue
             dis_elem = list(par_elem)[0]  # there is always only one child -> Discipline
@@ -231,7 +244,7 @@ class OdfParticOutput(OutputBase):
                 nation += "/" + participant.couple.partner_2.club.nation
             team_id = f"{participant.couple.partner_1.id}-{participant.couple.partner_2.id}"
 
-            dis_elem = self.competition_elem_couples.find(f"./Team/Discipline[@IFId='{team_id}']")
+            dis_elem = self.team_discipline_elems.get(team_id)
             if dis_elem is None:
                 team_attrib = {
                     "Code": str(self.accreditation_id),
@@ -252,6 +265,7 @@ class OdfParticOutput(OutputBase):
                     ET.SubElement(comp_elem, "Athlete", {"Code": id, "Order": str(count)})
 
                 dis_elem = ET.SubElement(team_elem, "Discipline", {"Code": self.disciplin, "IFId": team_id})
+                self.team_discipline_elems[team_id] = dis_elem
 
             event_elem = ET.SubElement(dis_elem, "RegisteredEvent", {"Event": RSC.get_discipline_code(category)})
 
@@ -272,6 +286,7 @@ class OdfParticOutput(OutputBase):
             team_elem = ET.SubElement(self.competition_elem_couples, "Team", team_attrib)
 
             dis_elem = ET.SubElement(team_elem, "Discipline", {"Code": self.disciplin, "IFId": participant.team.id})
+            self.team_discipline_elems.setdefault(participant.team.id, dis_elem)
             event_elem = ET.SubElement(dis_elem, "RegisteredEvent", {"Event": RSC.get_discipline_code(category)})
             event_club_attrib = {
                 "Type": "ER_EXTENDED",
@@ -306,6 +321,7 @@ class OdfParticOutput(OutputBase):
             }
         par_elem = ET.SubElement(self.competition_elem, "Participant", attrib=participant_attrib)
         ET.SubElement(par_elem, "Discipline", {"Code": self.disciplin, "IFId": person.id})
+        self.participant_elems.setdefault(person.id, par_elem)  # first match wins, as with find()
 
         self.accreditation_id += 1
 
@@ -330,9 +346,15 @@ class OdfParticOutput(OutputBase):
                 self.path.parent.mkdir(parents=True)
 
             def write_xml(path: pathlib.Path, root: ET.Element, name: str) -> None:
-                xmlstr = minidom.parseString(ET.tostring(root, xml_declaration=True)).toprettyxml(indent="  ")
+                # serialize directly to the file without an intermediate string copy
+                tree = ET.ElementTree(root)
+                if self.indent:
+                    ET.indent(tree, space="  ")
                 with open(str(path / name), "w", encoding="utf-8") as f:
-                    f.write(xmlstr)
+                    # same declaration and empty elements as the former minidom output
+                    f.write('<?xml version="1.0" ?>\n')
+                    tree.write(_ShortEmptyElementWriter(f), encoding="unicode")
+                    f.write("\n")
 
             if len(self.competition_elem):
                 root = ET.Element("OdfBody", odf_attribute)
@@ -0,0 +1,252 @@
+import csv
+import filecmp
+import logging
+import os
+import string
+import unicodedata
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Set, Union
+
+from fsklib.filematching import FileNameIndex, ParticipantFileManifest, find_file_name_for_participant
+from fsklib.utils.common import normalize_string, write_text_if_changed
+from fsklib.utils.logging_helper import get_logger
+from fsklib.utils.staging import DEFAULT_METHODS, FileStager, StagingMethod
+
+logger = get_logger(__name__, __file__)
+logger.setLevel(logging.INFO)
+
+
+@dataclass
+class SortConfig:
+    """Settings to sort participant files (music or PPCs) into category / segment folders."""
+    input_dir: Path
+    output_root_dir: Path
+    find_segment_type: bool = True
+    force_segment_type: str = ''  # S -> short or rhythm dance; F -> free skating/ dance
+    ignore_segment_in_output_structure: bool = False
+    create_directory_structure: bool = True
+    copy_files: bool = True
+    rename_files: bool = True
+    add_skating_number_to_file_name: bool = True
+    create_m3u_playlist: bool = False  # one playlist per category and segment
+    # hardlinks share the data with the input file (do not edit the sorted files), then reflinks and copies
+    staging_methods: Sequence[StagingMethod] = DEFAULT_METHODS
+    max_workers: Optional[int] = None  # threads for copies
+    use_manifest: bool = True  # only process changed participants and files again (if files are copied)
+    remove_outdated_files: bool = False  # move or remove files of the last run, which are not in the starting order
+
+    def __post_init__(self):
+        self.input_dir = Path(self.input_dir)
+        self.output_root_dir = Path(self.output_root_dir)
+
+    @classmethod
+    def music(cls, input_dir: Union[str, Path], output_root_dir: Union[str, Path], **kwargs) -> "SortConfig":
+        return cls(input_dir, output_root_dir, **kwargs)
+
+    @classmethod
+    def ppc(cls, input_dir: Union[str, Path], output_root_dir: Union[str, Path], **kwargs) -> "SortConfig":
+        kwargs = {"find_segment_type": False, "ignore_segment_in_output_structure": True, **kwargs}
+        return cls(input_dir, output_root_dir, **kwargs)
+
+
+@dataclass
+class SortedParticipant:
+    row: Dict[str, str]  # starting order row with additional columns 'Status' and 'Musik'
+    files: List[str]  # matching input files
+    output_file_path: Optional[Path] = None
+
+
+@dataclass
+class SortStatistics:
+    participants: int = 0
+    found: int = 0
+    missing: int = 0
+    ambiguous: int = 0
+    files_found: Set[str] = field(default_factory=set)
+
+
+# return a valid directory / filename that can be stored to disc
+def valid_filename(filename):
+    filename = filename.replace(' ', '_').replace('/', '-').replace('ä', 'ae').replace('ö', 'oe').replace('ü', 'ue')
+
+    whitelist = "-_.() %s%s" % (string.ascii_letters, string.digits)
+    char_limit = 255
+    # keep only valid ascii chars
+    cleaned_filename = unicodedata.normalize('NFKD', filename).encode('ASCII', 'ignore').decode()
+
+    # keep only whitelisted chars
+    cleaned_filename = ''.join(c for c in cleaned_filename if c in whitelist)
+    if len(cleaned_filename) > char_limit:
+        logger.warning("Filename truncated because it was over {}. Filenames may no longer be unique"
+                       .format(char_limit))
+    return cleaned_filename[:char_limit]
+
+
+def read_starting_order(path: Union[str, Path], encoding='utf-8') -> Iterator[Dict[str, str]]:
+    """Rows of a starting order csv file, read one after another."""
+    with open(path, 'r', encoding=encoding, newline='') as f:
+        yield from csv.DictReader(f)
+
+
+def write_participants_csv(participants: Iterable[SortedParticipant], path: Union[str, Path]) -> bool:
+    """Write the rows while the participants are sorted, the file is only replaced if it changed."""
+    path = Path(path)
+    temp_path = path.with_name('.' + path.name)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    writer = None
+    with open(temp_path, 'w', encoding='utf-8', newline='') as csv_file:
+        for participant in participants:
+            if writer is None:
+                writer = csv.DictWriter(csv_file, participant.row.keys())
+                writer.writeheader()
+            writer.writerow(participant.row)
+
+    if writer is None or (path.exists() and filecmp.cmp(temp_path, path, shallow=False)):
+        temp_path.unlink()
+        return False
+    os.replace(temp_path, path)
+    logger.info("Writing csv file '%s'" % path)
+    return True
+
+
+class ParticipantFileSorter:
+    """Sort the files of the participants of starting orders into category and segment folders.
+
+    The steps are generators, rows are processed one by one: match -> stage -> playlists. Files are staged while the
+    rows are processed. Call `close()` afterward to move or remove outdated files, wait for the copies and store the
+    manifest.
+    """
+
+    def __init__(self, config: SortConfig):
+        self.config = config
+        self.file_names = os.listdir(config.input_dir)
+        # normalized file names are indexed once for all participants
+        self.index = FileNameIndex(self.file_names)
+        self.manifest = None
+        if config.use_manifest and config.copy_files:
+            self.manifest = ParticipantFileManifest(
+                config.output_root_dir, self.file_names,
+                {'find_segment_type': config.find_segment_type, 'force_segment_type': config.force_segment_type})
+        # files with same size and modification time are not copied again, copies run in parallel
+        self.stager = FileStager(config.staging_methods, config.max_workers)
+        self.statistics = SortStatistics()
+        self._directories: Set[Path] = set()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def run(self, rows: Iterable[Dict[str, str]]) -> Iterator[SortedParticipant]:
+        return self.playlists(self.stage(self.match(rows)))
+
+    def match(self, rows: Iterable[Dict[str, str]]) -> Iterator[SortedParticipant]:
+        cat_name_old = ''
+        seg_name_old = ''
+        for row in rows:
+            if cat_name_old != row['Kategorie-Name']:
+                cat_name_old = row['Kategorie-Name']
+                logger.info('# ' + cat_name_old)
+            if seg_name_old != row['Segment-Name']:
+                seg_name_old = row['Segment-Name']
+                logger.info('## ' + seg_name_old)
+
+            if self.manifest:
+                files = self.manifest.match(row, self.index, self.config.find_segment_type,
+                                            self.config.force_segment_type)
+            else:
+                files = find_file_name_for_participant(row, self.index, self.config.find_segment_type,
+                                                       self.config.force_segment_type)
+            row['Status'] = ''
+            row['Musik'] = ''
+            yield SortedParticipant(row, files)
+
+    def stage(self, participants: Iterable[SortedParticipant]) -> Iterator[SortedParticipant]:
+        config = self.config
+        for participant in participants:
+            row = participant.row
+            self.statistics.participants += 1
+            output_dir = self.output_dir(row)
+            if config.create_directory_structure and output_dir not in self._directories:
+                output_dir.mkdir(parents=True, exist_ok=True)
+                self._directories.add(output_dir)
+
+            if len(participant.files) < 1:
+                self.statistics.missing += 1
+            elif len(participant.files) > 1:  # multiple files found
+                self.statistics.ambiguous += 1
+            else:
+                self.statistics.found += 1
+                self.statistics.files_found.update(participant.files)
+                input_file_name = participant.files[0]
+                participant.output_file_path = output_dir / self.output_file_name(row, input_file_name)
+                if config.copy_files:
+                    input_file_path = config.input_dir / input_file_name
+                    if self.manifest:
+                        self.manifest.stage(input_file_path, participant.output_file_path,
+                                            self.stager, config.remove_outdated_files)
+                    else:
+                        self.stager.stage(input_file_path, participant.output_file_path)
+                row['Musik'] = participant.output_file_path.name
+            yield participant
+
+    def playlists(self, participants: Iterable[SortedParticipant]) -> Iterator[SortedParticipant]:
+        """Write one playlist per category and segment, sorted by starting number."""
+        group = None
+        playlist: Dict[int, Path] = {}
+        for participant in participants:
+            row = participant.row
+            if group != (row['Kategorie-Name'], row['Segment-Name']):
+                self.write_playlist(playlist)
+                group = (row['Kategorie-Name'], row['Segment-Name'])
+                playlist = {}
+            if self.config.create_m3u_playlist and row['Startnummer'] and participant.output_file_path:
+                playlist[int(row['Startnummer'])] = participant.output_file_path
+            yield participant
+        self.write_playlist(playlist)
+
+    @staticmethod
+    def write_playlist(playlist: Dict[int, Path]):
+        if playlist:
+            playlist_path = next(iter(playlist.values())).parent / '0 - Playlist.m3u'
+            write_text_if_changed(playlist_path, ''.join('%s\n' % p.name for n, p in sorted(playlist.items())))
+
+    def output_dir(self, row: Dict[str, str]) -> Path:
+        cat_dir_name = valid_filename(row['Kategorie-Name'])
+        if self.config.ignore_segment_in_output_structure:
+            return self.config.output_root_dir / cat_dir_name
+        return self.config.output_root_dir / cat_dir_name / row['Segment-Abk.']
+
+    def output_file_name(self, row: Dict[str, str], input_file_name: str) -> str:
+        output_file_name = ''
+        if self.config.add_skating_number_to_file_name:
+            output_file_name = '%02d-' % int(row['Startnummer'])
+        if self.config.rename_files:
+            name = row['Vorname'] + '-' + row['Name']
+            # use team name for couples or teams
+            if row['Kategorie-Typ'] != 'S':
+                name = row['Team-Name'].replace(' ', '-').replace('/', '-')
+            output_file_name += normalize_string(name).strip() + os.path.splitext(input_file_name)[1]
+        else:
+            output_file_name += input_file_name
+        return output_file_name
+
+    def unused_files(self) -> List[str]:
+        return [f for f in self.file_names if f not in self.statistics.files_found]
+
+    def close(self):
+        if self.manifest:
+            self.manifest.apply(self.stager, self.config.remove_outdated_files)
+        self.stager.close()
+        if self.manifest and self.config.output_root_dir.is_dir():
+            self.manifest.save()
+
+
+def sort_participant_files(starting_order_path: Union[str, Path], config: SortConfig) -> ParticipantFileSorter:
+    """Sort the files of all participants of the starting order and write participants.csv to the output directory."""
+    with ParticipantFileSorter(config) as sorter:
+        write_participants_csv(sorter.run(read_starting_order(starting_order_path)),
+                               config.output_root_dir / 'participants.csv')
+    return sorter
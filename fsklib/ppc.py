@@ -1,10 +1,13 @@
 import datetime
 import logging
+import os
+import pickle
 import traceback
 import xml.etree.ElementTree as ET
+from concurrent.futures import ProcessPoolExecutor
 from dataclasses import dataclass
 from pathlib import Path
-from typing import Any, Dict, List, Optional, Tuple
+from typing import Any, Dict, FrozenSet, Iterable, List, Optional, Tuple
 
 from pypdf import PdfReader
 
@@ -42,20 +45,21 @@ class PdfParserFunctionBase:
             CategoryHints(CategoryType.SYNCHRON, ["sys", "synch"]),
             CategoryHints(CategoryType.PAIRS, ["pair", "paar"]),
             CategoryHints(CategoryType.ICEDANCE, ["dance", "tanz"]),
-            CategoryHints(CategoryType.WOMEN, ["girl", "ladies", "women" "mädchen", "damen", "frauen"]),
+            CategoryHints(CategoryType.WOMEN, ["girl", "ladies", "women", "mädchen", "damen", "frauen"]),
             CategoryHints(CategoryType.MEN, ["boy", "gents", "gentlemen", " men", "jungen", "männer", "herren"]),
                  ]
 
         def contains_any_hint(cat_hints: CategoryHints) -> bool:
             return any([hint in cat_name.casefold() for hint in cat_hints.hints])
 
+        # first matching hint wins
+        cat_type = CategoryType.SINGLES
+        cat_gender = Gender.FEMALE
         for cat_hint in cat_hints:
             if contains_any_hint(cat_hint):
                 cat_type = cat_hint.type
                 cat_gender = cat_type.to_gender()
-            else:
-                cat_type = CategoryType.SINGLES
-                cat_gender = Gender.FEMALE
+                break
 
         return Category(cat_name, cat_type, CategoryLevel.NOTDEFINED, cat_gender, number=0)
 
@@ -73,7 +77,7 @@ class PdfParserFunctionBase:
 
     @staticmethod
     def _guess_club(name: str, fields) -> Club:
-        return Club(PdfParserFunctionBase.get_field_value(name, fields, ""), "TODO", "TODO")
+        return Club(PdfParserFunctionBase.get_field_value(name, fields, ""), "TODO", "TODO").validate()
 
 
 class PdfParserFunctionDeu(PdfParserFunctionBase):
@@ -90,22 +94,24 @@ class PdfParserFunctionDeu(PdfParserFunctionBase):
         participant: ParticipantBase
         if cat.type is CategoryType.SYNCHRON:
             team_name = fields["Vorname"]["/V"] if fields["Vorname"]["/V"] else fields["Nachname"]["/V"]
-            team = Team(id, team_name, club)
-            participant = ParticipantTeam(team, cat)
+            team = Team.validated(id, team_name, club)
+            participant = ParticipantTeam(cat, team)
         else:
-            person = Person(id, fields["Vorname"]["/V"], fields["Nachname"]["/V"], cat.gender, datetime.date.today(), club)
+            # form values are validated once, the participant is built from the validated parts
+            person = Person.validated(id, fields["Vorname"]["/V"], fields["Nachname"]["/V"], cat.gender,
+                                      datetime.date.today(), club)
             if cat.type in (CategoryType.WOMEN, CategoryType.MEN, CategoryType.SINGLES):
                 participant = ParticipantSingle(cat, person)
             elif cat.type in (CategoryType.PAIRS, CategoryType.ICEDANCE):
                 partner_club = self._guess_club("Partner-Verein", fields)
-                partner = Person(
-                    0 if fake_id else fields["Partner-ID"]["/V"],
-                    fields["Partner-Nachname"]["/V"],
+                partner = Person.validated(
+                    "0" if fake_id else self.get_field_value("Partner-ID", fields, "0"),
                     fields["Partner-Vorname"]["/V"],
-                    cat.gender, datetime.time(), partner_club)
+                    fields["Partner-Nachname"]["/V"],
+                    cat.gender, datetime.date.today(), partner_club)
                 # fix gender
                 person.gender = Gender.FEMALE
-                participant = ParticipantCouple(Couple(person, partner), cat)
+                participant = ParticipantCouple(cat, Couple(person, partner))
 
         elements_short: List[str] = []
         elements_long: List[str] = []
@@ -129,9 +135,80 @@ class PdfParserFunctionBev(PdfParserFunctionDeu):
         return super().__call__(path, fields, fake_id)
 
 
+class PpcCache:
+    # parsed PPC files stored next to the PDF files, keyed by file path, mtime, size and parser function
+    file_name = ".ppc_cache.pickle"
+    version = 4  # 2: slotted model classes, 3: partner given and family name in order, 4: validated participants
+
+    def __init__(self, directory: Path, invalidate=False) -> None:
+        self.path = directory / self.file_name
+        # (file path, parser function) -> (mtime, size, ppc or None if parsing failed)
+        self.entries: Dict[Tuple[str, str], Tuple[int, int, Optional[PPC]]] = {}
+        self.hits = 0
+        self.misses = 0
+        self.modified = invalidate
+        if invalidate:
+            logger.info("Invalidate PPC cache: %s", self.path)
+        else:
+            self.load()
+
+    def load(self) -> None:
+        try:
+            with open(self.path, "rb") as fp:
+                version, entries = pickle.load(fp)
+        except FileNotFoundError:
+            return
+        except Exception:
+            logger.warning(f"Unable to read PPC cache {self.path}. All files will be parsed again.")
+            logger.debug(traceback.format_exc())
+            return
+
+        if version == self.version:
+            self.entries = entries
+
+    def save(self) -> None:
+        if not self.modified:
+            return
+
+        # remove deleted files
+        self.entries = {key: entry for key, entry in self.entries.items() if Path(key[0]).is_file()}
+        tmp_path = self.path.with_name(self.path.name + ".tmp")
+        try:
+            with open(tmp_path, "wb") as fp:
+                pickle.dump((self.version, self.entries), fp)
+            os.replace(tmp_path, self.path)
+            self.modified = False
+        except Exception:
+            logger.warning(f"Unable to write PPC cache {self.path}")
+            logger.debug(traceback.format_exc())
+
+    @staticmethod
+    def _key(file_path: Path, func: PdfParserFunctionBase) -> Tuple[str, str]:
+        return str(file_path.resolve()), f"{type(func).__module__}.{type(func).__qualname__}"
+
+    def get(self, file_path: Path, func: PdfParserFunctionBase) -> Tuple[bool, Optional[PPC]]:
+        stat = file_path.stat()
+        entry = self.entries.get(self._key(file_path, func))
+        if entry is not None and entry[:2] == (stat.st_mtime_ns, stat.st_size):
+            self.hits += 1
+            return True, entry[2]
+
+        self.misses += 1
+        return False, None
+
+    def set(self, file_path: Path, func: PdfParserFunctionBase, ppc: Optional[PPC]) -> None:
+        stat = file_path.stat()
+        self.entries[self._key(file_path, func)] = (stat.st_mtime_ns, stat.st_size, ppc)
+        self.modified = True
+
+
 class PdfParser:
-    def __init__(self, func: PdfParserFunctionBase) -> None:
+    # below this number of files, parsing in a process pool is slower than the serial parsing
+    min_files_parallel = 16
+
+    def __init__(self, func: PdfParserFunctionBase, max_workers: Optional[int] = 1) -> None:
         self.function = func
+        self.max_workers = max_workers  # 1 -> serial parsing; None -> one process per CPU
 
     def parse(self, file_path: Path) -> Optional[PPC]:
         try:
@@ -141,8 +218,9 @@ class PdfParser:
             logger.debug(traceback.format_exc())
             return None
 
-        fields = reader.get_fields()
         try:
+            # errors are reported by the result None, an exception would abort the parsing of all files in the pool
+            fields = reader.get_fields()
             return self.function(file_path, fields)
         except Exception:
             logger.debug(f"Error while parsing file: {file_path}")
@@ -150,12 +228,41 @@ class PdfParser:
 
         return None
 
-    def parse_multiple(self, file_paths: List[Path]) -> Tuple[List[PPC], List[Path]]:
+    def _parse_files(self, file_paths: List[Path]) -> List[Optional[PPC]]:
+        workers = self.max_workers or os.cpu_count() or 1
+        if workers > 1 and len(file_paths) >= self.min_files_parallel:
+            logger.debug(f"Parse {len(file_paths)} files with {workers} processes")
+            chunk_size = max(1, len(file_paths) // (4 * workers))
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                return list(executor.map(self.parse, file_paths, chunksize=chunk_size))
+
+        return [self.parse(file_path) for file_path in file_paths]
+
+    def parse_multiple(self, file_paths: List[Path], cache: Optional[PpcCache] = None) -> Tuple[List[PPC], List[Path]]:
         ppcs: List[PPC] = []
         file_paths_with_error: List[Path] = []
 
+        results: Dict[Path, Optional[PPC]] = {}
+        if cache:
+            for file_path in file_paths:
+                is_cached, ppc = cache.get(file_path, self.function)
+                if is_cached:
+                    results[file_path] = ppc
+
+        # parse only new or modified files
+        new_file_paths = [file_path for file_path in file_paths if file_path not in results]
+        for file_path, ppc in zip(new_file_paths, self._parse_files(new_file_paths)):
+            results[file_path] = ppc
+            if cache:
+                cache.set(file_path, self.function, ppc)
+
+        if cache:
+            cache.save()
+            logger.info("PPC cache: %d hits, %d misses", cache.hits, cache.misses)
+
+        # results are in the same order as the input files
         for file_path in file_paths:
-            ppc = self.parse(file_path)
+            ppc = results[file_path]
             if ppc is None:
                 file_paths_with_error.append(file_path)
             else:
@@ -163,7 +270,8 @@ class PdfParser:
 
         return ppcs, file_paths_with_error
 
-    def ppcs_parse_dir(self, directory: Path, recursive=False) -> Tuple[List[PPC], List[Path]]:
+    def ppcs_parse_dir(self, directory: Path, recursive=False,
+                       use_cache=False, invalidate_cache=False) -> Tuple[List[PPC], List[Path]]:
         if not directory.is_dir():
             return []
 
@@ -173,49 +281,124 @@ class PdfParser:
             glop_paths = directory.glob("*.pdf")
 
         file_paths = sorted(filter(Path.is_file, glop_paths))
-        return self.parse_multiple(file_paths)
+        cache = PpcCache(directory, invalidate_cache) if use_cache else None
+        return self.parse_multiple(file_paths, cache)
+
+
+class PpcIndex:
+    # lookup tables built once for all PPCs, avoids comparing every participant with every PPC
+    def __init__(self, ppcs: List[PPC]) -> None:
+        self.ppcs = ppcs
+        self.singles_by_id: Dict[str, List[int]] = {}
+        self.singles_by_name: Dict[str, List[int]] = {}  # normalized full name and reverse name -> ppc indices
+        self.singles_names: Dict[int, Tuple[str, str, str]] = {}  # ppc index -> normalized full, first and last name
+        self.couples_by_id: Dict[str, List[int]] = {}  # team id (e.g. 1234-5678) -> ppc indices
+        self.couples_by_names: Dict[FrozenSet[str], List[int]] = {}  # normalized partner names -> ppc indices
+        self.couples_names: Dict[int, Tuple[str, str]] = {}  # ppc index -> normalized last names of partners
+        self.teams_by_id: Dict[str, List[int]] = {}
+        self.teams_by_name: Dict[str, List[int]] = {}
+        self.teams_names: Dict[int, str] = {}  # ppc index -> normalized team name
+
+        for i, ppc in enumerate(ppcs):
+            par = ppc.participant
+            if isinstance(par, ParticipantSingle):
+                name = par.get_normalized_name()
+                self.singles_names[i] = (name,
+                                         normalize_string(par.person.first_name),
+                                         normalize_string(par.person.family_name))
+                self._add(self.singles_by_id, par.person.id, i)
+                for key in {name, par.get_normalized_name(reverse=True)}:
+                    self._add(self.singles_by_name, key, i)
+            elif isinstance(par, ParticipantCouple):
+                partners = [p for p in [par.couple.partner_1, par.couple.partner_2] if p]
+                if len(partners) != 2:
+                    continue
+                self.couples_names[i] = tuple(normalize_string(p.family_name) for p in partners)
+                ids = [str(p.id) for p in partners]
+                if all(id and id != "0" for id in ids):
+                    self._add(self.couples_by_id, "-".join(ids), i)
+                    self._add(self.couples_by_id, "-".join(reversed(ids)), i)
+                # each partner with full name (e.g. maxmueller) or reverse name (e.g. muellermax)
+                names_1, names_2 = [{normalize_string(p.first_name + p.family_name),
+                                     normalize_string(p.family_name + p.first_name)} for p in partners]
+                for key in {frozenset((name_1, name_2)) for name_1 in names_1 for name_2 in names_2}:
+                    self._add(self.couples_by_names, key, i)
+            elif isinstance(par, ParticipantTeam):
+                name = par.get_normalized_name()
+                self.teams_names[i] = name
+                if par.team.id and str(par.team.id) != "0":
+                    self._add(self.teams_by_id, str(par.team.id), i)
+                if name:
+                    self._add(self.teams_by_name, name, i)
+
+    @staticmethod
+    def _add(table: Dict[Any, List[int]], key: Any, index: int) -> None:
+        table.setdefault(key, []).append(index)
+
+    def get_ppcs(self, indices: Iterable[int]) -> List[PPC]:
+        # keep the order of the input ppcs
+        return [self.ppcs[i] for i in sorted(indices)]
 
 
 class PpcOdfUpdater(OdfUpdater):
     def __init__(self, odf_xml_path: Path,
                  output_path: Optional[Path] = None,
                  suffix="_with_ppc",
-                 override=False) -> None:
-        super().__init__(odf_xml_path, output_path, suffix, override)
+                 override=False,
+                 streaming=False) -> None:
+        super().__init__(odf_xml_path, output_path, suffix, override, streaming)
 
-    def find_singles_ppcs(self, ppcs: List[PPC], id: str, participant: ET.Element) -> List[PPC]:
+    def find_singles_ppcs(self, index: PpcIndex, id: str, participant: ET.Element) -> List[PPC]:
         xml_name = normalize_string(participant.attrib["PrintName"])
         xml_first_name = normalize_string(participant.attrib["GivenName"])
         xml_last_name = normalize_string(participant.attrib["FamilyName"])
-        find_result = []
-        for ppc in ppcs:
-            if not isinstance(ppc.participant, ParticipantSingle):
-                continue
-            par: ParticipantSingle = ppc.participant
-            ppc_name = par.get_normalized_name()
-            ppc_name_reverse = par.get_normalized_name(reverse=True)
-            # id and (first name or last name matches)
-            if id and id == par.person.id and (
-                    xml_first_name in ppc_name or
-                    xml_last_name in ppc_name or
-                    normalize_string(par.person.first_name) in xml_name or
-                    normalize_string(par.person.family_name) in xml_name):
-                find_result.append(ppc)
-            # full name (e.g. maxmueller) or reverse (e.g. muellermax) matches
-            elif xml_name in [ppc_name, ppc_name_reverse]:
-                find_result.append(ppc)
-        return find_result
-
-    def find_couples_ppcs(self, ppcs: List[PPC], id: str, participant: ET.Element) -> List[PPC]:
-        # TODO
-        return []
-
-    def find_sys_ppcs(self, ppcs: List[PPC], id: str, participant: ET.Element) -> List[PPC]:
-        # TODO
-        return []
+        found = set()
+        # id and (first name or last name matches)
+        if id:
+            for i in index.singles_by_id.get(id, []):
+                ppc_name, ppc_first_name, ppc_last_name = index.singles_names[i]
+                if (xml_first_name in ppc_name or
+                        xml_last_name in ppc_name or
+                        ppc_first_name in xml_name or
+                        ppc_last_name in xml_name):
+                    found.add(i)
+        # full name (e.g. maxmueller) or reverse (e.g. muellermax) matches
+        found.update(index.singles_by_name.get(xml_name, []))
+        return index.get_ppcs(found)
+
+    def find_couples_ppcs(self, index: PpcIndex, id: str, participant: ET.Element) -> List[PPC]:
+        # team name: "Erika MUSTER / Max MUELLER"
+        xml_team_name = participant.attrib.get("Name", "")
+        xml_name = normalize_string(xml_team_name)
+        xml_partner_names = frozenset(normalize_string(name) for name in xml_team_name.split("/"))
+        found = set()
+        # team id and last name of any partner matches
+        if id:
+            for i in index.couples_by_id.get(id, []):
+                if any(name and name in xml_name for name in index.couples_names[i]):
+                    found.add(i)
+        # full names of both partners match
+        if len(xml_partner_names) == 2:
+            found.update(index.couples_by_names.get(xml_partner_names, []))
+        return index.get_ppcs(found)
+
+    def find_sys_ppcs(self, index: PpcIndex, id: str, participant: ET.Element) -> List[PPC]:
+        xml_names = {normalize_string(participant.attrib.get(key, "")) for key in ["Name", "ShortName", "TVTeamName"]}
+        xml_names.discard("")
+        found = set()
+        # team id and (part of) team name matches
+        if id:
+            for i in index.teams_by_id.get(id, []):
+                ppc_name = index.teams_names[i]
+                if ppc_name and any(ppc_name in name or name in ppc_name for name in xml_names):
+                    found.add(i)
+        # team name matches
+        for name in xml_names:
+            found.update(index.teams_by_name.get(name, []))
+        return index.get_ppcs(found)
 
     def update(self, ppcs: List[PPC]) -> None:
-        if not self.root:
+        if self.root is None:
             logger.error("Read xml file before updating it. Use `read_xml()` or `with Updater`")
             return
 
@@ -232,15 +415,16 @@ class PpcOdfUpdater(OdfUpdater):
         skipped_participants_has_ppc = []
         skipped_participants_no_ppc = []
         skipped_participants_ambiguous = []
+        index = PpcIndex(ppcs)
 
-        for par in self.root.findall(f".//{par_type}"):
+        def update_participant(par: ET.Element) -> None:
             discipline = par.find("./Discipline")
             events = par.findall(".//RegisteredEvent")
-            name = par.attrib["PrintName"]
+            name = par.attrib.get("PrintName", par.attrib.get("Name", ""))  # teams have no print name
             if discipline is None or not events:
                 logger.warning(f"Skip participant {name}. Not registered in any event.")
                 skipped_participants_no_event.append(name)
-                continue
+                return
             for event in events:
                 xml_id = discipline.attrib["IFId"].strip()
                 name = xml_id + " - " + name
@@ -256,20 +440,27 @@ class PpcOdfUpdater(OdfUpdater):
                     if CategoryType.SINGLES.ODF() not in rsc:
                         continue
                     find_ppcs = self.find_singles_ppcs
-                elif CategoryType.SYNCHRON in rsc:
+                elif CategoryType.SYNCHRON.ODF() in rsc:
                     find_ppcs = self.find_sys_ppcs
                 else:
                     find_ppcs = self.find_couples_ppcs
 
-                relevant_ppcs = find_ppcs(ppcs, xml_id, par)
+                relevant_ppcs = find_ppcs(index, xml_id, par)
 
                 if not relevant_ppcs:
-                    club = par.find(".//EventEntry[@Code='CLUB'][@Pos='2']").attrib["Value"]
+                    club_entry = par.find(".//EventEntry[@Code='CLUB'][@Pos='2']")
+                    club = club_entry.attrib["Value"] if club_entry is not None else ""
                     organisation = par.attrib["Organisation"] if "Organisation" in par.attrib else ""
                     logger.error(f"Unable to find PPC for: {name} ({organisation} | {club})")
                     skipped_participants_no_ppc.append(f"{name} - {rsc}")
                     continue
 
+                if len(relevant_ppcs) > 1 and find_ppcs == self.find_couples_ppcs:
+                    # prefer ppcs of the event discipline for couples in pairs and ice dance
+                    same_discipline_ppcs = [ppc for ppc in relevant_ppcs if ppc.participant.category.type.ODF() in rsc]
+                    if same_discipline_ppcs:
+                        relevant_ppcs = same_discipline_ppcs
+
                 if len(relevant_ppcs) > 1:
                     logger.warning(f"Ambiguous ppcs found for: {name}")
                     for ppc in relevant_ppcs:
@@ -299,6 +490,8 @@ class PpcOdfUpdater(OdfUpdater):
 
                 used_ppcs.append(ppc)
 
+        self.process(update_participant, par_type)
+
         # check for unused ppcs
         unused_ppcs = {ppc.path for ppc in ppcs} - {ppc.path for ppc in used_ppcs}
         if unused_ppcs:
@@ -1,16 +1,33 @@
+import os
 import unicodedata
+from functools import lru_cache
+from typing import Iterable, List, Union
+
+
+# remove spaces, dashes, dots, commas and underscores, ä -> ae, ö -> oe, ü -> ue
+# no character is casefolded to a removed one, so removing after casefold gives the same result
+_NORMALIZE_TABLE = str.maketrans({**dict.fromkeys(" -_.,"), "ä": "ae", "ö": "oe", "ü": "ue"})
 
 
 # remove spaces, dashes, dots, commas and underscores in strings to make them comparable
-def normalize_string(s: str):
-    translation_table = str.maketrans("", "", " -_.,")
-
-    # normalize unicode characters, remove characters, lowercase, ä -> ae, ö -> oe, ü -> ue
-    return (
-        unicodedata.normalize("NFC", unicodedata.normalize("NFD", s))
-        .translate(translation_table)
-        .casefold()
-        .replace("ä", "ae")
-        .replace("ö", "oe")
-        .replace("ü", "ue")
-    )
+@lru_cache(maxsize=8192)
+def normalize_string(s: str) -> str:
+    # normalize unicode characters (NFC of NFD equals NFC), lowercase, remove and replace characters
+    return unicodedata.normalize("NFC", s).casefold().translate(_NORMALIZE_TABLE)
+
+
+def normalize_many(strings: Iterable[str]) -> List[str]:
+    return [normalize_string(s) for s in strings]
+
+
+def write_text_if_changed(path: Union[str, os.PathLike], text: str, encoding="utf-8") -> bool:
+    """Write the text file only if its content differs (keeps the modification time), return True if written."""
+    try:
+        with open(path, "r", encoding=encoding, newline="") as f:
+            if f.read() == text:
+                return False
+    except (FileNotFoundError, UnicodeDecodeError):
+        pass
+    with open(path, "w", encoding=encoding, newline="") as f:
+        f.write(text)
+    return True
@@ -31,42 +31,62 @@ def merge_csv_in_directory(input_directory, output_file_name, delimiter=',', csv
 
 
 def merge_csv(csv_file_list, output_file_path, delimiter=',', csv_has_header=True, log_file_path='log_merge_csv.txt', make_unique=False):
-
+    # rows are written while reading the input files, the output file is created with the first row
     fieldnames = {}
-    output_list = []
+    seen_lines = set()
+    csv_file_out = None
+    writer = None
 
     with open(os.path.join(log_file_path), 'w') as log_file:
-        for file_path in csv_file_list:
-            file_name = os.path.basename(file_path)
-
-            with open(file_path, 'r') as csv_file:
-                if csv_has_header:
-                    reader = csv.DictReader(csv_file, delimiter=delimiter)
-                    if not fieldnames:
-                        fieldnames = reader.fieldnames
-                    elif fieldnames != reader.fieldnames:
-                        log_file.write("Invalid csv fieldnames for '%s'\n" % file_name)
-                        continue
-                else:
-                    reader = csv.reader(csv_file, delimiter=delimiter)
-
-                log_file.write("Reading '%s'\n" % file_name)
-
-                for line in reader:
-                    output_list.append(line)
-
-        if output_list:
-            if make_unique:
-                output_list = list(set(output_list))
-
-            with open(output_file_path, 'w') as csv_file:
-                log_file.write("Writing csv file '%s'\n" % output_file_path)
-                if csv_has_header:
-                    writer = csv.DictWriter(csv_file, fieldnames, delimiter=delimiter)
-                    writer.writeheader()
-                else:
-                    writer = csv.writer(csv_file, delimiter=delimiter)
-                writer.writerows(output_list)
+        try:
+            for file_path in csv_file_list:
+                file_name = os.path.basename(file_path)
+
+                with open(file_path, 'r') as csv_file:
+                    if csv_has_header:
+                        reader = csv.DictReader(csv_file, delimiter=delimiter)
+                        if not fieldnames:
+                            fieldnames = reader.fieldnames
+                        elif fieldnames != reader.fieldnames:
+                            log_file.write("Invalid csv fieldnames for '%s'\n" % file_name)
+                            continue
+                    else:
+                        reader = csv.reader(csv_file, delimiter=delimiter)
+
+                    log_file.write("Reading '%s'\n" % file_name)
+
+                    for line in reader:
+                        if make_unique:
+                            key = tuple(line.items()) if csv_has_header else tuple(line)
+                            if key in seen_lines:
+                                continue
+                            seen_lines.add(key)
+
+                        if writer is None:
+                            csv_file_out = open(output_file_path, 'w')
+                            log_file.write("Writing csv file '%s'\n" % output_file_path)
+                            if csv_has_header:
+                                writer = csv.DictWriter(csv_file_out, fieldnames, delimiter=delimiter)
+                                writer.writeheader()
+                            else:
+                                writer = csv.writer(csv_file_out, delimiter=delimiter)
+                        writer.writerow(line)
+        finally:
+            if csv_file_out is not None:
+                csv_file_out.close()
+
+
+def read_csv_rows(csv_file_list, delimiter=',', encoding=None):
+    # rows of all csv files with the same header as the first one, like merge_csv without writing a file
+    fieldnames = None
+    for file_path in csv_file_list:
+        with open(file_path, 'r', encoding=encoding) as csv_file:
+            reader = csv.DictReader(csv_file, delimiter=delimiter)
+            if fieldnames is None:
+                fieldnames = reader.fieldnames
+            elif fieldnames != reader.fieldnames:
+                continue
+            yield from reader
 
 
 if __name__ == '__main__':
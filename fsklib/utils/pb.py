@@ -1,8 +1,14 @@
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Dict, List, Optional
+from typing import Any, Dict, Iterable, List, Optional
 import xml.etree.ElementTree as ET
 
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 from fsklib.utils.common import normalize_string
 from fsklib.odf.xml import OdfUpdater
@@ -10,14 +16,132 @@ from fsklib.odf.xml import OdfUpdater
 API_URL = "https://deu-s.de/api/get_pb_for_skater?q="
 
 
+class PbLookup:
+    # Requests personal bests with a shared HTTP session and caches the responses in a json file.
+    # Skaters without personal bests are cached with the shorter negative_ttl, failed requests are not cached.
+    cache_file_name = ".pb_cache.json"
+
+    def __init__(self, api_url=API_URL, cache_path: Optional[Path] = None, ttl=12 * 60 * 60, negative_ttl=60 * 60,
+                 max_workers=8, timeout=5.0, retries=3) -> None:
+        self.api_url = api_url
+        self.cache_path = cache_path
+        self.ttl = ttl  # seconds
+        self.negative_ttl = negative_ttl  # seconds
+        self.max_workers = max_workers
+        self.timeout = timeout
+        # slug -> {"time": timestamp, "response": json response, "negative": no personal bests}
+        self.cache: Dict[str, Dict[str, Any]] = {}
+        self.cache_modified = False
+        self.request_count = 0
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_maxsize=max_workers,
+                              max_retries=Retry(total=retries, backoff_factor=0.5,
+                                                status_forcelist=[429, 500, 502, 503, 504]))
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+        self.load_cache()
+
+    def load_cache(self) -> None:
+        if self.cache_path is None or not self.cache_path.is_file():
+            return
+        try:
+            with open(self.cache_path, "r", encoding="utf-8") as fp:
+                self.cache = json.load(fp)
+        except Exception:
+            print(f"Unable to read cache file {self.cache_path}. Requesting all skaters again.")
+            self.cache = {}
+
+    def save_cache(self) -> None:
+        if self.cache_path is None or not self.cache_modified:
+            return
+        self.cache = {slug: entry for slug, entry in self.cache.items() if self._is_valid(entry)}
+        tmp_path = self.cache_path.with_name(self.cache_path.name + ".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as fp:
+            json.dump(self.cache, fp, ensure_ascii=False)
+        os.replace(tmp_path, self.cache_path)
+        self.cache_modified = False
+
+    def _is_valid(self, entry: Dict[str, Any]) -> bool:
+        ttl = self.negative_ttl if entry.get("negative") else self.ttl
+        return time.time() - entry["time"] < ttl
+
+    def _get_cached(self, slug: str) -> Optional[Dict[str, Any]]:
+        entry = self.cache.get(slug)
+        if entry is not None and self._is_valid(entry):
+            return entry["response"]
+        return None
+
+    def _request(self, slug: str) -> Optional[Dict[str, Any]]:
+        # like before, the json body is returned for client errors (e.g. an error message if not found)
+        # None: failed request (e.g. timeout, server error or no json body)
+        try:
+            response = self.session.get(self.api_url + slug, timeout=self.timeout)
+            if response.status_code >= 500:
+                print(f"Request failed for {slug}: HTTP status {response.status_code}")
+                return None
+            return response.json()
+        except Exception as e:
+            print(f"Request failed for {slug}: {e}")
+            return None
+
+    def get_many(self, slugs: Iterable[str]) -> Dict[str, Dict[str, Any]]:
+        responses: Dict[str, Dict[str, Any]] = {}
+        missing_slugs = []
+        for slug in dict.fromkeys(slugs):  # unique slugs, keep order
+            response = self._get_cached(slug)
+            if response is None:
+                missing_slugs.append(slug)
+            else:
+                responses[slug] = response
+
+        if missing_slugs:
+            with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                for slug, response in zip(missing_slugs, executor.map(self._request, missing_slugs)):
+                    self.request_count += 1
+                    if not isinstance(response, dict):
+                        responses[slug] = {}  # failed request, requested again next time
+                        continue
+                    responses[slug] = response
+                    negative = not {"pb", "sb"}.intersection(response)
+                    self.cache[slug] = {"time": time.time(), "response": response, "negative": negative}
+                    self.cache_modified = True
+            self.save_cache()
+
+        return responses
+
+    def get(self, slug: str) -> Dict[str, Any]:
+        return self.get_many([slug]).get(slug, {})
+
+
+_default_lookup: Optional[PbLookup] = None
+
+
+def get_pb_from_name(name: str) -> Dict[str, Any]:
+    # shared lookup without cache file, e.g. for single requests
+    global _default_lookup
+    if _default_lookup is None:
+        _default_lookup = PbLookup()
+    return _default_lookup.get(name)
+
+
 class StatisticsOdfUpdater(OdfUpdater):
-    def __init__(self, odf_xml_path: Path, output_path: Optional[Path] = None, suffix="_with_statistics", override=False) -> None:
-        super().__init__(odf_xml_path, output_path, suffix, override)
+    def __init__(self, odf_xml_path: Path, output_path: Optional[Path] = None, suffix="_with_statistics",
+                 override=False, streaming=False, lookup: Optional[PbLookup] = None) -> None:
+        super().__init__(odf_xml_path, output_path, suffix, override, streaming)
+        if lookup is None:
+            lookup = PbLookup(cache_path=odf_xml_path.parent / PbLookup.cache_file_name)
+        self.lookup = lookup
 
     @staticmethod
     def get_pb_from_name(name: str):
-        response = requests.get(API_URL + name, timeout=5.0)
-        return response.json()
+        return get_pb_from_name(name)
+
+    @staticmethod
+    def get_slug(par: ET.Element) -> str:
+        sname = str(par.get("GivenName", "").lower() + par.get("FamilyName", "").lower()).strip()
+        return normalize_string(sname)
 
     @staticmethod
     def parse_response(response: Dict[str, str]) -> List[ET.Element]:
@@ -45,13 +169,18 @@ class StatisticsOdfUpdater(OdfUpdater):
         if self.root is None:
             return
 
-        for par in self.root.iter('Participant'):
+        # request all registered skaters at once
+        responses = self.lookup.get_many(self.get_slug(par) for par in self.iterate("Participant")
+                                         if par.find("./Discipline/RegisteredEvent[EventEntry]") is not None)
+        found = sum(1 for response in responses.values() if {"pb", "sb"}.intersection(response))
+        print(f"Personal bests: {found} skaters found, {self.lookup.request_count} HTTP requests")
+
+        def update_participant(par: ET.Element) -> None:
             name = str(par.get("GivenName", "") + " " + par.get("FamilyName", "")).strip()
-            sname = str(par.get("GivenName", "").lower() + par.get("FamilyName", "").lower()).strip()
-            sname = normalize_string(sname)
+            sname = self.get_slug(par)
             event = par.find("./Discipline/RegisteredEvent[EventEntry]")
             if event is not None:
-                resp = self.get_pb_from_name(sname)
+                resp = responses.get(sname, {})
                 entries = self.parse_response(resp)
                 if entries:
                     # print matching names if not identical
@@ -63,7 +192,7 @@ class StatisticsOdfUpdater(OdfUpdater):
                                 print(f"Found different name: {sname} -> {resp['meta']['slug']}")
                     else:
                         print(f"Unable to check name for {name}. No field \"meta\" in HTTP response.")
-                        if "name" in resp["meta"]:
+                        if "name" in resp.get("meta", {}):
                             print(f"    Found {name} -> {resp['meta']['name']}")
 
                     for entry in reversed(entries):
@@ -80,6 +209,8 @@ class StatisticsOdfUpdater(OdfUpdater):
                 else:
                     print(f"Unable to find {name}")
 
+        self.process(update_participant, "Participant")
+
 
 if __name__ == "__main__":
     ODF = Path("C:/SwissTiming/OVR/FSManager/Export/CODE/ODF/DT_PARTIC_UPDATE_24-01-01_00-00-00.xml")
@@ -0,0 +1,166 @@
+import errno
+import logging
+import os
+import shutil
+from concurrent.futures import Future, ThreadPoolExecutor
+from enum import Enum
+from pathlib import Path
+from typing import List, Optional, Sequence, Tuple, Union
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+from fsklib.utils.logging_helper import get_logger
+
+logger = get_logger(__name__, __file__)
+logger.setLevel(logging.INFO)
+
+PathLike = Union[str, os.PathLike]
+
+FICLONE = 0x40049409  # linux ioctl to clone a file (reflink), e.g. on btrfs or xfs
+MTIME_TOLERANCE = 2  # seconds, FAT file systems (e.g. usb sticks) store the modification time with 2s resolution
+# errors of a hardlink which apply to all files of the destination, e.g. other device or file system without links
+HARDLINK_UNSUPPORTED_ERRNOS = {errno.EXDEV, errno.EPERM, errno.ENOTSUP, errno.EOPNOTSUPP, errno.EMLINK}
+
+
+class StagingMethod(Enum):
+    HARDLINK = "hardlink"
+    CLONE = "clone"  # reflink or in-kernel copy (copy_file_range)
+    COPY = "copy"
+
+
+DEFAULT_METHODS = (StagingMethod.HARDLINK, StagingMethod.CLONE, StagingMethod.COPY)
+
+
+def is_up_to_date(source: PathLike, destination: PathLike) -> bool:
+    """True if the destination has the same size and modification time as the source."""
+    source_stat = os.stat(source)
+    try:
+        destination_stat = os.stat(destination)
+    except FileNotFoundError:
+        return False
+    return source_stat.st_size == destination_stat.st_size and \
+        abs(source_stat.st_mtime - destination_stat.st_mtime) < MTIME_TOLERANCE
+
+
+def _hardlink(source: PathLike, destination: PathLike):
+    os.link(source, destination)
+
+
+def _clone(source: PathLike, destination: PathLike):
+    with open(source, "rb") as source_file, open(destination, "wb") as destination_file:
+        try:
+            fcntl.ioctl(destination_file.fileno(), FICLONE, source_file.fileno())
+        except (AttributeError, OSError):
+            if not hasattr(os, "copy_file_range"):
+                raise OSError("Neither reflinks nor copy_file_range are supported.")
+            size = os.fstat(source_file.fileno()).st_size
+            copied = 0
+            while copied < size:
+                n = os.copy_file_range(source_file.fileno(), destination_file.fileno(), size - copied)
+                if n == 0:
+                    raise OSError(f"Unable to copy '{source}', file truncated while copying.")
+                copied += n
+    shutil.copystat(source, destination)
+
+
+def _copy(source: PathLike, destination: PathLike):
+    shutil.copy2(source, destination)
+
+
+_staging_functions = {
+    StagingMethod.HARDLINK: _hardlink,
+    StagingMethod.CLONE: _clone,
+    StagingMethod.COPY: _copy,
+}
+
+
+def stage_file(source: PathLike, destination: PathLike,
+               methods: Sequence[StagingMethod] = DEFAULT_METHODS) -> Optional[StagingMethod]:
+    """Create the destination file with the first working method. Return the method or None if up to date.
+
+    The file is created next to the destination and moved to it afterward, an outdated destination is replaced.
+    """
+    if is_up_to_date(source, destination):
+        return None
+
+    destination = Path(destination)
+    temp_path = destination.with_name(f".{destination.name}.staging")
+    temp_path.unlink(missing_ok=True)  # left over from an interrupted run
+    error = OSError(f"No staging method for '{source}'.")
+    for method in methods:
+        try:
+            _staging_functions[method](source, temp_path)
+        except OSError as e:
+            error = e
+            temp_path.unlink(missing_ok=True)
+            continue
+        os.replace(temp_path, destination)
+        return method
+    raise error
+
+
+class FileStager:
+    """Stage many files into a directory structure, e.g. music files into category folders.
+
+    Hardlinks are created directly. Copies (e.g. to another device) run in a thread pool, call `close()` or use the
+    stager as context manager to wait for them.
+    """
+
+    def __init__(self, methods: Sequence[StagingMethod] = DEFAULT_METHODS, max_workers: Optional[int] = None):
+        self.methods = tuple(methods)
+        self.staged: List[Tuple[Path, Path, Future]] = []
+        self._executor = ThreadPoolExecutor(max_workers=max_workers)
+        self._hardlinks = StagingMethod.HARDLINK in self.methods
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def stage(self, source: PathLike, destination: PathLike) -> Future:
+        """Stage the file, the result of the future is the method used or None if the destination was up to date."""
+        future = Future()
+        copy_methods = [method for method in self.methods if method != StagingMethod.HARDLINK]
+        try:
+            if is_up_to_date(source, destination):
+                future.set_result(None)
+        except OSError as e:  # e.g. missing source
+            future.set_exception(e)
+
+        if not future.done() and self._hardlinks:
+            try:
+                future.set_result(stage_file(source, destination, [StagingMethod.HARDLINK]))
+            except OSError as e:
+                if not copy_methods:
+                    future.set_exception(e)
+                elif e.errno in HARDLINK_UNSUPPORTED_ERRNOS:
+                    # do not try again for the following files
+                    logger.debug(f"Unable to create hardlink for '{source}' ({e}), copying files.")
+                    self._hardlinks = False
+                else:
+                    # e.g. missing destination directory, only copy this file (the copy reports the error)
+                    logger.debug(f"Unable to create hardlink for '{source}' ({e}), copying the file.")
+
+        if not future.done():
+            future = self._executor.submit(stage_file, source, destination, copy_methods)
+        self.staged.append((Path(source), Path(destination), future))
+        return future
+
+    def close(self):
+        self._executor.shutdown(wait=True)
+
+    def errors(self) -> List[Tuple[Path, Path, BaseException]]:
+        return [(source, destination, future.exception())
+                for source, destination, future in self.staged if future.done() and future.exception()]
+
+    def summary(self) -> dict:
+        """Number of staged files per method (None: up to date) of the finished files."""
+        counts = {}
+        for _, _, future in self.staged:
+            if future.done() and not future.exception():
+                counts[future.result()] = counts.get(future.result(), 0) + 1
+        return counts
@@ -53,14 +53,14 @@ if from_LEV_xlsx:
             os.path.join(csv_path, 'participants.csv'))
 
 else:
-    DEUxlsx.convert_meldeformular_in_directory(obm_gbb_path, False)
-
-    merge_csv_in_directory(obm_gbb_path, 'deu_athletes.csv')
+    # convert all forms in parallel, merged athletes in OBM_GBB/csv/deu_athletes.csv, errors in conversion_report.txt
+    DEUxlsx.convert_meldeformular_batch(obm_gbb_path, False)
 
     # converting
     print('Converting deu_athletes to persons and participants...')
-    DEUcsv.convert('./OBM22/csv/OBM_GBB/deu_athletes.csv', './OBM22/csv/clubs-DEU.csv', './OBM22/csv/deu_categories_groups.csv', 
-                './OBM22/csv/person.csv', './OBM22/csv/participants_national.csv')
+    DEUcsv.convert('./OBM22/csv/OBM_GBB/csv/deu_athletes.csv', './OBM22/csv/clubs-DEU.csv',
+                   './OBM22/csv/deu_categories_groups.csv',
+                   './OBM22/csv/person.csv', './OBM22/csv/participants_national.csv')
 
     merge_csv([os.path.join(csv_path, 'participants_national.csv'),
             os.path.join(csv_path, 'participants_international.csv')],
@@ -0,0 +1,20 @@
+import unittest
+
+from fsklib.utils.common import normalize_many, normalize_string
+
+
+class TestNormalizeString(unittest.TestCase):
+    def test_normalize_string(self):
+        self.assertEqual(normalize_string("Müller-Lüdenscheidt, Jörg"), "muellerluedenscheidtjoerg")
+        self.assertEqual(normalize_string("ÄÖÜ ß St._Pauli"), "aeoeuessstpauli")
+        self.assertEqual(normalize_string("Müller"), "mueller")  # decomposed umlaut
+        self.assertEqual(normalize_string("Élodie"), "élodie")
+
+    def test_normalize_many(self):
+        names = ["Anna Schneider", "Jörg", "Anna Schneider"]
+        self.assertEqual(normalize_many(names), [normalize_string(name) for name in names])
+        self.assertEqual(normalize_many(iter(names)), ["annaschneider", "joerg", "annaschneider"])
+
+
+if __name__ == "__main__":
+    unittest.main()
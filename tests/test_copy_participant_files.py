@@ -1,6 +1,6 @@
 import unittest
 
-import scripts.copy_participant_files_to_category_folders as cp
+import fsklib.filematching as cp
 
 
 class TestCopyParticipantFiles(unittest.TestCase):
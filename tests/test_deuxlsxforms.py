@@ -0,0 +1,132 @@
+import csv
+import tempfile
+import unittest
+from datetime import date
+from pathlib import Path
+
+import openpyxl
+
+from fsklib.deueventcsv import DeuMeldeformularCsv
+from fsklib.deuxlsxforms import ConvertedOutputType, DEUMeldeformularXLSX, convert_meldeformular_batch
+from fsklib.output import ParticipantCsvOutput
+
+
+def create_form(path: Path, club: str, persons=3) -> None:
+    wb = openpyxl.Workbook()
+    ws = wb.active
+    ws["B1"] = "001v3"
+    ws["F2"] = "Test Cup"
+    ws.append([])
+    for row in [["Nr", "Disziplin", "Kategorie"], [1, "Einzellaufen", "Jugend Damen"], [2, "Paarlaufen", None],
+                [None, "leer"], ["Hinweise:"], [], ["Nr", "Team ID", "Name", None, "Vorname"]]:
+        ws.append(row)
+    for i in range(persons):
+        ws.append([i + 1, None, f"{club} {i}", "x", "Erika"])
+    wb.save(path)
+
+
+def read_csv(path: Path) -> list:
+    with open(path, newline='') as f:
+        return list(csv.DictReader(f))
+
+
+class TestDEUMeldeformularXLSX(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.path = Path(self.tmp_dir.name)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_convert(self):
+        create_form(self.path / "form.xlsx", "EC")
+        results = []
+        for read_only in [True, False]:
+            with DEUMeldeformularXLSX(self.path / "form.xlsx", read_only=read_only) as deu_xlsx:
+                self.assertEqual(deu_xlsx.event_name, "Test Cup")
+                deu_xlsx.convert()
+            categories = read_csv(deu_xlsx.get_output_files(ConvertedOutputType.EVENT_CATERGORIES)[0])
+            persons = read_csv(deu_xlsx.get_output_files(ConvertedOutputType.EVENT_PERSONS)[0])
+            results.append((categories, persons))
+
+        categories, persons = results[0]
+        self.assertEqual(categories, [{"Nr": "1", "Disziplin": "Einzellaufen", "Kategorie": "Jugend Damen"},
+                                      {"Nr": "2", "Disziplin": "Paarlaufen", "Kategorie": ""}])
+        self.assertEqual([p["Vorname"] for p in persons], ["x"] * 3)  # header columns are compacted
+        self.assertEqual(results[0], results[1])
+
+    def test_convert_closes_workbook(self):
+        create_form(self.path / "form.xlsx", "EC")
+        wb = openpyxl.load_workbook(self.path / "form.xlsx")
+        wb.active["B1"] = "002v1"  # team registration, not converted
+        wb.save(self.path / "team.xlsx")
+
+        deu_xlsx = DEUMeldeformularXLSX(self.path / "team.xlsx")
+        deu_xlsx.convert()
+        self.assertEqual(deu_xlsx.output_files, {})
+        with self.assertRaises(ValueError):  # closed zip archive
+            list(deu_xlsx.worksheet.iter_rows())
+
+    def test_batch(self):
+        for club in ["EC", "SC", "TSV"]:
+            create_form(self.path / f"{club}.xlsx", club)
+        (self.path / "broken.xlsx").write_text("no xlsx")
+
+        for max_workers in [1, 2]:
+            report = convert_meldeformular_batch(self.path, max_workers=max_workers)
+            self.assertEqual([p.name for p, error in report.items() if error], ["broken.xlsx"])
+
+            csv_path = self.path / "csv"
+            self.assertEqual(len(read_csv(csv_path / "deu_athletes.csv")), 9)
+            self.assertEqual(len(read_csv(csv_path / "deu_categories.csv")), 2)
+            self.assertIn("broken.xlsx: BadZipFile", (csv_path / "conversion_report.txt").read_text())
+
+    def test_convert_xlsx(self):
+        wb = openpyxl.Workbook()
+        ws = wb.active
+        for row in [["Wettbewerb/Prüfung", "Disziplin", "Kategorie"], ["Jugend Damen", "Damen", "Jugendklasse"],
+                    ["Hinweise:"],
+                    ["Wettbewerb/Prüfung", "Team ID", "Team Name", "ID ( ehm. Sportpassnr.)", "Name", "Vorname",
+                     "Geb. Datum", "Vereinskürzel", "Rolle", "Platz/Status", "Punkte"]]:
+            ws.append(row)
+        for i in range(3):
+            ws.append(["Jugend Damen", None, None, 1000 + i, f"Name {i}", "Erika", date(2010, 1, 1 + i), "EC"])
+        wb.save(self.path / "form.xlsx")
+        clubs = [{"Abk.": "EC", "Name": "Eisclub", "Region": "BY"}]
+
+        participants = []
+        for write_intermediate_csv in [True, False]:
+            output_path = self.path / f"participants_{write_intermediate_csv}.csv"
+            error = DeuMeldeformularCsv().convert_xlsx(self.path / "form.xlsx", clubs,
+                                                       [ParticipantCsvOutput(output_path)],
+                                                       write_intermediate_csv=write_intermediate_csv)
+            self.assertFalse(error)
+            participants.append(read_csv(output_path))
+        self.assertEqual(len(participants[0]), 3)
+        self.assertEqual(participants[0], participants[1])
+        self.assertTrue((self.path / "csv" / "form_deu_athletes.csv").exists())  # intermediate csv file
+
+    def test_convert_rows_shared(self):
+        class Participants(ParticipantCsvOutput):
+            def add_participant(self, participant):
+                participants.append(participant)
+
+        participants = []
+        rows = [{"Wettbewerb/Prüfung": "Jugend Damen", "Team ID": "", "Team Name": "",
+                 "ID ( ehm. Sportpassnr.)": str(1000 + i), "Name": f"Name {i}", "Vorname": "Erika",
+                 "Geb. Datum": "01.01.2010", "Vereinskürzel": "EC", "Rolle": "XX" if i == 3 else "",
+                 "Platz/Status": "", "Punkte": ""} for i in range(4)]
+        with self.assertLogs("fsklib.deueventcsv", "ERROR"):
+            DeuMeldeformularCsv().convert_rows(rows, [{"Abk.": "EC", "Name": "Eisclub", "Region": "BY"}],
+                                               [{"Wettbewerb/Prüfung": "Jugend Damen", "Disziplin": "Damen",
+                                                 "Kategorie": "Jugendklasse"}],
+                                               [], [Participants(self.path / "participants.csv")])
+        # invalid role is skipped, category and club are validated once and shared by all participants
+        self.assertEqual(len(participants), 3)
+        self.assertEqual(participants[0].person.bday, date(2010, 1, 1))
+        self.assertTrue(all(par.category is participants[0].category for par in participants))
+        self.assertTrue(all(par.person.club is participants[0].person.club for par in participants))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,100 @@
+import tempfile
+import unittest
+from pathlib import Path
+
+from fsklib.filematching import FileNameIndex, ParticipantFileManifest
+from fsklib.utils.staging import FileStager, StagingMethod
+
+
+def participant(given_name, family_name, number):
+    return {"Kategorie-Typ": "S", "Segment-Typ": "S", "Segment-Abk.": "SP", "Vorname": given_name, "Name": family_name,
+            "Geburtstag": "2010-01-01", "Nation": "GER", "Club-Abk.": "EC", "Startnummer": str(number)}
+
+
+class TestFileNameIndex(unittest.TestCase):
+    def test_find(self):
+        index = FileNameIndex(["Annabell_STEIN_SP.mp3", "Jörg Müller FS.wav", "Li.mp3", "Stein.mp3"])
+        self.assertEqual(index.normalized_names, ["annabellsteinsp", "joergmuellerfs", "li", "stein"])
+        self.assertEqual(index.find("Stein"), {0, 3})
+        self.assertEqual(index.find("Müller, Jörg"), set())
+        self.assertEqual(index.find("Jörg-Müller"), {1})
+        self.assertEqual(index.find("li"), {2})  # shorter than a trigram
+        self.assertEqual(index.find(""), set())
+        self.assertEqual(index.find(" "), {0, 1, 2, 3})  # empty after normalization matches all, like a substring test
+
+        found = index.find("Stein")
+        found.clear()
+        self.assertEqual(index.find("Stein"), {0, 3})  # cached results are not modified
+
+
+class TestParticipantFileManifest(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.input_path = Path(self.tmp_dir.name) / "input"
+        self.output_path = Path(self.tmp_dir.name) / "sorted"
+        self.input_path.mkdir()
+        self.output_path.mkdir()
+        for name in ["Anna_Stein_SP.mp3", "Lea_Weber_SP.mp3"]:
+            (self.input_path / name).write_bytes(name.encode())
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def sort(self, participants, remove_outdated=False) -> ParticipantFileManifest:
+        file_names = sorted(p.name for p in self.input_path.iterdir())
+        index = FileNameIndex(file_names)
+        manifest = ParticipantFileManifest(self.output_path, file_names)
+        with FileStager([StagingMethod.COPY]) as stager:
+            for par in participants:
+                files = manifest.match(par, index, True, "")
+                if len(files) == 1:
+                    manifest.stage(self.input_path / files[0], self.output_path / f"{par['Startnummer']}-{files[0]}")
+            manifest.apply(stager, remove_outdated)
+        manifest.save()
+        return manifest
+
+    def output_files(self) -> list:
+        return sorted(p.name for p in self.output_path.iterdir() if p.suffix == ".mp3")
+
+    def test_incremental(self):
+        participants = [participant("Anna", "Stein", 1), participant("Lea", "Weber", 2), participant("Ida", "Koch", 3)]
+        manifest = self.sort(participants)
+        self.assertEqual((manifest.counts["matched"], manifest.counts["staged"]), (3, 2))
+        self.assertEqual(self.output_files(), ["1-Anna_Stein_SP.mp3", "2-Lea_Weber_SP.mp3"])
+
+        manifest = self.sort(participants)
+        self.assertEqual((manifest.counts["cached"], manifest.counts["unchanged"]), (3, 2))
+
+        # late entry of a music file: only the matching participant is matched again
+        (self.input_path / "Ida-Koch-SP.mp3").write_bytes(b"Ida")
+        manifest = self.sort(participants)
+        self.assertEqual((manifest.counts["matched"], manifest.counts["cached"]), (1, 2))
+        self.assertEqual((manifest.counts["staged"], manifest.counts["unchanged"]), (1, 2))
+
+        # new starting order: renamed files are moved, files of removed participants are deleted
+        manifest = self.sort([participant("Lea", "Weber", 1), participant("Ida", "Koch", 2)], remove_outdated=True)
+        self.assertEqual((manifest.counts["matched"], manifest.counts["moved"], manifest.counts["removed"]), (2, 2, 1))
+        self.assertEqual(self.output_files(), ["1-Lea_Weber_SP.mp3", "2-Ida-Koch-SP.mp3"])
+        self.assertEqual((self.output_path / "2-Ida-Koch-SP.mp3").read_bytes(), b"Ida")
+
+        # changed music file
+        (self.input_path / "Lea_Weber_SP.mp3").write_bytes(b"new music")
+        manifest = self.sort([participant("Lea", "Weber", 1), participant("Ida", "Koch", 2)])
+        self.assertEqual((manifest.counts["cached"], manifest.counts["staged"]), (2, 1))
+        self.assertEqual((self.output_path / "1-Lea_Weber_SP.mp3").read_bytes(), b"new music")
+
+    def test_keep_outdated(self):
+        self.sort([participant("Anna", "Stein", 1), participant("Lea", "Weber", 2)])
+
+        # outdated files are kept by default, but still tracked
+        manifest = self.sort([participant("Lea", "Weber", 1)])
+        self.assertEqual((manifest.counts["staged"], manifest.counts["moved"], manifest.counts["removed"]), (1, 0, 0))
+        self.assertEqual(self.output_files(), ["1-Anna_Stein_SP.mp3", "1-Lea_Weber_SP.mp3", "2-Lea_Weber_SP.mp3"])
+
+        manifest = self.sort([participant("Lea", "Weber", 1)], remove_outdated=True)
+        self.assertEqual((manifest.counts["unchanged"], manifest.counts["removed"]), (1, 2))
+        self.assertEqual(self.output_files(), ["1-Lea_Weber_SP.mp3"])
+
+
+if __name__ == "__main__":
+    unittest.main()
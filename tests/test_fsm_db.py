@@ -0,0 +1,76 @@
+import unittest
+
+from mysql.connector import errors
+
+from fsklib.fsm import db
+
+
+class FakeCursor:
+    def __init__(self, rows):
+        self.rows = list(rows)
+        self.closed = False
+
+    def execute(self, statement, params=()):
+        pass
+
+    def fetchone(self):
+        return self.rows.pop(0) if self.rows else None
+
+    def fetchall(self):
+        rows, self.rows = self.rows, []
+        return rows
+
+    def close(self):
+        self.closed = True
+
+
+class FakeConnection:
+    def __init__(self, rows):
+        self.cursors = []
+        self.rows = rows
+        self.connected = True
+
+    def cursor(self, prepared=True):
+        self.cursors.append(FakeCursor(self.rows))
+        return self.cursors[-1]
+
+    def disconnect(self):
+        self.connected = False
+
+
+class FakePool:
+    def __init__(self, connections):
+        self.connections = list(connections)
+
+    def get_connection(self):
+        if not self.connections:
+            raise errors.PoolError("Failed getting connection; pool exhausted")
+        return self.connections.pop()
+
+
+class TestDb(unittest.TestCase):
+    def test_query(self):
+        con = FakeConnection([(1,), (2,), (3,)])
+        self.assertEqual(list(db.query(con, "SELECT 1")), [(1,), (2,), (3,)])
+        self.assertTrue(con.cursors[-1].closed)
+        self.assertEqual(db.query_one(con, "SELECT 1"), (1,))
+
+    def test_query_stopped_early(self):
+        con = FakeConnection([(1,), (2,), (3,)])
+        rows = db.query(con, "SELECT 1")
+        self.assertEqual(next(rows), (1,))
+        rows.close()
+        # remaining rows are read before the cursor is closed
+        self.assertEqual(con.cursors[-1].rows, [])
+        self.assertTrue(con.cursors[-1].closed)
+
+    def test_close_pools(self):
+        connections = [FakeConnection([]), FakeConnection([])]
+        db._pools[("user", "password", "host", 0)] = FakePool(connections)
+        db.close_pools()
+        self.assertEqual(db._pools, {})
+        self.assertFalse(any(con.connected for con in connections))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,91 @@
+import unittest
+from typing import List
+
+from fsklib.fsm.result import EVENT_NAME_XPATH, read_event_name, read_latest_message_ids, read_results
+
+
+def result_message(event_name: str, family_name: str) -> bytes:
+    return f"""<OdfBody DocumentType="DT_CUMULATIVE_RESULT">
+  <Competition>
+    <ExtendedInfos><SportDescription EventName="{event_name}"/></ExtendedInfos>
+    <Result Rank="1" Result="50.00">
+      <Competitor>
+        <Composition>
+          <Athlete><Description IFId="123" GivenName="Erika" FamilyName="{family_name}"/></Athlete>
+        </Composition>
+      </Competitor>
+    </Result>
+  </Competition>
+</OdfBody>""".encode()
+
+
+class FakeCursor:
+    def __init__(self, connection: "FakeConnection"):
+        self.connection = connection
+        self.rows: List[tuple] = []
+
+    def execute(self, statement: str, params: tuple = ()):
+        self.connection.statements.append((statement, params))
+        if "ExtractValue" in statement:
+            # (Id, EventName) of all messages, newest first
+            self.rows = [(odf_id, event_name) for odf_id, event_name, _ in self.connection.messages]
+        else:
+            self.rows = [(odf_id, message) for odf_id, _, message in self.connection.messages if odf_id in params]
+
+    def fetchone(self):
+        return self.rows.pop(0) if self.rows else None
+
+    def close(self):
+        pass
+
+
+class FakeConnection:
+    def __init__(self, messages):
+        self.messages = messages  # (Id, event name, message) ordered by CreationStamp DESC
+        self.statements = []
+
+    def cursor(self, prepared=True):
+        return FakeCursor(self)
+
+
+class TestResult(unittest.TestCase):
+    def setUp(self):
+        self.con = FakeConnection([(5, "Damen", result_message("Damen", "Neu")),
+                                   (4, "Herren", result_message("Herren", "Mann")),
+                                   (3, "Damen", result_message("Damen", "Alt")),
+                                   (2, "", b"<OdfBody/>"),  # no sport description
+                                   (1, "Herren", result_message("Herren", "Alt"))])
+
+    def test_read_latest_message_ids(self):
+        self.assertEqual(read_latest_message_ids(self.con), [(5, "Damen"), (4, "Herren")])
+        statement, params = self.con.statements[0]
+        # ExtractValue only supports a constant XPath
+        self.assertIn(f"ExtractValue(Message, '{EVENT_NAME_XPATH}')", statement)
+        self.assertEqual(params, ("DT_CUMULATIVE_RESULT",))
+
+    def test_read_results(self):
+        rows = list(read_results(self.con))
+        self.assertEqual([(row[0], row[4]) for row in rows], [("Damen", "Neu"), ("Herren", "Mann")])
+        # constant number of queries, all message blobs in one
+        self.assertEqual(len(self.con.statements), 2)
+        self.assertEqual(self.con.statements[1][1], (5, 4))
+
+    def test_read_event_name(self):
+        self.assertEqual(read_event_name(result_message("Damen", "Neu")), "Damen")
+        self.assertIsNone(read_event_name(b"<OdfBody><Competition/></OdfBody>"))
+
+    def test_read_results_header(self):
+        # event names are taken from the message header, messages of processed events are not parsed again
+        con = FakeConnection([(3, "Damen", result_message("Damen", "Neu")),
+                              (2, "Damen ", result_message("Damen", "Alt")),
+                              (1, "Herren", b"<OdfBody><Competition/></OdfBody>")])
+        self.assertEqual([(row[0], row[4]) for row in read_results(con)], [("Damen", "Neu")])
+
+    def test_read_results_empty(self):
+        con = FakeConnection([])
+        self.assertEqual(list(read_results(con)), [])
+        self.assertEqual(len(con.statements), 1)  # no blob query without ids
+
+
+if __name__ == "__main__":
+    unittest.main()
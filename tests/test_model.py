@@ -0,0 +1,73 @@
+import datetime
+import timeit
+import unittest
+
+import pydantic
+
+from fsklib import model
+
+
+class TestModel(unittest.TestCase):
+    def test_from_value(self):
+        self.assertEqual(model.Gender.from_value('F', model.DataSource.CALC), model.Gender.FEMALE)
+        self.assertIsNone(model.Gender.from_value('X', model.DataSource.CALC))
+        self.assertIsNone(model.Gender.from_value(['F'], model.DataSource.CALC))
+        # ambiguous values -> first member
+        self.assertEqual(model.CategoryLevel.from_value('O', model.DataSource.CALC), model.CategoryLevel.ADULT)
+        self.assertEqual(model.SegmentType.from_value('QUAL', model.DataSource.ODF), model.SegmentType.SP)
+        with self.assertRaises(Exception):
+            model.Gender.from_value('W', model.DataSource.DEU)
+
+    def test_category_gender(self):
+        cat = model.Category("Herren", model.CategoryType.MEN, model.CategoryLevel.SENIOR, None)
+        self.assertEqual(cat.gender, model.Gender.MALE)
+        cat_fs = cat.add_segment(model.Segment("Kür", "KR", model.SegmentType.FP))
+        self.assertEqual(len(cat_fs.segments), 1)
+        self.assertEqual(len(cat.segments), 0)  # hash of the frozen category is unchanged
+        self.assertNotEqual(hash(cat_fs), hash(cat))
+
+    def test_validate(self):
+        person = model.Person("1", "Erika", "Musterfrau", bday="2010-01-02")
+        self.assertFalse(hasattr(person, "__dict__"))
+        self.assertEqual(person.validate().bday, datetime.date(2010, 1, 2))
+
+        cat = model.Category("Damen", model.CategoryType.WOMEN, model.CategoryLevel.JUNIOR, None)
+        par = model.ParticipantSingle(cat, model.Person("1", club=model.Club(None)))
+        with self.assertRaises(pydantic.ValidationError):
+            par.validate()
+
+    def test_validated(self):
+        person = model.Person.validated("1", "Erika", "Musterfrau", model.Gender.FEMALE, "2010-01-02")
+        self.assertEqual(person.bday, datetime.date(2010, 1, 2))
+        # e.g. from_value returns None for unknown values
+        with self.assertRaises(pydantic.ValidationError):
+            model.Person.validated("1", gender=model.Gender.from_value("X", model.DataSource.CALC))
+        cat = model.Category("Damen", model.CategoryType.WOMEN, model.CategoryLevel.JUNIOR, None)
+        with self.assertRaises(pydantic.ValidationError):
+            model.ParticipantSingle.validated(cat, person, role=model.Role.from_value("XX", model.DataSource.DEU))
+
+    def test_validated_parts(self):
+        cat = model.Category("Damen", model.CategoryType.WOMEN, model.CategoryLevel.JUNIOR, None).validate()
+        club = model.Club("Eisclub", "EC", "BY").validate()
+
+        def from_parts():
+            # like the readers: shared category and club, each person validated once
+            person = model.Person.validated("1", "Erika", "Musterfrau", model.Gender.FEMALE, "2010-01-02")
+            person.club = club
+            return model.ParticipantSingle(cat, person)
+
+        def nested():
+            person = model.Person.validated("1", "Erika", "Musterfrau", model.Gender.FEMALE, "2010-01-02", club)
+            return model.ParticipantSingle.validated(cat, person)
+
+        par = from_parts()
+        self.assertIs(par.category, cat)
+        self.assertIs(par.person.club, club)
+        self.assertEqual(par, nested())
+        self.assertIsNot(nested().category, cat)  # copied by the nested validation
+        self.assertLess(min(timeit.repeat(from_parts, number=200, repeat=5)),
+                        min(timeit.repeat(nested, number=200, repeat=5)))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,81 @@
+import tempfile
+import unittest
+import xml.etree.ElementTree as ET
+from pathlib import Path
+
+from fsklib.odf.xml import OdfUpdater
+
+ODF_XML = """<?xml version="1.0" ?>
+<OdfBody CompetitionCode="TEST" DocumentType="DT_PARTIC_UPDATE">
+  <Competition>
+    <ExtendedInfos>
+      <Info Code="A &amp; B" Value="x&quot;y"/>
+    </ExtendedInfos>
+    <Participant Code="1" GivenName="Max" FamilyName="M&#252;ller">
+      <Discipline Code="FSK" IFId="100">
+        <RegisteredEvent Event="FSKWSINGLES-JUNIOR------------">
+          <EventEntry Type="ER_EXTENDED" Code="CLUB" Pos="1" Value="EC &lt;1&gt;"/>
+        </RegisteredEvent>
+      </Discipline>
+    </Participant>
+    <Participant Code="2" GivenName="Erika" FamilyName="Musterfrau">
+      <Discipline Code="FSK" IFId="200"/>
+    </Participant>
+    text between
+    <Participant Code="3" GivenName="Eva" FamilyName="Test"/>
+  </Competition>
+</OdfBody>
+"""
+
+
+def add_entry(par: ET.Element) -> None:
+    ET.SubElement(par, "EventEntry", {"Code": "PB", "Value": par.attrib["Code"]})
+
+
+class TestOdfUpdater(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.input_path = Path(self.tmp_dir.name) / "DT_PARTIC.xml"
+        self.input_path.write_text(ODF_XML, encoding="utf-8")
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def run_updater(self, streaming: bool, **kwargs) -> bytes:
+        with OdfUpdater(self.input_path, streaming=streaming, **kwargs) as updater:
+            self.assertEqual(updater.root.attrib["DocumentType"], "DT_PARTIC_UPDATE")
+            updater.process(add_entry, "Participant")
+        return updater.output_path.read_bytes()
+
+    def test_streaming_output_identical(self):
+        self.assertEqual(self.run_updater(streaming=True), self.run_updater(streaming=False))
+
+    def test_streaming_without_update(self):
+        with OdfUpdater(self.input_path, suffix="_dom"):
+            pass
+        with OdfUpdater(self.input_path, suffix="_stream", streaming=True):
+            pass
+        dom_path = self.input_path.with_name("DT_PARTIC_dom.xml")
+        stream_path = self.input_path.with_name("DT_PARTIC_stream.xml")
+        self.assertEqual(stream_path.read_bytes(), dom_path.read_bytes())
+
+    def test_streaming_override(self):
+        expected = self.run_updater(streaming=False)
+        self.assertEqual(self.run_updater(streaming=True, override=True), expected)
+        self.assertEqual(self.input_path.read_bytes(), expected)
+
+    def test_iterate(self):
+        for streaming in [False, True]:
+            with OdfUpdater(self.input_path, streaming=streaming) as updater:
+                codes = [par.attrib["Code"] for par in updater.iterate("Participant")]
+            self.assertEqual(codes, ["1", "2", "3"])
+
+    def test_streaming_single_pass(self):
+        with OdfUpdater(self.input_path, streaming=True) as updater:
+            updater.process(add_entry)
+            with self.assertRaises(Exception):
+                updater.process(add_entry)
+
+
+if __name__ == "__main__":
+    unittest.main()
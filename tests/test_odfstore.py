@@ -0,0 +1,99 @@
+import http.client
+import tempfile
+import threading
+import unittest
+from datetime import date
+from pathlib import Path
+
+from fsklib.fsm.HOVTPServer import HOVTPServer
+from fsklib.fsm.odfresult import LiveResults
+from fsklib.fsm.odfstore import OdfMessageStore, read_odf_header
+
+ODF_RESULT = """<?xml version="1.0" encoding="UTF-8"?>
+<OdfBody CompetitionCode="TEST" DocumentCode="FSKWSINGLES-JUNIOR------------" DocumentType="{type}" Version="{version}">
+  <Competition>
+    <ExtendedInfos>
+      <SportDescription DisciplineName="Figure Skating" EventName="Junior Damen"/>
+    </ExtendedInfos>
+    <Result Rank="1" Result="{points}">
+      <Competitor>
+        <Composition>
+          <Athlete><Description IFId="123" GivenName="Erika" FamilyName="Musterfrau" BirthDate="2008-01-02"/></Athlete>
+        </Composition>
+      </Competitor>
+    </Result>
+  </Competition>
+</OdfBody>
+"""
+
+
+def odf_message(document_type="DT_CUMULATIVE_RESULT", version=1, points="100.00") -> bytes:
+    return ODF_RESULT.format(type=document_type, version=version, points=points).encode("utf-8")
+
+
+class TestOdfMessageStore(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.store_path = Path(self.tmp_dir.name) / "odf.sqlite"
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_read_odf_header(self):
+        header, event_name = read_odf_header(odf_message(), chunk_size=16)
+        self.assertEqual(header["DocumentType"], "DT_CUMULATIVE_RESULT")
+        self.assertEqual(event_name, "Junior Damen")
+
+    def test_store(self):
+        with OdfMessageStore(self.store_path) as store:
+            store.put(odf_message(version=1), 1)
+            store.put(odf_message("DT_RESULT", version=2), 2)
+            store.put(odf_message(version=3), 3)
+
+        messages = list(OdfMessageStore(self.store_path).messages("DT_CUMULATIVE_RESULT"))
+        self.assertEqual([m.serial_number for m in messages], [1, 3])
+        self.assertEqual(messages[-1].version, "3")
+        self.assertEqual(messages[-1].event_name, "Junior Damen")
+        self.assertEqual(messages[-1].message, odf_message(version=3))
+
+    def test_server(self):
+        with OdfMessageStore(self.store_path) as store:
+            server = HOVTPServer(("localhost", 0), store)
+            thread = threading.Thread(target=server.serve_forever)
+            thread.start()
+            try:
+                for serial_number in range(1, 4):
+                    con = http.client.HTTPConnection(*server.server_address)
+                    con.request("POST", "/", odf_message(version=serial_number),
+                                {"X-HOVTP-Environment": "TEST", "X-HOVTP-Last-Serial-Number": str(serial_number)})
+                    response = con.getresponse()
+                    self.assertEqual(response.status, 200)
+                    self.assertEqual(response.getheader("X-HOVTP-Last-Serial-Number"), str(serial_number))
+                    con.close()
+            finally:
+                server.shutdown()
+                server.server_close()
+                thread.join()
+
+        self.assertEqual([m.serial_number for m in store.messages()], [1, 2, 3])
+        self.assertEqual(server.results.rows()[0][-1], "100.00")
+
+    def test_live_results(self):
+        results = LiveResults()
+        with OdfMessageStore(self.store_path) as store:
+            store.add_listener(results.update)
+            store.put(odf_message(version=2, points="120.00"), 1)
+            store.put(odf_message(version=1, points="60.00"), 2)  # outdated
+            store.put(odf_message("DT_RESULT", version=3, points="50.00"), 3)
+
+        self.assertEqual(results.rows(), [["Junior Damen", "", "", "123", "Musterfrau", "Erika",
+                                           date(2008, 1, 2), "", "TN", "1", "120.00"]])
+        self.assertEqual(results.rows("DT_RESULT")[0][-1], "50.00")
+
+        replayed = LiveResults()
+        replayed.load(store)
+        self.assertEqual(replayed.rows(), results.rows())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,107 @@
+import csv
+import tempfile
+import unittest
+from pathlib import Path
+
+from fsklib.participantfiles import ParticipantFileSorter, SortConfig, read_starting_order, sort_participant_files
+from fsklib.utils.staging import StagingMethod
+
+FIELDNAMES = ["Kategorie-Name", "Kategorie-Typ", "Segment-Name", "Segment-Typ", "Segment-Abk.", "Startnummer",
+              "Vorname", "Name", "Geburtstag", "Nation", "Club-Abk.", "Team-Name"]
+
+
+def row(category, segment, number, given_name, family_name):
+    return dict(zip(FIELDNAMES, [category, "S", segment, segment[0], segment, str(number), given_name, family_name,
+                                 "2010-01-01", "GER", "EC", ""]))
+
+
+class TestParticipantFileSorter(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.path = Path(self.tmp_dir.name)
+        self.config = SortConfig.music(self.path / "all", self.path / "sorted", create_m3u_playlist=True,
+                                       staging_methods=[StagingMethod.COPY])
+        self.config.input_dir.mkdir()
+        for name in ["Anna_Stein_SP.mp3", "Anna_Stein_FS.mp3", "Lea Weber SP.mp3", "unknown.mp3"]:
+            (self.config.input_dir / name).write_bytes(name.encode())
+        self.rows = [row("Jugend Damen", "SP", 2, "Anna", "Stein"), row("Jugend Damen", "SP", 1, "Lea", "Weber"),
+                     row("Jugend Damen", "FS", 1, "Anna", "Stein"), row("Jugend Damen", "FS", 2, "Ida", "Koch")]
+        self.starting_order = self.path / "starting_order.csv"
+        with open(self.starting_order, "w", encoding="utf-8", newline="") as f:
+            writer = csv.DictWriter(f, FIELDNAMES)
+            writer.writeheader()
+            writer.writerows(self.rows)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_sort(self):
+        sorter = sort_participant_files(self.starting_order, self.config)
+        self.assertEqual((sorter.statistics.found, sorter.statistics.missing), (3, 1))
+        self.assertEqual(sorter.unused_files(), ["unknown.mp3"])
+
+        sp_dir = self.config.output_root_dir / "Jugend_Damen" / "SP"
+        self.assertEqual(sorted(p.name for p in sp_dir.iterdir()),
+                         ["0 - Playlist.m3u", "01-leaweber.mp3", "02-annastein.mp3"])
+        self.assertEqual((sp_dir / "02-annastein.mp3").read_bytes(), b"Anna_Stein_SP.mp3")
+        self.assertEqual((sp_dir / "0 - Playlist.m3u").read_text(), "01-leaweber.mp3\n02-annastein.mp3\n")
+        # playlist of the last segment
+        self.assertEqual((sp_dir.parent / "FS" / "0 - Playlist.m3u").read_text(), "01-annastein.mp3\n")
+
+        participants = list(read_starting_order(self.config.output_root_dir / "participants.csv"))
+        self.assertEqual([p["Musik"] for p in participants],
+                         ["02-annastein.mp3", "01-leaweber.mp3", "01-annastein.mp3", ""])
+
+        sorter = sort_participant_files(self.starting_order, self.config)
+        self.assertEqual(sorter.manifest.counts["cached"], 4)
+        self.assertEqual(sorter.manifest.counts["unchanged"], 3)
+
+    def test_streaming(self):
+        self.config.use_manifest = False
+        consumed = []
+
+        def rows():
+            for r in self.rows:
+                consumed.append(r["Startnummer"])
+                yield dict(r)
+
+        with ParticipantFileSorter(self.config) as sorter:
+            participants = sorter.run(rows())
+            self.assertEqual(consumed, [])
+            first = next(participants)
+            self.assertEqual(len(consumed), 1)  # rows are processed one by one
+            self.assertEqual(first.output_file_path.name, "02-annastein.mp3")
+            self.assertEqual(len(list(participants)), 3)
+        self.assertTrue(first.output_file_path.exists())
+        self.assertFalse((self.config.output_root_dir / "participant_files.json").exists())
+
+    def test_streaming_manifest(self):
+        with ParticipantFileSorter(self.config) as sorter:
+            participants = sorter.run(dict(r) for r in self.rows)
+            next(participants)
+            self.assertEqual(len(sorter.stager.staged), 1)  # staged right away, not by close()
+            self.assertEqual(len(list(participants)), 3)
+            self.assertEqual(sorter.manifest.counts["staged"], 3)
+        self.assertTrue((self.config.output_root_dir / "participant_files.json").exists())
+
+        # new starting numbers: renamed files are moved by close()
+        self.config.remove_outdated_files = True
+        self.rows[0]["Startnummer"], self.rows[1]["Startnummer"] = "1", "2"
+        with ParticipantFileSorter(self.config) as sorter:
+            self.assertEqual(len(list(sorter.run(dict(r) for r in self.rows))), 4)
+            self.assertEqual(len(sorter.stager.staged), 0)
+        self.assertEqual((sorter.manifest.counts["moved"], sorter.manifest.counts["unchanged"]), (2, 1))
+        sp_dir = self.config.output_root_dir / "Jugend_Damen" / "SP"
+        self.assertEqual((sp_dir / "01-annastein.mp3").read_bytes(), b"Anna_Stein_SP.mp3")
+
+    def test_check_only(self):
+        self.config.copy_files = False
+        sorter = sort_participant_files(self.starting_order, self.config)
+        self.assertIsNone(sorter.manifest)
+        self.assertEqual(sorter.statistics.found, 3)
+        self.assertEqual(sorted(p.name for p in self.config.output_root_dir.iterdir()),
+                         ["Jugend_Damen", "participants.csv"])  # no manifest
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,93 @@
+import json
+import tempfile
+import threading
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, urlparse
+
+from fsklib.utils.pb import PbLookup
+
+
+def pb(points):
+    return {"pb": {"total": {"points": points}}, "meta": {"slug": "erikamuster"}}
+
+
+class PbHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        slug = parse_qs(urlparse(self.path).query)["q"][0]
+        self.server.requests.append(slug)
+        if slug.startswith("broken"):
+            status, body = 500, b"Internal Server Error"
+        elif slug == "unavailable":
+            status, body = 503, json.dumps({"error": "maintenance"}).encode()
+        elif slug.startswith("skater"):
+            time.sleep(0.05)  # parallel requests
+            status, body = 200, json.dumps(pb(int(slug[6:]))).encode()
+        elif slug == "erikamuster":
+            status, body = 200, json.dumps(pb(100)).encode()
+        else:
+            status, body = 404, json.dumps({"error": "not found"}).encode()
+        self.send_response(status)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class TestPbLookup(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.cache_path = Path(self.tmp_dir.name) / PbLookup.cache_file_name
+        self.server = ThreadingHTTPServer(("localhost", 0), PbHandler)
+        self.server.requests = []
+        self.thread = threading.Thread(target=self.server.serve_forever)
+        self.thread.start()
+        self.api_url = "http://%s:%s/api?q=" % self.server.server_address
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        self.thread.join()
+        self.tmp_dir.cleanup()
+
+    def lookup(self, **kwargs) -> PbLookup:
+        return PbLookup(self.api_url, self.cache_path, retries=0, **kwargs)
+
+    def test_cache(self):
+        responses = self.lookup().get_many(["erikamuster", "unknown", "broken", "unavailable", "erikamuster"])
+        self.assertEqual(responses["erikamuster"], pb(100))
+        self.assertEqual(responses["unknown"], {"error": "not found"})  # json body of error responses
+        self.assertEqual(responses["broken"], {})  # failed request
+        self.assertEqual(responses["unavailable"], {})  # server error
+        self.assertEqual(sorted(self.server.requests), ["broken", "erikamuster", "unavailable", "unknown"])
+
+        # positive and negative results are read from the cache file, failed requests are sent again
+        lookup = self.lookup()
+        self.assertEqual(lookup.get_many(["erikamuster", "unknown", "broken", "unavailable"]), responses)
+        self.assertEqual(lookup.request_count, 2)
+        self.assertEqual(sorted(self.server.requests[4:]), ["broken", "unavailable"])
+        self.assertNotIn("broken", lookup.cache)
+
+    def test_ttl(self):
+        self.lookup().get_many(["erikamuster", "unknown"])
+        # negative results expire earlier
+        self.assertEqual(self.lookup(negative_ttl=0).get_many(["erikamuster", "unknown"])["erikamuster"], pb(100))
+        self.assertEqual(sorted(self.server.requests), ["erikamuster", "unknown", "unknown"])
+        self.lookup(ttl=0).get("erikamuster")
+        self.assertEqual(self.server.requests[-1], "erikamuster")
+
+    def test_concurrent(self):
+        slugs = [f"skater{i}" for i in range(16)]
+        start = time.perf_counter()
+        responses = self.lookup(max_workers=8).get_many(slugs)
+        self.assertLess(time.perf_counter() - start, 16 * 0.05)
+        self.assertEqual([responses[slug]["pb"]["total"]["points"] for slug in slugs], list(range(16)))
+        self.assertEqual(sorted(self.server.requests), sorted(slugs))
+
+
+if __name__ == "__main__":
+    unittest.main()
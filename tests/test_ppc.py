@@ -0,0 +1,265 @@
+import tempfile
+import unittest
+import xml.etree.ElementTree as ET
+from pathlib import Path
+from typing import Dict, List
+
+from pypdf import PdfWriter
+from pypdf.generic import ArrayObject, DictionaryObject, NameObject, TextStringObject
+
+from fsklib import ppc as ppc_module
+from fsklib.ppc import PPC, PdfParser, PdfParserFunctionDeu, PpcCache, PpcIndex, PpcOdfUpdater
+
+
+def write_ppc_pdf(path: Path, fields: Dict[str, str]) -> None:
+    # pdf form with a text field per entry, like a filled in PPC form
+    writer = PdfWriter()
+    writer.add_blank_page(100, 100)
+    annotations = [writer.add_annotation(0, DictionaryObject({
+        NameObject("/Type"): NameObject("/Annot"), NameObject("/Subtype"): NameObject("/Widget"),
+        NameObject("/FT"): NameObject("/Tx"), NameObject("/T"): TextStringObject(name),
+        NameObject("/V"): TextStringObject(value)})) for name, value in fields.items()]
+    writer.root_object[NameObject("/AcroForm")] = DictionaryObject(
+        {NameObject("/Fields"): ArrayObject(annotation.indirect_reference for annotation in annotations)})
+    with open(path, "wb") as f:
+        writer.write(f)
+
+
+def make_ppc(path: str, fields: Dict[str, str]) -> PPC:
+    return PdfParserFunctionDeu()(Path(path), {name: {"/V": value} for name, value in fields.items()})
+
+
+def single(path: str, id: str, first_name: str, family_name: str, category="Damen") -> PPC:
+    return make_ppc(path, {"Kategorie": category, "ID": id, "Vorname": first_name, "Nachname": family_name,
+                           "KP1": "3Lz", "KR1": "2A"})
+
+
+def couple(path: str, category: str, ids: str, lady: str, man: str, element="3Tw") -> PPC:
+    # ids "1001-1002", names "Erika Muster"
+    (id_1, id_2), (first_1, last_1), (first_2, last_2) = ids.split("-"), lady.split(), man.split()
+    return make_ppc(path, {"Kategorie": category, "ID": id_1, "Vorname": first_1, "Nachname": last_1,
+                           "Partner-ID": id_2, "Partner-Vorname": first_2, "Partner-Nachname": last_2, "KP1": element})
+
+
+def team(path: str, id: str, name: str, name_field="Vorname") -> PPC:
+    return make_ppc(path, {"Kategorie": "Synchron", "ID": id, "Vorname": "", "Nachname": "", name_field: name,
+                           "KP1": "PB"})
+
+
+DT_PARTIC = """<?xml version="1.0" ?>
+<OdfBody CompetitionCode="TEST" DocumentType="DT_PARTIC">
+  <Competition>
+    <Participant Code="1" PrintName="Erika MUSTER" GivenName="Erika" FamilyName="MUSTER" Organisation="GER">
+      <Discipline Code="FSK" IFId="1001"><RegisteredEvent Event="FSKWSINGLES-JUNIOR------------"/></Discipline>
+    </Participant>
+    <Participant Code="2" PrintName="Max MUELLER" GivenName="Max" FamilyName="MUELLER" Organisation="GER">
+      <Discipline Code="FSK" IFId="9999"><RegisteredEvent Event="FSKMSINGLES-JUNIOR------------"/></Discipline>
+    </Participant>
+    <Participant Code="3" PrintName="Anna STEIN" GivenName="Anna" FamilyName="STEIN" Organisation="GER">
+      <Discipline Code="FSK" IFId="1003"><RegisteredEvent Event="FSKWSINGLES-JUNIOR------------"/></Discipline>
+    </Participant>
+    <Participant Code="4" PrintName="Lea WEBER" GivenName="Lea" FamilyName="WEBER" Organisation="GER">
+      <Discipline Code="FSK" IFId="1004"><RegisteredEvent Event="FSKWSINGLES-JUNIOR------------"/></Discipline>
+    </Participant>
+    <Participant Code="5" PrintName="Tom TEST" GivenName="Tom" FamilyName="TEST" Organisation="GER">
+      <Discipline Code="FSK" IFId="1005"><RegisteredEvent Event="FSKMSINGLES-JUNIOR------------"/></Discipline>
+    </Participant>
+  </Competition>
+</OdfBody>
+"""
+
+DT_PARTIC_TEAMS = """<?xml version="1.0" ?>
+<OdfBody CompetitionCode="TEST" DocumentType="DT_PARTIC_TEAMS">
+  <Competition>
+    <Team Code="1" Name="Erika MUSTER / Max MUELLER" Organisation="GER">
+      <Discipline Code="FSK" IFId="1001-1002"><RegisteredEvent Event="FSKXPAIRS-JUNIOR--------------"/></Discipline>
+    </Team>
+    <Team Code="2" Name="Lea WEBER / Tom KOCH" Organisation="GER">
+      <Discipline Code="FSK" IFId="9999"><RegisteredEvent Event="FSKXPAIRS-JUNIOR--------------"/></Discipline>
+    </Team>
+    <Team Code="3" Name="Anna STEIN Paul BERG" Organisation="GER">
+      <Discipline Code="FSK" IFId="2001-2002"><RegisteredEvent Event="FSKXICEDANCE-JUNIOR-----------"/></Discipline>
+    </Team>
+    <Team Code="4" Name="Eva LANG / Jan KURZ" Organisation="GER">
+      <Discipline Code="FSK" IFId="3001-3002"><RegisteredEvent Event="FSKXICEDANCE-JUNIOR-----------"/></Discipline>
+    </Team>
+    <Team Code="5" Name="Team Berlin" ShortName="Berlin" Organisation="GER">
+      <Discipline Code="FSK" IFId="S1"><RegisteredEvent Event="FSKXSYNCHRON-JUNIOR-----------"/></Discipline>
+    </Team>
+    <Team Code="6" Name="Ice Cats" Organisation="GER">
+      <Discipline Code="FSK" IFId="S2"><RegisteredEvent Event="FSKXSYNCHRON-JUNIOR-----------"/></Discipline>
+    </Team>
+    <Team Code="7" Name="Snowflakes" Organisation="GER">
+      <Discipline Code="FSK" IFId="S3"><RegisteredEvent Event="FSKXSYNCHRON-JUNIOR-----------"/></Discipline>
+    </Team>
+  </Competition>
+</OdfBody>
+"""
+
+
+class OdfTestCase(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.path = Path(self.tmp_dir.name)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def update(self, odf_xml: str, ppcs: List[PPC]) -> Dict[str, List[str]]:
+        """Run the PPC update, return the added element entries by participant or team code."""
+        odf_path = self.path / "DT_PARTIC.xml"
+        odf_path.write_text(odf_xml, encoding="utf-8")
+        with PpcOdfUpdater(odf_path) as updater:
+            updater.update(ppcs)
+        root = ET.parse(updater.output_path).getroot()
+        return {par.attrib["Code"]: [entry.attrib["Value"] for entry in par.iter("EventEntry")
+                                     if entry.attrib["Code"].startswith("ELEMENT_CODE")]
+                for par in root.iter() if par.tag in ("Participant", "Team")}
+
+
+class TestPpc(unittest.TestCase):
+    def test_couple_partner_names(self):
+        fields = {name: {"/V": value} for name, value in [
+            ("Kategorie", "Junioren Paarlaufen"), ("ID", "1234"), ("Vorname", "Erika"), ("Nachname", "Muster"),
+            ("Partner-ID", "5678"), ("Partner-Vorname", "Max"), ("Partner-Nachname", "Müller")]}
+        ppc = PdfParserFunctionDeu()(Path("ppc.pdf"), fields)
+        partner = ppc.participant.couple.partner_2
+        self.assertEqual((partner.first_name, partner.family_name), ("Max", "Müller"))
+        self.assertEqual(PpcIndex([ppc]).couples_names[0], ("muster", "mueller"))
+
+
+class TestSinglesMatching(OdfTestCase):
+    def setUp(self):
+        super().setUp()
+        self.ppcs = [single("erica.pdf", "1001", "Erica", "Muster"),  # typo, found by id and family name
+                     single("meier.pdf", "1001", "Hans", "Meier"),  # same id, but no matching name
+                     single("max.pdf", "0", "Max", "Müller", "Herren"),  # found by name
+                     single("anna_1.pdf", "0", "Anna", "Stein"),
+                     single("anna_2.pdf", "1003", "Anna", "Stein"),
+                     single("lea.pdf", "0", "Weber", "Lea")]  # given and family name swapped
+
+    def test_index(self):
+        index = PpcIndex(self.ppcs)
+        self.assertEqual(index.singles_by_id["1001"], [0, 1])
+        self.assertEqual(index.singles_by_name["annastein"], [3, 4])
+        self.assertEqual(index.singles_by_name["leaweber"], [5])  # reverse name
+        self.assertEqual(index.singles_names[2], ("maxmueller", "max", "mueller"))
+
+    def test_find_singles_ppcs(self):
+        index = PpcIndex(self.ppcs)
+        updater = PpcOdfUpdater(self.path / "DT_PARTIC.xml")
+        pars = {par.attrib["Code"]: par for par in ET.fromstring(DT_PARTIC).iter("Participant")}
+        find = updater.find_singles_ppcs
+        self.assertEqual([ppc.path.name for ppc in find(index, "1001", pars["1"])], ["erica.pdf"])
+        self.assertEqual([ppc.path.name for ppc in find(index, "9999", pars["2"])], ["max.pdf"])
+        # found by id and by name, in the order of the input ppcs
+        self.assertEqual([ppc.path.name for ppc in find(index, "1003", pars["3"])], ["anna_1.pdf", "anna_2.pdf"])
+        self.assertEqual([ppc.path.name for ppc in find(index, "1004", pars["4"])], ["lea.pdf"])
+        self.assertEqual(find(index, "1005", pars["5"]), [])
+
+    def test_update(self):
+        with self.assertLogs(ppc_module.logger, "WARNING") as logs:
+            entries = self.update(DT_PARTIC, self.ppcs)
+        self.assertEqual(entries, {"1": ["3Lz", "2A"], "2": ["3Lz", "2A"], "3": [], "4": ["3Lz", "2A"], "5": []})
+        output = "\n".join(logs.output)
+        self.assertIn("Ambiguous ppcs found for: 1003 - Anna STEIN", output)
+        self.assertIn("anna_2.pdf", output)
+        self.assertIn("Unable to find PPC for: 1005 - Tom TEST", output)
+        self.assertIn("meier.pdf", output)  # unused
+
+
+class TestTeamsMatching(OdfTestCase):
+    def setUp(self):
+        super().setUp()
+        self.ppcs = [couple("muster.pdf", "Paarlaufen", "1001-1002", "Erika Muster", "Max Müller"),
+                     couple("koch.pdf", "Paarlaufen", "0-0", "Tom Koch", "Lea Weber"),  # partners swapped
+                     couple("stein.pdf", "Eistanz", "2001-2002", "Anna Stein", "Paul Berg"),
+                     couple("lang_pairs.pdf", "Paarlaufen", "3001-3002", "Eva Lang", "Jan Kurz", "3Tw"),
+                     couple("lang_dance.pdf", "Eistanz", "3001-3002", "Eva Lang", "Jan Kurz", "SyTw"),
+                     team("berlin.pdf", "S1", "Team Berlin"),
+                     team("cats.pdf", "0", "Ice Cats", "Nachname"),
+                     team("snowflakes.pdf", "S3", "Snowflakes Juniors"),
+                     team("other.pdf", "S3", "Other Team")]  # same id, but no matching name
+        self.teams = {team.attrib["Code"]: team for team in ET.fromstring(DT_PARTIC_TEAMS).iter("Team")}
+        self.index = PpcIndex(self.ppcs)
+        self.updater = PpcOdfUpdater(self.path / "DT_PARTIC_TEAMS.xml")
+
+    def find(self, find_ppcs, id: str, code: str) -> List[str]:
+        return [ppc.path.name for ppc in find_ppcs(self.index, id, self.teams[code])]
+
+    def test_find_couples_ppcs(self):
+        find = self.updater.find_couples_ppcs
+        self.assertEqual(self.find(find, "1001-1002", "1"), ["muster.pdf"])
+        self.assertEqual(self.find(find, "1002-1001", "1"), ["muster.pdf"])  # reverse team id
+        self.assertEqual(self.find(find, "", "1"), ["muster.pdf"])  # names split at "/"
+        self.assertEqual(self.find(find, "9999", "2"), ["koch.pdf"])
+        # no "/" in the team name: only found by the team id
+        self.assertEqual(self.find(find, "2001-2002", "3"), ["stein.pdf"])
+        self.assertEqual(self.find(find, "", "3"), [])
+        self.assertEqual(self.find(find, "3001-3002", "4"), ["lang_pairs.pdf", "lang_dance.pdf"])
+
+    def test_find_sys_ppcs(self):
+        find = self.updater.find_sys_ppcs
+        self.assertEqual(self.find(find, "S1", "5"), ["berlin.pdf"])
+        self.assertEqual(self.find(find, "S2", "6"), ["cats.pdf"])  # by name
+        self.assertEqual(self.find(find, "S3", "7"), ["snowflakes.pdf"])  # by id and part of the name
+        self.assertEqual(self.find(find, "", "7"), [])
+
+    def test_update(self):
+        entries = self.update(DT_PARTIC_TEAMS, self.ppcs)
+        # the couple with ppcs in pairs and ice dance gets the ppc of its event discipline
+        self.assertEqual(entries, {"1": ["3Tw"], "2": ["3Tw"], "3": ["3Tw"], "4": ["SyTw"],
+                                   "5": ["PB"], "6": ["PB"], "7": ["PB"]})
+
+
+class TestPdfParser(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.path = Path(self.tmp_dir.name)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_parse_multiple_in_pool(self):
+        file_paths = []
+        for i in range(6):
+            file_paths.append(self.path / f"{i}.pdf")
+            write_ppc_pdf(file_paths[-1], {"Kategorie": "Damen", "ID": str(i), "Vorname": f"Erika{i}",
+                                           "Nachname": "Muster", "KP1": "3Lz"})
+        file_paths.insert(2, self.path / "broken.pdf")
+        file_paths[2].write_text("no pdf")
+        file_paths.insert(4, self.path / "no_form.pdf")
+        write_ppc_pdf(file_paths[4], {})  # no form fields -> exception in the parser function
+
+        parser = PdfParser(PdfParserFunctionDeu(), max_workers=2)
+        parser.min_files_parallel = 2
+        ppcs, file_paths_with_error = parser.parse_multiple(file_paths)
+        # results keep the order of the input files, errors are reported
+        self.assertEqual([ppc.participant.person.id for ppc in ppcs], [str(i) for i in range(6)])
+        self.assertEqual([ppc.path for ppc in ppcs], [p for p in file_paths if p.stem.isdigit()])
+        self.assertEqual(ppcs[0].elements_short, ["3Lz"])
+        self.assertEqual(file_paths_with_error, [self.path / "broken.pdf", self.path / "no_form.pdf"])
+
+    def test_cache(self):
+        for name in ["Erika", "Max"]:
+            write_ppc_pdf(self.path / f"{name}.pdf", {"Kategorie": "Damen", "Vorname": name, "Nachname": "Muster"})
+        parser = PdfParser(PdfParserFunctionDeu())
+
+        def parse(invalidate=False):
+            cache = PpcCache(self.path, invalidate)
+            ppcs, _ = parser.parse_multiple(sorted(self.path.glob("*.pdf")), cache)
+            return [ppc.participant.person.first_name for ppc in ppcs], (cache.hits, cache.misses)
+
+        self.assertEqual(parse(), (["Erika", "Max"], (0, 2)))
+        self.assertTrue((self.path / PpcCache.file_name).is_file())
+        self.assertEqual(parse(), (["Erika", "Max"], (2, 0)))
+
+        # modified file is parsed again
+        write_ppc_pdf(self.path / "Max.pdf", {"Kategorie": "Herren", "Vorname": "Maximilian", "Nachname": "Muster"})
+        self.assertEqual(parse(), (["Erika", "Maximilian"], (1, 1)))
+        self.assertEqual(parse(invalidate=True), (["Erika", "Maximilian"], (0, 2)))
+        self.assertEqual(parse(), (["Erika", "Maximilian"], (2, 0)))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,71 @@
+import os
+import tempfile
+import unittest
+from pathlib import Path
+
+from fsklib.utils.staging import FileStager, StagingMethod, is_up_to_date, stage_file
+
+
+class TestStaging(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.path = Path(self.tmp_dir.name)
+        self.source = self.path / "music.mp3"
+        self.source.write_bytes(b"music" * 1000)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_stage_file(self):
+        for method in StagingMethod:
+            destination = self.path / f"{method.value}.mp3"
+            self.assertEqual(stage_file(self.source, destination, [method]), method)
+            self.assertEqual(destination.read_bytes(), self.source.read_bytes())
+            self.assertTrue(is_up_to_date(self.source, destination))
+            self.assertIsNone(stage_file(self.source, destination, [method]))  # unchanged
+        self.assertTrue((self.path / "hardlink.mp3").samefile(self.source))
+        self.assertEqual(sorted(p.name for p in self.path.iterdir()),
+                         ["clone.mp3", "copy.mp3", "hardlink.mp3", "music.mp3"])  # no temporary files left
+
+    def test_update(self):
+        destination = self.path / "copy.mp3"
+        stage_file(self.source, destination, [StagingMethod.COPY])
+        self.source.write_bytes(b"late entry")
+        os.utime(self.source, (0, 1000))
+        self.assertFalse(is_up_to_date(self.source, destination))
+        self.assertEqual(stage_file(self.source, destination, [StagingMethod.COPY]), StagingMethod.COPY)
+        self.assertEqual(destination.read_bytes(), b"late entry")
+
+    def test_file_stager(self):
+        (self.path / "sorted").mkdir()
+        destinations = [self.path / "sorted" / f"{i:02d}.mp3" for i in range(10)]
+        for methods in [[StagingMethod.COPY], [StagingMethod.HARDLINK, StagingMethod.COPY]]:
+            for destination in destinations:
+                destination.unlink(missing_ok=True)
+            with FileStager(methods, max_workers=4) as stager:
+                stager.stage(self.path / "missing.mp3", self.path / "sorted" / "missing.mp3")
+                for destination in destinations:
+                    stager.stage(self.source, destination)
+            self.assertEqual(stager.summary(), {methods[0]: 10})
+            self.assertEqual([source.name for source, _, _ in stager.errors()], ["missing.mp3"])
+
+        with FileStager() as stager:
+            for destination in destinations:
+                stager.stage(self.source, destination)
+        self.assertEqual(stager.summary(), {None: 10})
+
+    def test_hardlink_errors(self):
+        (self.path / "sorted").mkdir()
+        (self.path / "sorted" / ".00.mp3.staging").write_bytes(b"interrupted")  # stale temporary file
+        with FileStager(max_workers=2) as stager:
+            stager.stage(self.source, self.path / "missing_dir" / "missing.mp3")
+            stager.stage(self.source, self.path / "sorted" / "00.mp3")
+            stager.stage(self.source, self.path / "sorted" / "01.mp3")
+        # a missing destination directory does not disable hardlinks for the other files
+        self.assertEqual(stager.summary(), {StagingMethod.HARDLINK: 2})
+        self.assertEqual([destination.parent.name for _, destination, _ in stager.errors()], ["missing_dir"])
+        self.assertEqual(sorted(p.name for p in (self.path / "sorted").iterdir()), ["00.mp3", "01.mp3"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,4 +1,5 @@
 import logging
+import multiprocessing
 import sys
 from pathlib import Path
 from typing import Callable, List
@@ -13,16 +14,14 @@ except ImportError:
     import ScrolledText
     # TODO python2
 
-import mysql.connector
-
 from fsklib.deueventcsv import DeuMeldeformularCsv
-from fsklib.deuxlsxforms import ConvertedOutputType, DEUMeldeformularXLSX
+from fsklib.fsm import db
 from fsklib.fsm.result import extract
 from fsklib.output import (EmptySegmentPdfOutput, OdfParticOutput,
                            ParticipantCsvOutput)
 from fsklib.ppc import PdfParser, PdfParserFunctionDeu, PpcOdfUpdater
 from fsklib.utils.logging_helper import get_logger
-from fsklib.utils.merge_csv import merge_csv
+from fsklib.utils.merge_csv import read_csv_rows
 
 
 def root_dir() -> Path:
@@ -104,53 +103,38 @@ class XLSXConverterFrame(tk.Frame):
             logger.error('Meldeformular-Datei auswählen!')
             return
 
-        logger.info("Meldeformular einlesen")
-        try:
-            deu_xlsx = DEUMeldeformularXLSX(self.input_xlsx_path)
-            deu_xlsx.convert()
-
-            deu_event_info_csv = deu_xlsx.get_output_files(ConvertedOutputType.EVENT_INFO)[0]
-            deu_persons_csv = deu_xlsx.get_output_files(ConvertedOutputType.EVENT_PERSONS)[0]
-            deu_categories_csv = deu_xlsx.get_output_files(ConvertedOutputType.EVENT_CATERGORIES)[0]
-
-            if not deu_event_info_csv or not deu_persons_csv or not deu_categories_csv:
-                logger.error("Nicht alle notwendigen Informationen konnten aus dem Meldeformular gelesen werden.")
-                return
-        except:
-            logger.exception("Das Meldeformular konnte nicht korrekt eingelesen werden.")
-            return
-
         club_deu_csv = master_data_dir() / "csv" / "clubs-DEU.csv"
         club_merged = master_data_dir() / "csv" / "clubs-merged.csv"
-        club_merged.unlink(missing_ok=True)
 
         logger.info("Suche nach weiteren Clubs...")
         club_paths = set((master_data_dir() / "csv").glob("club*.csv"))
-        club_paths_not_std = club_paths.difference(set((club_deu_csv,)))
+        club_paths_not_std = club_paths.difference(set((club_deu_csv, club_merged)))
 
         if club_paths_not_std:
             logger.info("Weitere Club-CSV-Dateien gefunden:")
             for club_path in club_paths_not_std:
                 logger.info(club_path.name)
-            merge_csv(club_paths, club_merged, ';')
-
-        if club_merged.exists():
-            club_path = club_merged
-        else:
-            club_path = club_deu_csv
+        # clubs of all files are read directly, clubs-merged.csv is not written anymore
+        club_rows = read_csv_rows([club_deu_csv] + sorted(club_paths_not_std), ';', encoding='utf-8')
 
-        logger.info("Generiere ODF-Dateien...")
+        logger.info("Meldeformular einlesen und ODF-Dateien generieren...")
 
         output_path = self.input_xlsx_path.parent
         deu_csv = DeuMeldeformularCsv()
-        deu_csv.convert(deu_persons_csv,
-                        club_path,
-                        deu_categories_csv,
-                        deu_event_info_csv,
-                        [OdfParticOutput(output_path),
-                         ParticipantCsvOutput(output_path / "csv" / "participants.csv"),
-                         EmptySegmentPdfOutput(output_path / "website", master_data_dir() / "FSM" / "website" / "empty.pdf")]
-                       )
+        try:
+            error = deu_csv.convert_xlsx(self.input_xlsx_path,
+                                         club_rows,
+                                         [OdfParticOutput(output_path, indent=False),  # compact xml for the FSM import
+                                          ParticipantCsvOutput(output_path / "csv" / "participants.csv"),
+                                          EmptySegmentPdfOutput(output_path / "website",
+                                                                master_data_dir() / "FSM" / "website" / "empty.pdf")],
+                                         write_intermediate_csv=self.write_csv_var.get())
+        except:
+            logger.exception("Das Meldeformular konnte nicht korrekt eingelesen werden.")
+            return
+        if error:
+            logger.error("Nicht alle notwendigen Informationen konnten aus dem Meldeformular gelesen werden.")
+            return
 
         logger.info("Fertig!")
         logger.info("Generierte Dateien befinden sich hier: %s" % str(self.input_xlsx_path.parent))
@@ -177,6 +161,11 @@ class XLSXConverterFrame(tk.Frame):
         button = ttk.Button(self, text="Auswählen", command=lambda: self.file_dialog_set_text(file_extensions, "r"))
         button.grid(column=1, row=0, sticky='nsew', padx=10)
 
+        self.write_csv_var = tk.IntVar(value=0)
+        check_write_csv = ttk.Checkbutton(self, text="Zwischenergebnisse als CSV speichern",
+                                          variable=self.write_csv_var)
+        check_write_csv.grid(column=0, row=1, sticky='sw', pady=10)
+
         button_convert = ttk.Button(self, text='Konvertieren', command=self.convert_callback)
         button_convert.grid(column=1, row=1, sticky='se', padx=10, pady=10)
 
@@ -184,7 +173,7 @@ class XLSXConverterFrame(tk.Frame):
 class PPCConverterFrame(tk.Frame):
     def __init__(self, parent, *args, **kwargs):
         tk.Frame.__init__(self, parent, *args, **kwargs)
-        self.parser = PdfParser(PdfParserFunctionDeu())
+        self.parser = PdfParser(PdfParserFunctionDeu(), max_workers=None)
         self.build_gui()
 
     def set_ppc_dir(self, file_name):
@@ -208,7 +197,11 @@ class PPCConverterFrame(tk.Frame):
 
         try:
             logger.info("Start parsing PPC files in directory: %s", ppc_dir)
-            ppcs, file_paths_with_error = self.parser.ppcs_parse_dir(ppc_dir, recursive=bool(self.recursive_var.get()))
+            ppcs, file_paths_with_error = self.parser.ppcs_parse_dir(
+                ppc_dir,
+                recursive=bool(self.recursive_var.get()),
+                use_cache=True,
+                invalidate_cache=bool(self.invalidate_cache_var.get()))
 
             if file_paths_with_error:
                 logger.error("Unable to parse following files:")
@@ -264,6 +257,16 @@ class PPCConverterFrame(tk.Frame):
         self.recursive_checkbox = ttk.Checkbutton(self, text="PPCs in Unterverzeichnissen suchen", variable=self.recursive_var)
         self.recursive_checkbox.grid(column=0, row=row_index, columnspan=3, sticky='nw', padx=10)
 
+        row_index += 1
+
+        # add checkbox to parse all files again
+        self.invalidate_cache_var = tk.IntVar(value=0)
+        self.invalidate_cache_checkbox = ttk.Checkbutton(self, text="Alle PPCs neu einlesen (Cache ignorieren)",
+                                                         variable=self.invalidate_cache_var)
+        self.invalidate_cache_checkbox.grid(column=0, row=row_index, columnspan=3, sticky='nw', padx=10)
+
+        row_index += 1
+
         # Convert button
         button_convert = ttk.Button(self, text='Konvertieren', command=self.logic)
         button_convert.grid(column=2, row=row_index, sticky='se', padx=10, pady=10)
@@ -285,9 +288,8 @@ class ResultExtractorFrame(tk.Frame):
 
     def logic(self):
         try:
-            con = self.get_database_connection()
-            con.cursor().execute(f"USE `{self.drop_db_selection.get()}`")
-            extract(con, self.input_output_file.get(), self.drop_comp_selection.get())
+            with self.get_database_connection(self.drop_db_selection.get()) as con:
+                extract(con, self.input_output_file.get(), self.drop_comp_selection.get())
         except:
             logger.exception("Verbindung zur Datenbank kann nicht hergestellt werden. Bitte überprüfen Sie alle Einstellungen.")
             return
@@ -297,45 +299,29 @@ class ResultExtractorFrame(tk.Frame):
         self.open_xlsx(self.input_output_file.get())
         self.logic()
 
-    def get_database_connection(self):
-        return mysql.connector.connect(user=self.input_user.get(), password=self.input_pw.get(), host=self.input_host.get(), port=int(self.input_port.get()))
+    def get_database_connection(self, database=None):
+        # pooled connection, leaving the with block returns it to the pool for the next request
+        return db.connection(user=self.input_user.get(), password=self.input_pw.get(), host=self.input_host.get(),
+                             port=int(self.input_port.get()), database=database)
 
     def read_database_names(self) -> list:
         try:
-            con = self.get_database_connection()
+            with self.get_database_connection() as con:
+                return [i[0] for i in db.query(con, "SHOW DATABASES", prepared=False)]
         except:
             return []
 
-        if con:
-            cursor = con.cursor()
-            cursor.execute("SHOW DATABASES")
-            database_names = [i[0] for i in cursor.fetchall()]
-            return database_names
-        else:
-            return []
-
     def read_competition_names(self) -> list:
         db_name = self.drop_db_selection.get()
         if not db_name:
             return []
 
         try:
-            con = self.get_database_connection()
-            con.cursor().execute(f"USE `{db_name}`")
+            with self.get_database_connection(db_name) as con:
+                return [i[0] for i in db.query(con, "SELECT ShortName FROM competition")]
         except:
             return []
 
-        if con:
-            cursor = con.cursor()
-            try:
-                cursor.execute("SELECT ShortName FROM competition")
-                competition_names = [i[0] for i in cursor.fetchall()]
-            except:
-                return []
-            return competition_names
-        else:
-            return []
-
     def update_database_names(self):
         l = self.read_database_names()
         if len(l):
@@ -519,7 +505,9 @@ def main():
     log_frame.pack(side="top", fill="both", expand=True)
 
     root.mainloop()
+    db.close_pools()
 
 
 if __name__ == "__main__":
+    multiprocessing.freeze_support()  # process pool for PPC parsing in the packaged executable
     main()